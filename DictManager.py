@@ -1,6 +1,73 @@
-from atom.api import (Atom, List, ContainerList, Dict, observe, Callable, Typed, Unicode)
+from atom.api import (Atom, List, ContainerList, Dict, observe, Callable, Typed, Unicode, Event)
+import bisect
 
-import enaml
+
+def find_sorted(sortedList, label):
+    idx = bisect.bisect_left(sortedList, label)
+    if idx < len(sortedList) and sortedList[idx] == label:
+        return idx
+    return None
+
+class DictIndex(object):
+    """
+    Sorted display lists of all the DictManagers over one dictionary.
+
+    Instead of every manager re-filtering and re-sorting the whole dictionary on
+    each change, the display lists are kept sorted and updated in place: an
+    added item is run through each manager's filter once and inserted with
+    bisect, removed and renamed items are found by bisection.
+    """
+    def __init__(self, itemDict):
+        self.itemDict = itemDict
+        self.managers = []
+
+    def view(self, manager):
+        return sorted(v.label for v in self.itemDict.values() if manager.displayFilter(v))
+
+    def register(self, manager):
+        if manager not in self.managers:
+            self.managers.append(manager)
+        manager.displayList = self.view(manager)
+
+    def unregister(self, manager):
+        if manager in self.managers:
+            self.managers.remove(manager)
+
+    def refresh(self):
+        """
+        Rebuild every display list after the dictionary was changed directly.
+        """
+        for manager in self.managers:
+            manager.displayList = self.view(manager)
+
+    def add(self, labels):
+        """
+        Show the items with the given keys in every manager whose filter accepts
+        them. Each display list is updated once however many items are added.
+        """
+        items = [self.itemDict[label] for label in labels if label in self.itemDict]
+        for manager in self.managers:
+            displayList = manager.displayList
+            newLabels = sorted(set(item.label for item in items if manager.displayFilter(item)))
+            newLabels = [label for label in newLabels if find_sorted(displayList, label) is None]
+            if len(newLabels) == 1:
+                bisect.insort(displayList, newLabels[0])
+            elif newLabels:
+                manager.displayList = sorted(list(displayList) + newLabels)
+
+    def remove(self, labels):
+        for manager in self.managers:
+            for label in labels:
+                idx = find_sorted(manager.displayList, label)
+                if idx is not None:
+                    del manager.displayList[idx]
+
+    def rename(self, oldLabel, newLabel):
+        for manager in self.managers:
+            idx = find_sorted(manager.displayList, oldLabel)
+            if idx is not None:
+                del manager.displayList[idx]
+                bisect.insort(manager.displayList, newLabel)
 
 
 class DictManager(Atom):
@@ -14,15 +81,22 @@ class DictManager(Atom):
     displayList = ContainerList()
     onChangeDelegate = Callable()
     otherActions = Dict(Unicode(), Callable())
+    # sorted display lists, shared with the other managers of the same dictionary
+    index = Typed(DictIndex)
+    # fired with ('add', label, ...), ('remove', label), ('rename', oldLabel, newLabel) or ('refresh',)
+    itemChanged = Event()
 
-    def __init__(self, itemDict={}, displayFilter=lambda x: True, **kwargs):
+    def __init__(self, itemDict={}, displayFilter=lambda x: True, index=None, **kwargs):
         self.displayFilter = displayFilter
+        if index is not None:
+            self.index = index
         super(DictManager, self).__init__(itemDict=itemDict, displayFilter=displayFilter, **kwargs)
 
     def add_item(self, parent):
         """
         Create a new item dialog window and handle the result
         """
+        import enaml
         with enaml.imports():
             from widgets.dialogs import AddItemDialog
         dialogBox = AddItemDialog(parent, modelNames=[i.__name__ for i in self.possibleItems], objText='')
@@ -30,16 +104,29 @@ class DictManager(Atom):
         if dialogBox.result:
             if dialogBox.newLabel not in self.itemDict.keys():
                 self.itemDict[dialogBox.newLabel] = self.possibleItems[dialogBox.newModelNum](label=dialogBox.newLabel)
-                self.displayList.append(dialogBox.newLabel)
+                self.index.add([dialogBox.newLabel])
+                self.itemChanged = ('add', dialogBox.newLabel)
             else:
                 print("WARNING: Can't use duplicate label %s"%dialogBox.newLabel)
 
+    def add_items(self, items):
+        """
+        Add a dictionary of new items at once, updating each display list and
+        firing itemChanged only once.
+        """
+        if not items:
+            return
+        self.itemDict.update(items)
+        self.index.add(list(items.keys()))
+        self.itemChanged = ('add',) + tuple(sorted(items.keys()))
+
     def remove_item(self, itemLabel):
         #check that the item exists before removing from the list
         if itemLabel in self.itemDict.keys():
             self.itemDict.pop(itemLabel)
             #TODO: once ContainerDicts land see if we still need this
-            self.displayList.pop(self.displayList.index(itemLabel))
+            self.index.remove([itemLabel])
+            self.itemChanged = ('remove', itemLabel)
         elif itemLabel != '':
             self.displayList.pop(self.displayList.index(itemLabel))
 
@@ -47,9 +134,8 @@ class DictManager(Atom):
         # Add copy of changing item
         self.itemDict[newLabel] = self.itemDict[oldLabel]
 
-        # update display list
-        idx = self.displayList.index(oldLabel)
-        self.displayList[idx] = newLabel
+        # update display lists
+        self.index.rename(oldLabel, newLabel)
 
         # remove old label from itemDict list
         if oldLabel in self.itemDict.keys():
@@ -63,6 +149,8 @@ class DictManager(Atom):
         if self.onChangeDelegate:
             self.onChangeDelegate(oldLabel, newLabel)
 
+        self.itemChanged = ('rename', oldLabel, newLabel)
+
     def update_enable(self, itemLabel, checkState):
         self.itemDict[itemLabel].enabled = checkState
 
@@ -71,5 +159,15 @@ class DictManager(Atom):
         """
         Eventualy itemDict will be a ContainerDict and this will fire on all events.
         Will have to be more careful about whether it is a "create" event or "update"
+        Called directly after the dictionary was modified in place, in which case
+        the display lists of all the managers sharing the index are rebuilt.
         """
-        self.displayList = sorted([v.label for v in self.itemDict.values() if self.displayFilter(v)])
+        if self.index is None or self.index.itemDict is not self.itemDict:
+            if self.index is not None:
+                self.index.unregister(self)
+            self.index = DictIndex(self.itemDict)
+        if self in self.index.managers:
+            self.index.refresh()
+        else:
+            self.index.register(self)
+        self.itemChanged = ('refresh',)
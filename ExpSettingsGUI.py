@@ -5,7 +5,7 @@ import argparse
 import sys
 import shutil
 
-import h5py
+import h5py # must be imported before Qt, see https://github.com/BBN-Q/PyQLab/issues/26
 
 from atom.api import Atom, Typed, Str, Bool, List
 import enaml
@@ -19,7 +19,11 @@ import QGL.ChannelLibrary
 import QGL.Channels
 import config
 import ExpSettingsVal
-from DictManager import DictManager
+from DictManager import DictManager, DictIndex
+from WiringGraph import WiringGraph
+from SnapshotStore import SnapshotStore
+import KernelStore
+from ScripterEncoders import ScripterEncoder, ScripterHDF5Writer
 
 
 class ExpSettings(Atom):
@@ -30,6 +34,8 @@ class ExpSettings(Atom):
     channels = Typed(QGL.ChannelLibrary.ChannelLibrary)
     logicalChannelManager = Typed(DictManager)
     physicalChannelManager = Typed(DictManager)
+    validationSession = Typed(ExpSettingsVal.ValidationSession)
+    wiring = Typed(WiringGraph)
     CWMode = Bool(False)
     validate = Bool(True)
     curFileName = Str('DefaultExpSettings.json')
@@ -45,15 +51,38 @@ class ExpSettings(Atom):
         # link adding AWG to auto-populating channels
         self.instruments.AWGs.populate_physical_channels = lambda awg: self.populate_physical_channels(awg)
 
+        channelIndex = DictIndex(self.channels.channelDict)
         self.logicalChannelManager = DictManager(
             itemDict=self.channels.channelDict,
             displayFilter=lambda x: isinstance(x, QGL.Channels.LogicalChannel),
-            possibleItems=QGL.Channels.NewLogicalChannelList)
+            possibleItems=QGL.Channels.NewLogicalChannelList,
+            index=channelIndex)
         self.physicalChannelManager = DictManager(
             itemDict=self.channels.channelDict,
             displayFilter=lambda x: isinstance(x, QGL.Channels.PhysicalChannel),
             possibleItems=QGL.Channels.NewPhysicalChannelList,
-            otherActions={"Auto": self.populate_physical_channels})
+            otherActions={"Auto": self.populate_physical_channels},
+            index=channelIndex)
+
+        # re-validate only what changed between saves
+        self.validationSession = ExpSettingsVal.ValidationSession(
+            channelLib=self.channels,
+            instrumentDict=self.instruments.instrDict,
+            sweepDict=self.sweeps.sweepDict)
+        for manager in [self.logicalChannelManager, self.physicalChannelManager]:
+            self.validationSession.attach(manager, 'channel')
+        for manager in [self.instruments, self.instruments.AWGs, self.instruments.sources,
+                        self.instruments.others, self.instruments.markedInstrs]:
+            self.validationSession.attach(manager, 'instrument')
+        self.validationSession.attach(self.sweeps.sweepManager, 'sweep')
+
+        # channel <-> instrument wiring with reverse lookups
+        self.wiring = WiringGraph(self.channels, self.instruments.instrDict)
+        for manager in [self.logicalChannelManager, self.physicalChannelManager]:
+            self.wiring.attach(manager, 'channel')
+        for manager in [self.instruments, self.instruments.AWGs, self.instruments.sources,
+                        self.instruments.others, self.instruments.markedInstrs]:
+            self.wiring.attach(manager, 'instrument')
 
     # TODO: get this to work
     # @on_trait_change('instruments.instrDict_items')
@@ -76,10 +105,19 @@ class ExpSettings(Atom):
                       sort_keys=True,
                       CWMode=self.CWMode)
 
+    def write_to_hdf5(self, fileName=None):
+        """
+        Write the experiment settings as HDF5 instead of JSON, with the same
+        layout as the JSON file.
+        """
+        if fileName is None:
+            fileName = os.path.splitext(self.curFileName)[0] + '.h5'
+        ScripterHDF5Writer(CWMode=self.CWMode).write(self, fileName)
+
     def write_libraries(self):
         """ Write all the libraries to their files. """
         if self.validate:
-            self.errors = ExpSettingsVal.validate_lib()
+            self.errors = self.validationSession.validate()
             if self.errors != []:
                 print("JSON Files did not validate")
                 raise
@@ -93,7 +131,7 @@ class ExpSettings(Atom):
     def save_config(self, path):
 
         if self.validate:
-            self.errors = ExpSettingsVal.validate_lib()
+            self.errors = self.validationSession.validate()
             if self.errors != []:
                 print("JSON Files did not validate")
                 raise
@@ -110,6 +148,10 @@ class ExpSettings(Atom):
             self.instruments.write_to_file(
                 fileName=path + os.sep +
                 os.path.basename(self.instruments.libFile))
+            # carry the kernels the instrument library refers to along
+            KernelStore.default_store().copy_referenced(
+                [path + os.sep + os.path.basename(self.instruments.libFile)],
+                KernelStore.config_store(path))
             self.sweeps.write_to_file(
                 fileName=path + os.sep + os.path.basename(self.sweeps.libFile))
             self.write_to_file(
@@ -122,6 +164,9 @@ class ExpSettings(Atom):
 
         print("LOADING FROM:", path)
         try:
+            KernelStore.config_store(path).copy_referenced(
+                [path + os.sep + os.path.basename(self.instruments.libFile)],
+                KernelStore.default_store())
             shutil.copy(
                 path + os.sep + os.path.basename(self.channels.libFile),
                 self.channels.libFile)
@@ -138,6 +183,37 @@ class ExpSettings(Atom):
         except Exception as e:
             self.errors.append(str(e))
 
+    def library_files(self):
+        return [self.channels.libFile, self.instruments.libFile,
+                self.measurements.libFile, self.sweeps.libFile, self.curFileName]
+
+    def save_snapshot(self, name, store=None, overwrite=False):
+        """
+        Save the current configuration as snapshot `name` in the content-addressed
+        snapshot store. Items unchanged since earlier snapshots are not duplicated.
+        An existing snapshot `name` is only replaced with overwrite.
+        """
+        self.write_libraries()
+        self.write_to_file()
+        store = store or SnapshotStore(config.snapshotDir)
+        try:
+            store.save(name, self.library_files(), overwrite, KernelStore.default_store())
+        except Exception as e:
+            self.errors.append(str(e))
+
+    def load_snapshot(self, name, store=None):
+        """
+        Restore snapshot `name`, rewriting only the files that differ from the
+        current working set.
+        """
+        self.clear_errors()
+        store = store or SnapshotStore(config.snapshotDir)
+        try:
+            store.restore(name, {os.path.basename(f): f for f in self.library_files()},
+                          KernelStore.default_store())
+        except Exception as e:
+            self.errors.append(str(e))
+
     def load_meta(self):
         self.clear_errors()
         meta_file = self.meta_file
@@ -218,11 +294,12 @@ class ExpSettings(Atom):
         if awgs == None:
             awgs = filter(lambda x: isinstance(x, instruments.AWGs.AWG),
                           self.instruments.instrDict.values())
+        newChannels = {}
         for awg in awgs:
             channels = awg.get_naming_convention()
             for ch in channels:
                 label = awg.label + '-' + ch
-                if label in self.channels:
+                if label in self.channels or label in newChannels:
                     continue
                 # TODO: less kludgy lookup of appropriate channel type
                 if 'm' in ch.lower():
@@ -233,47 +310,18 @@ class ExpSettings(Atom):
                 pc.instrument = awg.label
                 pc.translator = awg.translator
                 pc.samplingRate = awg.samplingRate
-                self.channels[label] = pc
-        self.physicalChannelManager.update_display_list(None)
-
-
-class ScripterEncoder(json.JSONEncoder):
-    """
-    Helper for QLab to encode all the classes for the matlab experiment script.
-    """
-
-    def __init__(self, CWMode=False, **kwargs):
-        super(ScripterEncoder, self).__init__(**kwargs)
-        self.CWMode = CWMode
-
-    def default(self, obj):
-        if isinstance(obj, Atom):
-            #Check for a json_encode option
-            try:
-                jsonDict = obj.json_encode(matlabCompatible=True)
-            except AttributeError:
-                jsonDict = obj.__getstate__()
-            except:
-                print("Unexpected error encoding to JSON")
-                raise
-
-            #Patch up some issues on the JSON dictionary
-            #Matlab doesn't use the label
-            jsonDict.pop('label', None)
-
-            return jsonDict
-
-        else:
-            return super(ScripterEncoder, self).default(obj)
+                newChannels[label] = pc
+        # a single display update for all the new channels
+        self.physicalChannelManager.add_items(newChannels)
 
 
 if __name__ == '__main__':
     import Libraries
 
     from ExpSettingsGUI import ExpSettings
-    expSettings = ExpSettings(sweeps=Libraries.sweepLib,
-                              instruments=Libraries.instrumentLib,
-                              measurements=Libraries.measLib,
+    expSettings = ExpSettings(sweeps=Libraries.sweep_library(),
+                              instruments=Libraries.instrument_library(),
+                              measurements=Libraries.measurement_library(),
                               channels=QGL.ChannelLibrary.channelLib)
 
     # setup on change AWG
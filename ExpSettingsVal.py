@@ -23,23 +23,29 @@ limitations under the License.
 '''
 
 from builtins import str
+from collections import OrderedDict
 import floatbits
 import itertools
+import json
+import os
 import re
+import time
 
-import h5py
 from atom.api import Str
 
 import Sweeps
 import Libraries
+import config
 import QGL.Channels
 import QGL.ChannelLibrary
+from WiringGraph import WiringGraph
 
 
 channels = QGL.ChannelLibrary.channelLib
-instruments = Libraries.instrumentLib.instrDict
-measurements = Libraries.measLib.filterDict
-sweeps = Libraries.sweepLib.sweepDict
+# the libraries are only decoded when a rule first looks at them
+instruments = Libraries.LazyProxy(lambda: Libraries.instrument_library().instrDict)
+measurements = Libraries.LazyProxy(lambda: Libraries.measurement_library().filterDict)
+sweeps = Libraries.LazyProxy(lambda: Libraries.sweep_library().sweepDict)
 
 # The following naming conventions are currently enforced
 # See: https://github.com/BBN-Q/PyQLab/wiki
@@ -108,34 +114,129 @@ def is_channel_type(name, channelType):
 
 
 #####################################################################################
-### Apply global rules
+## Channel library index
 
-def test_require_physical():
-    """Enforces rule requiring physical channels for certain logical channels
+class ChannelIndex(object):
+    """
+    Type partitioned view of the channel and instrument libraries.
 
-       See requires_physical_channel() for list of Channel types requiring a
-       Physical channel.
+    The channels are classified once so the rules below can run in a single
+    pass over each partition instead of re-walking the library and repeating
+    the isinstance lookups for every rule. The logical and physical partitions
+    keep the library order for reporting and are keyed by label so channels
+    can be added and discarded in constant time.
     """
-    errors = []
-    channels = QGL.ChannelLibrary.channelLib
-    testChannels = [channelName for channelName in channels.keys() if requires_physical_channel(channelName)]
+    def __init__(self, channelLib, instrumentDict):
+        self.channels = channelLib
+        self.instruments = instrumentDict
+        self.channelNames = set()
+        self.logical = OrderedDict()
+        self.physical = OrderedDict()
+        self.logicalMarkers = set()
+        self.physicalMarkers = set()
+        self.physicalIQ = set()
+        self.qubits = set()
+        for name in channelLib.keys():
+            self.add_channel(name)
+
+    def add_channel(self, name):
+        chan = self.channels[name]
+        self.channelNames.add(name)
+        if isinstance(chan, QGL.Channels.LogicalChannel):
+            self.logical[name] = None
+            if isinstance(chan, QGL.Channels.LogicalMarkerChannel):
+                self.logicalMarkers.add(name)
+            if isinstance(chan, QGL.Channels.Qubit):
+                self.qubits.add(name)
+        if isinstance(chan, QGL.Channels.PhysicalChannel):
+            self.physical[name] = None
+            if isinstance(chan, QGL.Channels.PhysicalMarkerChannel):
+                self.physicalMarkers.add(name)
+            if isinstance(chan, QGL.Channels.PhysicalQuadratureChannel):
+                self.physicalIQ.add(name)
+
+    def discard_channel(self, name):
+        if name not in self.channelNames:
+            return
+        self.channelNames.discard(name)
+        self.logical.pop(name, None)
+        self.physical.pop(name, None)
+        for partition in (self.logicalMarkers, self.physicalMarkers, self.physicalIQ, self.qubits):
+            partition.discard(name)
+
+def build_index():
+    return ChannelIndex(channels, instruments)
 
-    for channel in testChannels:
-        physicalChannel = channels[channel].physChan
+#####################################################################################
+### Per channel rules
+
+def check_require_physical(index, channel):
+    chan = index.channels[channel]
+    if chan.physChan is None:
+        return ['"{0}" channel "{1}" Physical Channel is not defined'.format(chan.__class__.__name__, channel)]
+    if chan.physChan.label not in index.channelNames:
+        return ['Physical Channel "{0}" not found'.format(chan.physChan.label)]
+    return []
+
+def check_logical_channel(index, channel):
+    chan = index.channels[channel]
+    if not chan.physChan:
+        return []
+    physicalChannelName = chan.physChan.label
+    if physicalChannelName not in index.channelNames:
+        return []
+    if (channel in index.logicalMarkers) != (physicalChannelName in index.physicalMarkers):
+        errorHeader = '{0} Markerness of {1} and {2} do not match'
+        return [errorHeader.format(chan.__class__.__name__, channel, physicalChannelName)]
+    return []
 
-        if physicalChannel is None:
-            errMsg = '"{0}" channel "{1}" Physical Channel is not defined'.format(channels[channel].__class__.__name__, channel)
+def check_physical_channel(index, channel):
+    errors = []
+    instrument = index.channels[channel].instrument
+    if instrument == '':
+        errMsg = 'Physical Channel "{0}" requires an instrument assignment'.format(channel)
+        errors.append(errMsg)
+    elif instrument not in index.instruments:
+        errMsg =  'Physical Channel "{0}" instrument {1} not found'.format(channel, instrument)
+        errors.append(errMsg)
+
+    # test AWG name to channel format
+    if '-' in channel:
+        instrName, instrChan = channel.rsplit('-',1)
+        if instrName not in index.instruments:
+            errMsg =  'Physical Channel "{0}" Label format is invalid. It should be Name-Channel'.format(channel)
             errors.append(errMsg)
-        else:
-            physicalChannelName = channels[channel].physChan.label
-            if physicalChannelName not in channels.keys():
-                errMsg =  'Physical Channel "{0}" not found'.format(physicalChannelName)
+        if instrName != instrument:
+            errMsg =  'Physical Channel "{0}" Label instrName {1} != instrument.label {2}'.format(channel, instrName, instrument)
+            errors.append(errMsg)
+
+        # apply device specific channel namming conventions
+        # force converions of awgChan to unicode so multimethod dispatch will
+        # work with str or unicode
+        if instrument in index.instruments:
+            errMsg = invalid_awg_name_convention(instrument, str(instrChan), index.instruments)
+            if errMsg:
                 errors.append(errMsg)
+    else:
+        errMsg =  'Physical Channel "{0}" Label format is invalid. It should be Name-Channel'.format(channel)
+        errors.append(errMsg)
 
     return errors
 
+#####################################################################################
+### Apply global rules
+
+def test_require_physical(index=None):
+    """Enforces rule requiring physical channels for certain logical channels
+
+       See requires_physical_channel() for list of Channel types requiring a
+       Physical channel.
+    """
+    index = index or build_index()
+    return list(itertools.chain(*[check_require_physical(index, channel) for channel in index.logical]))
+
 ## Apply invidual test based on channel type
-def test_logical_channels():
+def test_logical_channels(index=None):
     """
         Enforces rules applied against logical channels
 
@@ -146,27 +247,10 @@ def test_logical_channels():
         "Markerness" of logical and physical channels must match, i.e.
         LogicalMarkerChannel must map to PhysicalMarkerChannel.
     """
-    errors = []
-    channels = QGL.ChannelLibrary.channelLib
-
-    # require all LogicalMarkerChannels to map to PhysicalMarkerChannels
-    # and require all not LogicalMarkerChannels to map to not PhysicalMarkerChannels
-    logicalChannels = [channelName for channelName in channels.keys() if requires_physical_channel(channelName)]
+    index = index or build_index()
+    return list(itertools.chain(*[check_logical_channel(index, channel) for channel in index.logical]))
 
-    for channel in logicalChannels:
-        errorHeader = '{0} Markerness of {1} and {2} do not match'
-        if not channels[channel].physChan:
-            continue
-        physicalChannelName = channels[channel].physChan.label
-        if physicalChannelName not in channels.keys():
-            continue
-        if is_logicalmarker_channel(channel) != is_physicalmarker_channel(physicalChannelName):
-            errMsg =  errorHeader.format(channels[channel].__class__.__name__, channel, physicalChannelName)
-            errors.append(errMsg)
-
-    return errors
-
-def test_physical_channels():
+def test_physical_channels(index=None):
     """
         Enforces rules applied against physical channels
 
@@ -176,56 +260,39 @@ def test_physical_channels():
         The name of the PhysicalChannel channel must be of the form AWGName-AWGChannel
         Device channels have model specific naming conventions
     """
-    errors = []
-
-    channels = QGL.ChannelLibrary.channelLib
-    physicalChannels = [channelName for channelName in channels.keys() if is_physical_channel(channelName)]
-
-    for channel in physicalChannels:
-        instrument = channels[channel].instrument
-        if instrument == '':
-            errMsg = 'Physical Channel "{0}" requires an instrument assignment'.format(channel)
-            errors.append(errMsg)
-        elif instrument not in instruments.keys():
-            errMsg =  'Physical Channel "{0}" instrument {1} not found'.format(channel, awg)
-            errors.append(errMsg)
-
-        # test AWG name to channel format
-        validName = True
-        validName &= '-' in channel
-        if validName:
-            instrName, instrChan = channel.rsplit('-',1)
-            if instrName not in instruments.keys():
-                errMsg =  'Physical Channel "{0}" Label format is invalid. It should be Name-Channel'.format(channel)
-                errors.append(errMsg)
-            if instrName != instrument:
-                errMsg =  'Physical Channel "{0}" Label instrName {1} != instrument.label {2}'.format(channel, instrName, instrument)
-                errors.append(errMsg)
-
-            # apply device specific channel namming conventions
-            # force converions of awgChan to unicode so multimethod dispatch will
-            # work with str or unicode
-            errMsg = invalid_awg_name_convention(channels[channel].instrument, str(instrChan))
-            if errMsg:
-                errors.append(errMsg)
-        else:
-            errMsg =  'Physical Channel "{0}" Label format is invalid. It should be Name-Channel'.format(channel)
-            errors.append(errMsg)
-
-    return errors
+    index = index or build_index()
+    return list(itertools.chain(*[check_physical_channel(index, channel) for channel in index.physical]))
 
 #####################################################################################
 ## AWG Model Type naming conventions
-def invalid_awg_name_convention_common(label, channelName, conventionList):
+
+# naming conventions are class attributes so they only need converting once per class
+_naming_conventions = {}
+
+def naming_convention(instr):
+    """
+    Return the (list, set) naming convention for the instrument's class.
+    """
+    cls = instr.__class__
+    if cls not in _naming_conventions:
+        getter = getattr(instr, 'get_naming_convention', None)
+        convention = getter() if getter else None
+        _naming_conventions[cls] = (convention, frozenset(convention or []))
+    return _naming_conventions[cls]
+
+def invalid_awg_name_convention_common(label, channelName, conventionList, conventionSet=None):
     errorStr =  'instrument {0} channel name {1} not in convention list {2}'
-    if channelName not in conventionList:
+    if channelName not in (conventionSet if conventionSet is not None else conventionList):
         return errorStr.format(label, channelName, conventionList)
     return None
 
-def invalid_awg_name_convention(awgLabel, channelName):
-    instr = instruments[awgLabel]
-    convention = instr.get_naming_convention()
-    return invalid_awg_name_convention_common(awgLabel, channelName,convention)
+def invalid_awg_name_convention(awgLabel, channelName, instrumentDict=None):
+    instr = (instrumentDict if instrumentDict is not None else instruments)[awgLabel]
+    conventionList, conventionSet = naming_convention(instr)
+    if conventionList is None:
+        # instruments without a naming convention (e.g. digitizers) accept any channel name
+        return None
+    return invalid_awg_name_convention_common(awgLabel, channelName, conventionList, conventionSet)
 
 # GUI validator
 def is_valid_awg_channel_name(channelName):
@@ -244,86 +311,421 @@ def is_valid_instrument_name(label):
     # instrument must be a valid Matlab identifier
     return (MATLAB_VALID_NAME_REGEX.match(label) is not None)
 
-def validate_instrumentLib():
-
-    errors = []
-
-    invalidNames = [instrument for instrument in instruments.keys() if not is_valid_instrument_name(instrument)]
+def check_instrument(name):
+    if not is_valid_instrument_name(name):
+        return ["Instrument name {0} is not a valid Matlab Name".format(name)]
+    return []
 
-    if invalidNames != []:
-        for name in invalidNames:
-            errMsg =  "Instrument name {0} is not a valid Matlab Name".format(name)
-            errors.append(errMsg)
-
-    return errors
+def validate_instrumentLib():
+    return Validator(channels, instruments, sweeps).validate_instrumentLib()
 #####################################################################################
 
-def validate_sweepLib():
-    errors = []
-
-    for key in sweeps.keys():
-        if isinstance(sweeps[key],Sweeps.PointsSweep):
-            try:
-                numPoints = int((sweeps[key].stop - sweeps[key].start)/floatbits.prevfloat(sweeps[key].step)) + 1
-            except ValueError as e:
-                errors.append("Sweep named %s issue computing Num. Points: %s" % (sweeps[key].label,e))
+def check_sweep(sweep):
+    if isinstance(sweep, Sweeps.PointsSweep):
+        try:
+            numPoints = int((sweep.stop - sweep.start)/floatbits.prevfloat(sweep.step)) + 1
+        except ValueError as e:
+            return ["Sweep named %s issue computing Num. Points: %s" % (sweep.label,e)]
+    return []
 
-    return errors
+def validate_sweepLib():
+    return Validator(channels, instruments, sweeps).validate_sweepLib()
 
 
 #####################################################################################
 
-def validate_channelLib():
-    errors = []
-    if 'digitizerTrig' not in channels.keys():
-        errMsg = 'A LogicalMarkerChannel named digitizerTrig is required'
-        errors.append([errMsg])
-
-    # test gate pulses
-
-    if 'slaveTrig' not in channels.keys():
-        errMsg = 'A LogicalMarkerChannel named slaveTrig is required'
-        errors.append([errMsg])
-
-    # test map_logical_to_physical
-    rp_errors = test_require_physical()
-    pc_errors = test_physical_channels()
-    lc_errors = test_logical_channels()
-
-    if pc_errors != []:
-        errors.append(pc_errors)
-    if lc_errors != []:
-        errors.append(lc_errors)
-    if rp_errors != []:
-        errors.append(rp_errors)
+class Validator(object):
+    """
+    Runs the validation rules against the libraries it is given rather than
+    the module globals, so several configurations can be validated safely in
+    one process. The time spent in each rule loop is accumulated in `timings`.
+    """
+    def __init__(self, channelLib, instrumentDict, sweepDict=None):
+        self.channels = channelLib
+        self.instruments = instrumentDict
+        self.sweeps = sweepDict if sweepDict is not None else {}
+        self.timings = {}
+
+    def record_time(self, rule, start):
+        self.timings[rule] = self.timings.get(rule, 0.0) + time.time() - start
+
+    def validate_channelLib(self):
+        errors = []
+        if 'digitizerTrig' not in self.channels.keys():
+            errMsg = 'A LogicalMarkerChannel named digitizerTrig is required'
+            errors.append([errMsg])
+
+        # test gate pulses
+
+        if 'slaveTrig' not in self.channels.keys():
+            errMsg = 'A LogicalMarkerChannel named slaveTrig is required'
+            errors.append([errMsg])
+
+        # classify the channels once and run all per channel rules in a single pass
+        t = time.time()
+        index = ChannelIndex(self.channels, self.instruments)
+        self.record_time('channel_index', t)
+        # timed per loop rather than per call to keep the loops tight
+        t = time.time()
+        rp_errors = []
+        lc_errors = []
+        for channel in index.logical:
+            rp_errors.extend(check_require_physical(index, channel))
+            lc_errors.extend(check_logical_channel(index, channel))
+        self.record_time('logical_channels', t)
+        t = time.time()
+        pc_errors = []
+        for channel in index.physical:
+            pc_errors.extend(check_physical_channel(index, channel))
+        self.record_time('physical_channels', t)
+
+        if pc_errors != []:
+            errors.append(pc_errors)
+        if lc_errors != []:
+            errors.append(lc_errors)
+        if rp_errors != []:
+            errors.append(rp_errors)
+
+        errors = list(itertools.chain(*errors))
+        return errors
+
+    def validate_instrumentLib(self):
+        t = time.time()
+        errors = list(itertools.chain(*[check_instrument(name) for name in self.instruments.keys()]))
+        self.record_time('instrument_names', t)
+        return errors
+
+    def validate_sweepLib(self):
+        t = time.time()
+        errors = list(itertools.chain(*[check_sweep(self.sweeps[key]) for key in self.sweeps.keys()]))
+        self.record_time('sweeps', t)
+        return errors
+
+    def validate_lib(self):
+        errors = []
+
+        channel_errors = self.validate_channelLib()
+        if channel_errors != []:
+            errors.append(channel_errors)
+
+        instrument_errors = self.validate_instrumentLib()
+        if instrument_errors != []:
+            errors.append(instrument_errors)
+
+        sweep_errors = self.validate_sweepLib()
+        if sweep_errors != []:
+           errors.append(sweep_errors)
+
+        errors = list(itertools.chain(*errors))
+        return errors
 
-    errors = list(itertools.chain(*errors))
-    return errors
+def validate_channelLib():
+    return Validator(channels, instruments, sweeps).validate_channelLib()
 
 def validate_dynamic_lib(channelsLib, instrumentLib):
-    global channels
-    global instruments
-    channels = channelsLib
-    instruments = instrumentLib.instrDict
-    return validate_lib()
+    return Validator(channelsLib, instrumentLib.instrDict, sweeps).validate_lib()
 
 def validate_lib():
-    errors = []
-
-    channel_errors = validate_channelLib()
-    if channel_errors != []:
-        errors.append(channel_errors)
+    return Validator(channels, instruments, sweeps).validate_lib()
 
-    instrument_errors = validate_instrumentLib()
-    if instrument_errors != []:
-        errors.append(instrument_errors)
+#####################################################################################
+## Batch validation of saved configurations
 
-    sweep_errors = validate_sweepLib()
-    if sweep_errors != []:
-       errors.append(sweep_errors)
+def snapshot_file_names():
+    """
+    Names of the library files inside a directory written by ExpSettings.save_config.
+    """
+    return {'channels': os.path.basename(config.PyQLabCfg['ChannelLibraryFile']),
+            'instruments': os.path.basename(config.instrumentLibFile),
+            'sweeps': os.path.basename(config.sweepLibFile)}
 
-    errors = list(itertools.chain(*errors))
-    return errors
+def find_snapshots(path):
+    """
+    Return the directories at or below path holding a saved configuration.
+    """
+    fileNames = snapshot_file_names()
+    snapshots = []
+    for dirPath, dirNames, files in os.walk(path):
+        if fileNames['channels'] in files and fileNames['instruments'] in files:
+            snapshots.append(dirPath)
+    return sorted(snapshots)
+
+def validate_snapshot(path):
+    """
+    Load the libraries saved in a snapshot directory and validate them.
+    Returns a JSON serializable report.
+    """
+    from instruments.InstrumentManager import InstrumentLibrary
+    from Sweeps import SweepLibrary
+    import QGL.ChannelLibrary
+
+    fileNames = snapshot_file_names()
+    report = {'snapshot': path, 'errors': [], 'timings': {}}
+    t = time.time()
+    libraries = []
+    try:
+        channelLib = QGL.ChannelLibrary.ChannelLibrary(libFile=os.path.join(path, fileNames['channels']))
+        libraries.append(channelLib)
+        instrumentLib = InstrumentLibrary(libFile=os.path.join(path, fileNames['instruments']))
+        libraries.append(instrumentLib)
+        sweepDict = {}
+        if os.path.isfile(os.path.join(path, fileNames['sweeps'])):
+            sweepLib = SweepLibrary(libFile=os.path.join(path, fileNames['sweeps']))
+            libraries.append(sweepLib)
+            sweepDict = sweepLib.sweepDict
+        report['timings']['load'] = time.time() - t
+
+        validator = Validator(channelLib, instrumentLib.instrDict, sweepDict)
+        report['errors'] = validator.validate_lib()
+        report['timings'].update(validator.timings)
+    except Exception as e:
+        report['exception'] = '{0}: {1}'.format(e.__class__.__name__, e)
+    finally:
+        # the snapshot is read once; do not leave a watcher thread per library behind
+        for lib in libraries:
+            if getattr(lib, 'fileWatcher', None) is not None:
+                lib.fileWatcher.stop()
+    report['valid'] = not report['errors'] and 'exception' not in report
+    report['timings']['total'] = time.time() - t
+    return report
+
+def validate_snapshots(path, processes=None):
+    """
+    Validate every saved configuration below path across a process pool.
+    """
+    import multiprocessing
+    snapshots = find_snapshots(path)
+    t = time.time()
+    if processes == 1 or len(snapshots) < 2:
+        reports = [validate_snapshot(s) for s in snapshots]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            reports = pool.map(validate_snapshot, snapshots)
+        finally:
+            pool.close()
+            pool.join()
+    ruleTimes = {}
+    for report in reports:
+        for rule, elapsed in report['timings'].items():
+            ruleTimes[rule] = ruleTimes.get(rule, 0.0) + elapsed
+    return {'snapshots': reports,
+            'summary': {'count': len(reports),
+                        'invalid': len([r for r in reports if not r['valid']]),
+                        'wallTime': time.time() - t,
+                        'ruleTimes': ruleTimes}}
+
+class ValidationSession(object):
+    """
+    Incremental re-validation of the channel, instrument and sweep libraries.
+
+    Results are cached per item. The session listens to the itemChanged events
+    of the DictManagers and libraries it is attached to, to edits of the
+    physChan/instrument members of the channels it has checked and to edits
+    of the sweeps it has checked, and only
+    re-checks the items touched by a change plus the items depending on them,
+    e.g. renaming an AWG re-checks only the physical channels using it.
+    Items added, removed or replaced without an event are found by comparing
+    the libraries with the items last checked on every call.
+    """
+    def __init__(self, channelLib=None, instrumentDict=None, sweepDict=None):
+        self.channels = channelLib if channelLib is not None else channels
+        self.instruments = instrumentDict if instrumentDict is not None else instruments
+        self.sweeps = sweepDict if sweepDict is not None else sweeps
+        self.index = None
+        # (kind, label) -> {rule: [errors]} for the items that currently have errors
+        self.failures = {}
+        self.dirty = set()
+        # reverse dependencies: physical channel -> logical channels using it,
+        # instrument -> physical channels referring to it
+        self.physChanUsers = {}
+        self.instrumentUsers = {}
+        self.dependencies = {}
+        self.watched = set()
+        # last checked channel object under each label to follow renames made
+        # behind our back (e.g. physical channels renamed with their AWG)
+        self.channelObjects = {}
+        # same for the instruments and sweeps
+        self.instrumentObjects = {}
+        self.sweepObjects = {}
+
+    def attach(self, manager, kind):
+        """
+        Subscribe to the itemChanged events of a DictManager or library.
+        kind is one of 'channel', 'instrument' or 'sweep'.
+        """
+        manager.observe('itemChanged', lambda change: self.item_changed(kind, *change['value']))
+
+    def item_changed(self, kind, action, *labels):
+        if action == 'refresh':
+            # the managed dictionary was changed wholesale
+            self.index = None
+            return
+        for label in labels:
+            self.mark_dirty(kind, label)
+
+    def mark_dirty(self, kind, label):
+        self.dirty.add((kind, label))
+        if kind == 'channel':
+            for user in self.physChanUsers.get(label, ()):
+                self.dirty.add(('channel', user))
+        elif kind == 'instrument':
+            for user in self.instrumentUsers.get(label, ()):
+                self.dirty.add(('channel', user))
+
+    def channel_edited(self, change):
+        self.mark_dirty('channel', change['object'].label)
+
+    def sweep_edited(self, change):
+        self.mark_dirty('sweep', change['object'].label)
+
+    def find_unreported_changes(self):
+        """
+        Mark dirty the items added, removed or replaced without a change event,
+        e.g. by a file watcher reloading a library or a direct write to its
+        dictionary.
+        """
+        for kind, library, checked in [('channel', self.channels, self.channelObjects),
+                                       ('instrument', self.instruments, self.instrumentObjects),
+                                       ('sweep', self.sweeps, self.sweepObjects)]:
+            labels = set(library.keys())
+            for label in labels.symmetric_difference(checked):
+                self.mark_dirty(kind, label)
+            for label, item in checked.items():
+                if label in labels and library[label] is not item:
+                    self.mark_dirty(kind, label)
+
+    def set_dependencies(self, label, physChan, instrumentLabels):
+        oldPhysChan, oldInstruments = self.dependencies.pop(label, (None, ()))
+        if oldPhysChan is not None:
+            self.physChanUsers[oldPhysChan].discard(label)
+        for instr in oldInstruments:
+            self.instrumentUsers[instr].discard(label)
+        if physChan is not None:
+            self.physChanUsers.setdefault(physChan, set()).add(label)
+        for instr in instrumentLabels:
+            self.instrumentUsers.setdefault(instr, set()).add(label)
+        if physChan is not None or instrumentLabels:
+            self.dependencies[label] = (physChan, instrumentLabels)
+
+    def check_channel(self, label, reindex=True):
+        if reindex:
+            self.index.discard_channel(label)
+        self.set_dependencies(label, None, ())
+        oldChan = self.channelObjects.pop(label, None)
+        if oldChan is not None and (label not in self.channels or self.channels[label] is not oldChan):
+            # the channel went away or was renamed: re-check its users and its new label
+            self.mark_dirty('channel', label)
+            self.dirty.discard(('channel', label))
+            if oldChan.label != label:
+                self.mark_dirty('channel', oldChan.label)
+        if label not in self.channels:
+            return {}
+        if reindex:
+            self.index.add_channel(label)
+        chan = self.channels[label]
+        if reindex and oldChan is not chan:
+            # new under this label: its users may have been checked before it was indexed
+            for user in self.physChanUsers.get(label, ()):
+                self.dirty.add(('channel', user))
+        self.channelObjects[label] = chan
+        if id(chan) not in self.watched:
+            for member in ('physChan', 'instrument'):
+                chan.observe(member, self.channel_edited)
+            self.watched.add(id(chan))
+
+        results = {}
+        if label in self.index.logical:
+            physChan = chan.physChan.label if chan.physChan is not None else None
+            self.set_dependencies(label, physChan, ())
+            results['rp'] = check_require_physical(self.index, label)
+            results['lc'] = check_logical_channel(self.index, label)
+        if label in self.index.physical:
+            instrumentLabels = set([chan.instrument])
+            if '-' in label:
+                instrumentLabels.add(label.rsplit('-', 1)[0])
+            self.set_dependencies(label, None, tuple(instrumentLabels))
+            results['pc'] = check_physical_channel(self.index, label)
+        return results
+
+    def check_sweep(self, label):
+        if label not in self.sweeps:
+            self.sweepObjects.pop(label, None)
+            return {}
+        sweep = self.sweeps[label]
+        self.sweepObjects[label] = sweep
+        if id(sweep) not in self.watched and hasattr(sweep, 'members'):
+            for member in sweep.members():
+                if member != 'label':
+                    sweep.observe(member, self.sweep_edited)
+            self.watched.add(id(sweep))
+        return {'sweep': check_sweep(sweep)}
+
+    def check_item(self, kind, label, reindex=True):
+        if kind == 'channel':
+            return self.check_channel(label, reindex)
+        elif kind == 'instrument':
+            if label not in self.instruments:
+                self.instrumentObjects.pop(label, None)
+                return {}
+            self.instrumentObjects[label] = self.instruments[label]
+            return {'instrument': check_instrument(label)}
+        elif kind == 'sweep':
+            return self.check_sweep(label)
+
+    def update(self, kind, label, reindex=True):
+        results = self.check_item(kind, label, reindex)
+        if any(results.values()):
+            self.failures[(kind, label)] = results
+        else:
+            self.failures.pop((kind, label), None)
+
+    def reset(self):
+        self.index = ChannelIndex(self.channels, self.instruments)
+        self.failures = {}
+        self.dirty = set()
+        self.physChanUsers = {}
+        self.instrumentUsers = {}
+        self.dependencies = {}
+        self.channelObjects = {}
+        self.instrumentObjects = {}
+        self.sweepObjects = {}
+        # the index was just built from the whole library
+        for label in list(self.channels.keys()):
+            self.update('channel', label, reindex=False)
+        for label in list(self.instruments.keys()):
+            self.update('instrument', label)
+        for label in list(self.sweeps.keys()):
+            self.update('sweep', label)
+
+    def validate(self, full=False):
+        """
+        Re-check the items changed since the last call and return all current errors
+        in the same order validate_lib() reports them. With full=True (or after a
+        wholesale change) everything is re-checked.
+        """
+        if full or self.index is None:
+            self.reset()
+        else:
+            self.find_unreported_changes()
+            # checking an item can uncover further renamed items
+            while self.dirty:
+                kind, label = self.dirty.pop()
+                self.update(kind, label)
+
+        errors = []
+        if 'digitizerTrig' not in self.channels:
+            errors.append('A LogicalMarkerChannel named digitizerTrig is required')
+        if 'slaveTrig' not in self.channels:
+            errors.append('A LogicalMarkerChannel named slaveTrig is required')
+        libraries = {'channel': self.channels, 'instrument': self.instruments, 'sweep': self.sweeps}
+        for kind, rule in [('channel', 'pc'), ('channel', 'lc'), ('channel', 'rp'),
+                           ('instrument', 'instrument'), ('sweep', 'sweep')]:
+            # report in library order like Validator
+            for label in libraries[kind].keys():
+                if (kind, label) in self.failures:
+                    errors.extend(self.failures[(kind, label)].get(rule, []))
+        return errors
 
 def default_repr(items, item):
     return '\t{0}: {1}'.format(item,
@@ -358,36 +760,9 @@ def list_config():
     print
     list_sweeps()
 
-def draw_wiring_digram():
-
-    topLevelChannels = [channelName for channelName in channels.keys() if requires_physical_channel(channelName)]
-
-    print("digraph Exp {")
-
-    for channel in topLevelChannels:
-        print('"{}"'.format(channel))
-        if channels[channel].physChan is not None:
-            print(' -> "{}"'.format(channels[channel].physChan.label))
-            if channels[channel].physChan.AWG is not None:
-                print(' -> "{}"'.format(channels[channel].physChan.AWG.label))
-
-    typeMap = (
-        (is_logicalmarker_channel,"lightblue"),
-        (is_physicalmarker_channel,"red"),
-        (is_physicalIQ_channel,"blue"),
-        (is_qubit_channel,"yellow"),
-        )
-
-    for lookup, color in typeMap:
-        names = [channelName for channelName in channels.keys() if lookup(channelName)]
-        for channel in names:
-            print("{0} [color={1},style=filled];".format(channel, color))
-
-    instrumentNames = [channelName for channelName in instruments.keys()]
-    for channel in instrumentNames:
-        print("{} [color=green,style=filled];".format(channel))
-
-    print("}")
+def draw_wiring_digram(asJSON=False):
+    graph = WiringGraph(channels, instruments)
+    print(graph.to_json() if asJSON else graph.to_dot())
 
 
 if __name__ == '__main__':
@@ -395,14 +770,33 @@ if __name__ == '__main__':
 
     parser = argparse.ArgumentParser()
     parser.add_argument('-d', dest='draw_digram', action='store_true')
+    parser.add_argument('-g', dest='wiring_json', action='store_true',
+                        help='print the wiring graph as JSON')
     parser.add_argument('-v', dest='validate', action='store_true')
     parser.add_argument('-l', dest='list', action='store_true')
+    parser.add_argument('-b', dest='batch', action='store', default=None,
+                        help='validate all saved configurations below this directory')
+    parser.add_argument('-j', dest='processes', action='store', type=int, default=None,
+                        help='number of worker processes for batch validation')
+    parser.add_argument('-o', dest='report', action='store', default=None,
+                        help='write the batch report to this JSON file instead of stdout')
 
     args = parser.parse_args()
 
+    if args.batch:
+        report = validate_snapshots(args.batch, args.processes)
+        if args.report:
+            with open(args.report, 'w') as FID:
+                json.dump(report, FID, indent=2, sort_keys=True)
+        else:
+            print(json.dumps(report, indent=2, sort_keys=True))
+
     if args.draw_digram:
         draw_wiring_digram()
 
+    if args.wiring_json:
+        draw_wiring_digram(asJSON=True)
+
     if args.validate:
         error = validate_lib()
         print(error)
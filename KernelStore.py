@@ -0,0 +1,149 @@
+"""
+Hash-addressed store for integration kernels.
+
+Kernels and kernel biases are saved as .npy blobs named by the hash of their
+contents, and the instrument library only holds a short reference of the form
+"kernel:<sha1>" instead of a Python literal of the whole array. Library loads
+and file-watcher reloads then parse a few bytes per kernel. Kernels are read
+from disk the first time they are needed and kept in an LRU cache, and their
+base64 encodings for the experiment settings file are memoized as well.
+
+Saved configurations and snapshots carry a copy of the blobs their instrument
+library refers to (see copy_referenced) so they can be moved between machines.
+"""
+import base64
+import hashlib
+import os
+import re
+import shutil
+
+import numpy as np
+
+from LibraryWriter import replace_file
+from processing.integration import LRUCache
+
+PREFIX = 'kernel:'
+
+def is_reference(text):
+    return isinstance(text, str) and text.startswith(PREFIX)
+
+referencePattern = re.compile(PREFIX + r'([0-9a-f]{40})')
+
+def find_references(text):
+    """
+    Digests of the kernels referenced from the text of a library file.
+    """
+    return set(referencePattern.findall(text))
+
+def array_digest(array):
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha1(array.dtype.str.encode('ascii'))
+    digest.update(str(array.shape).encode('ascii'))
+    digest.update(array.tobytes())
+    return digest.hexdigest()
+
+# base64 encodings of kernels still written as Python literals, keyed by the
+# hash of the literal text
+literalEncodings = LRUCache(64)
+
+def text_digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class KernelStore(object):
+
+    def __init__(self, root, maxSize=64):
+        self.root = root
+        self.arrays = LRUCache(maxSize)
+        self.encodings = LRUCache(maxSize)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:] + '.npy')
+
+    def digest(self, reference):
+        if not is_reference(reference):
+            raise ValueError("{0!r} is not a kernel reference".format(reference))
+        return reference[len(PREFIX):]
+
+    def put(self, array):
+        """
+        Store an array and return its reference.
+        """
+        array = np.ascontiguousarray(array)
+        digest = array_digest(array)
+        fileName = self.path(digest)
+        if not os.path.exists(fileName):
+            if not os.path.isdir(os.path.dirname(fileName)):
+                os.makedirs(os.path.dirname(fileName))
+            tmpFile = fileName + '.tmp'
+            with open(tmpFile, 'wb') as FID:
+                np.save(FID, array)
+            replace_file(tmpFile, fileName)
+        return PREFIX + digest
+
+    def copy_to(self, target, digests):
+        """
+        Copy the blobs for digests into the store target, skipping the ones it
+        has already. Returns the digests copied.
+        """
+        copied = []
+        for digest in sorted(digests):
+            fileName = target.path(digest)
+            if os.path.exists(fileName):
+                continue
+            if not os.path.isdir(os.path.dirname(fileName)):
+                os.makedirs(os.path.dirname(fileName))
+            tmpFile = fileName + '.tmp'
+            shutil.copyfile(self.path(digest), tmpFile)
+            replace_file(tmpFile, fileName)
+            copied.append(digest)
+        return copied
+
+    def copy_referenced(self, fileNames, target):
+        """
+        Copy the blobs referenced from the given library files into the store target.
+        """
+        digests = set()
+        for fileName in fileNames:
+            if os.path.isfile(fileName):
+                with open(fileName, 'r') as FID:
+                    digests.update(find_references(FID.read()))
+        return self.copy_to(target, digests)
+
+    def get(self, reference):
+        """
+        The array behind a reference, memory mapped read-only.
+        """
+        digest = self.digest(reference)
+        return self.arrays.get(digest, lambda: np.load(self.path(digest), mmap_mode='r'))
+
+    def encoded(self, reference, dtype=None):
+        """
+        Memoized base64 encoding of the array behind a reference, optionally
+        converted to dtype first.
+        """
+        digest = self.digest(reference)
+        key = (digest, np.dtype(dtype).str if dtype is not None else None)
+        def encode():
+            array = self.get(reference)
+            if dtype is not None:
+                array = np.asarray(array, dtype=dtype)
+            return base64.b64encode(np.ascontiguousarray(array)).decode('ascii')
+        return self.encodings.get(key, encode)
+
+def config_store(path):
+    """
+    The store kept next to a configuration saved to the directory path.
+    """
+    return KernelStore(os.path.join(path, 'kernels'))
+
+_defaultStore = None
+
+def default_store():
+    """
+    The store in the KernelStoreDir of the PyQLab configuration.
+    """
+    global _defaultStore
+    if _defaultStore is None:
+        import config
+        _defaultStore = KernelStore(config.kernelStoreDir)
+    return _defaultStore
@@ -1,17 +1,154 @@
 """
 Holds all the library instances as the one singleton copy.
+
+The libraries are only decoded on first use: `instrumentLib`, `sweepLib` and
+`measLib` are proxies that build the real library the first time one of their
+attributes is touched. Code that needs the actual Atom object (e.g. to pass
+into a Typed member) should call the matching `*_library()` function instead.
 """
-import h5py #bonus h5py import for issue https://github.com/BBN-Q/PyQLab/issues/26
+import json
+import os
+import re
+import sys
+
 import config
-from instruments.InstrumentManager import InstrumentLibrary
-from Sweeps import SweepLibrary
-from MeasFilters import MeasFilterLibrary
-from JSONLibraryUtils import JSONMigrators
-
-migrationMsg = JSONMigrators.migrate_all(config)
-for msg in migrationMsg:
-    print(msg)
-
-instrumentLib = InstrumentLibrary(libFile=config.instrumentLibFile)
-sweepLib = SweepLibrary(libFile=config.sweepLibFile)
-measLib = MeasFilterLibrary(libFile=config.measurementLibFile)
+
+class LazyProxy(object):
+    """
+    Stand-in for an object that is only created by `factory` on first access.
+    Attribute access, item access, membership and iteration are forwarded.
+    """
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+
+    def _target(self):
+        return object.__getattribute__(self, '_factory')()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target(), name, value)
+
+    def __getitem__(self, key):
+        return self._target()[key]
+
+    def __setitem__(self, key, value):
+        self._target()[key] = value
+
+    def __delitem__(self, key):
+        del self._target()[key]
+
+    def __contains__(self, key):
+        return key in self._target()
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def __len__(self):
+        return len(self._target())
+
+    def __repr__(self):
+        return repr(self._target())
+
+_libraries = {}
+_migrated = False
+
+# version member defaults of the library classes, kept here so the migration
+# check does not have to import (and so load) every library module
+libraryVersions = {'instruments': 3, 'sweeps': 1, 'measurements': 1}
+
+def _library_versions():
+    """
+    (library file, current version) for each library the migrators know about.
+    """
+    versions = [(config.instrumentLibFile, libraryVersions['instruments']),
+                (config.sweepLibFile, libraryVersions['sweeps']),
+                (config.measurementLibFile, libraryVersions['measurements'])]
+    if 'ChannelLibraryFile' in config.PyQLabCfg:
+        # QGL loads its channel library when the module is imported, so only
+        # ask the class when that has happened already; otherwise the version
+        # is unknown and the file is left to the migrators
+        version = None
+        channelLibrary = sys.modules.get('QGL.ChannelLibrary')
+        if channelLibrary is not None:
+            member = channelLibrary.ChannelLibrary.members().get('version')
+            version = member.default_value_mode[1] if member is not None else None
+        versions.append((os.path.abspath(config.PyQLabCfg['ChannelLibraryFile']), version))
+    return versions
+
+def file_version(fileName):
+    """
+    The version field of a library file, None if it has none or cannot be read.
+    Files written by LibraryWriter have the top level keys indented by two
+    spaces, so the field is found without decoding the whole file.
+    """
+    try:
+        with open(fileName, 'r') as FID:
+            text = FID.read()
+    except IOError:
+        return None
+    match = re.search(r'^  "version": (\d+)', text, re.MULTILINE)
+    if match:
+        return int(match.group(1))
+    try:
+        version = json.loads(text).get('version')
+    except (ValueError, AttributeError):
+        return None
+    return version if isinstance(version, int) else None
+
+def needs_migration(libraries):
+    """
+    Whether any existing library file in the (file, current version) pairs is
+    older than its current version, or does not say which version it is.
+    """
+    for fileName, currentVersion in libraries:
+        if not os.path.exists(fileName):
+            continue
+        version = file_version(fileName)
+        if currentVersion is None or version is None or version < currentVersion:
+            return True
+    return False
+
+def migrate_libraries():
+    """
+    Run the JSON migrators at most once per process, and only when one of the
+    library files is older than the current library version.
+    """
+    global _migrated
+    if _migrated:
+        return
+    _migrated = True
+
+    if not needs_migration(_library_versions()):
+        return
+
+    from JSONLibraryUtils import JSONMigrators
+    migrationMsg = JSONMigrators.migrate_all(config)
+    for msg in migrationMsg:
+        print(msg)
+
+def instrument_library():
+    if 'instruments' not in _libraries:
+        migrate_libraries()
+        from instruments.InstrumentManager import InstrumentLibrary
+        _libraries['instruments'] = InstrumentLibrary(libFile=config.instrumentLibFile, useCache=config.libraryCache)
+    return _libraries['instruments']
+
+def sweep_library():
+    if 'sweeps' not in _libraries:
+        migrate_libraries()
+        from Sweeps import SweepLibrary
+        _libraries['sweeps'] = SweepLibrary(libFile=config.sweepLibFile, useCache=config.libraryCache)
+    return _libraries['sweeps']
+
+def measurement_library():
+    if 'measurements' not in _libraries:
+        migrate_libraries()
+        from MeasFilters import MeasFilterLibrary
+        _libraries['measurements'] = MeasFilterLibrary(libFile=config.measurementLibFile, useCache=config.libraryCache)
+    return _libraries['measurements']
+
+instrumentLib = LazyProxy(instrument_library)
+sweepLib = LazyProxy(sweep_library)
+measLib = LazyProxy(measurement_library)
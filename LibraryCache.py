@@ -0,0 +1,70 @@
+"""
+Sidecar binary cache for decoded JSON libraries.
+
+Decoding a library with LibraryCoders.LibraryDecoder rebuilds every Atom object
+from its x__class__/x__module__ strings, which is slow for large instrument
+libraries. The decoded state is pickled next to the JSON file and reused as long
+as the JSON file still has the same size, mtime and content hash. The JSON file
+remains the source of truth; a missing or stale cache is simply ignored.
+"""
+import hashlib
+import os
+import pickle
+
+from LibraryWriter import replace_file
+
+CACHE_SUFFIX = '.cache'
+CACHE_FORMAT = 1
+
+def cache_file(libFile):
+    return libFile + CACHE_SUFFIX
+
+def file_key(libFile, withHash=True):
+    """
+    Return the (size, mtime, sha1) key identifying the contents of libFile.
+    """
+    st = os.stat(libFile)
+    digest = None
+    if withHash:
+        with open(libFile, 'rb') as FID:
+            digest = hashlib.sha1(FID.read()).hexdigest()
+    return {'format': CACHE_FORMAT, 'size': st.st_size, 'mtime': st.st_mtime, 'sha1': digest}
+
+def load(libFile):
+    """
+    Return the cached decoded state for libFile or None if there is no valid cache.
+    """
+    try:
+        with open(cache_file(libFile), 'rb') as FID:
+            header = pickle.load(FID)
+            if header.get('format') != CACHE_FORMAT:
+                return None
+            # cheap check first, then fall back to comparing the content hash
+            # so that a touched but otherwise unchanged file still hits
+            key = file_key(libFile, withHash=False)
+            if (key['size'], key['mtime']) != (header['size'], header['mtime']):
+                if key['size'] != header['size'] or file_key(libFile)['sha1'] != header['sha1']:
+                    return None
+            return pickle.load(FID)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+def store(libFile, state):
+    """
+    Pickle the decoded state for libFile into its sidecar cache file.
+    """
+    try:
+        header = file_key(libFile)
+        tmpFile = cache_file(libFile) + '.tmp'
+        with open(tmpFile, 'wb') as FID:
+            pickle.dump(header, FID, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, FID, pickle.HIGHEST_PROTOCOL)
+        replace_file(tmpFile, cache_file(libFile))
+    except (IOError, OSError, pickle.PicklingError) as e:
+        print("WARNING: could not write library cache for {0}: {1}".format(libFile, e))
+
+def invalidate(libFile):
+    try:
+        os.remove(cache_file(libFile))
+    except OSError:
+        pass
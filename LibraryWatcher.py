@@ -0,0 +1,64 @@
+"""
+Watch a library file for changes written by other processes.
+
+Same interface as JSONLibraryUtils.FileWatcher.LibraryFileWatcher, but besides
+modifications of the file it also reacts to files created or moved onto its
+path. LibraryWriter replaces a library by renaming a temporary file over it,
+which watchdog reports as a move onto the library path rather than as a
+modification of it.
+"""
+import os
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+def _same_path(a, b):
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+class LibraryEventHandler(FileSystemEventHandler):
+
+    def __init__(self, filePath, callback):
+        super(LibraryEventHandler, self).__init__()
+        self.filePath = filePath
+        self.callback = callback
+        self.paused = True
+
+    def notify(self, path):
+        if not self.paused and _same_path(path, self.filePath) and self.callback:
+            self.callback()
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.notify(event.src_path)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.notify(event.src_path)
+
+    def on_moved(self, event):
+        # an atomic replace shows up as the temporary file moving onto the library
+        if not event.is_directory:
+            self.notify(event.dest_path)
+
+class LibraryFileWatcher(object):
+
+    def __init__(self, filePath, callback):
+        super(LibraryFileWatcher, self).__init__()
+        self.filePath = os.path.abspath(filePath)
+        self.eventHandler = LibraryEventHandler(self.filePath, callback)
+        self.observer = Observer()
+        self.watch = self.observer.schedule(self.eventHandler, path=os.path.dirname(self.filePath))
+        self.observer.start()
+        self.resume()
+
+    def pause(self):
+        self.eventHandler.paused = True
+
+    def resume(self):
+        self.eventHandler.paused = False
+
+    def stop(self):
+        self.pause()
+        if self.observer.is_alive():
+            self.observer.stop()
+            self.observer.join()
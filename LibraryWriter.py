@@ -0,0 +1,99 @@
+"""
+Change-aware, atomic writing of the JSON library files.
+
+The libraries are encoded to text and fingerprinted. If the fingerprint matches
+the last write to the same file, and that file has not been touched since, or
+matches what is on disk, the write is skipped so file watchers in other
+processes are not woken up for nothing. Otherwise the text is written to a temporary file in the same
+directory and renamed over the target so readers never see a half-written file.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+def replace_file(src, dst):
+    """
+    Atomically move src over dst.
+    """
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+    else:
+        # Python 2: rename is atomic on POSIX but refuses to clobber on Windows
+        if os.name == 'nt' and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+def encode_library(lib):
+    # only needed for the libraries; the helpers above and below work on any text
+    from JSONLibraryUtils import LibraryCoders
+    return json.dumps(lib, cls=LibraryCoders.LibraryEncoder, indent=2, sort_keys=True)
+
+def fingerprint(text):
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return hashlib.sha1(text).hexdigest()
+
+def file_fingerprint(fileName):
+    try:
+        with open(fileName, 'rb') as FID:
+            return fingerprint(FID.read())
+    except (IOError, OSError):
+        return None
+
+def _stat_key(fileName):
+    try:
+        st = os.stat(fileName)
+        return (st.st_size, st.st_mtime)
+    except OSError:
+        return None
+
+def _file_mode(fileName):
+    try:
+        return os.stat(fileName).st_mode & 0o777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+def write_if_changed(fileName, text, fingerprints):
+    """
+    Atomically write text to fileName unless it is what we last wrote there.
+
+    fingerprints is a dictionary owned by the caller mapping file names to the
+    fingerprint and stat of the last write. Without an entry for fileName, or
+    when the file was touched since, the file on disk is hashed instead.
+    Returns True if the file was written.
+    """
+    fileName = os.path.abspath(fileName)
+    digest = fingerprint(text)
+    last = fingerprints.get(fileName)
+    if last is not None and last[1] == _stat_key(fileName):
+        if last[0] == digest:
+            return False
+    elif file_fingerprint(fileName) == digest:
+        fingerprints[fileName] = (digest, _stat_key(fileName))
+        return False
+
+    FID = tempfile.NamedTemporaryFile(mode='w', dir=os.path.dirname(fileName),
+                                      prefix='.' + os.path.basename(fileName),
+                                      suffix='.tmp', delete=False)
+    try:
+        with FID:
+            FID.write(text)
+            FID.flush()
+            os.fsync(FID.fileno())
+        # keep the permissions of the file we replace rather than the private
+        # ones NamedTemporaryFile creates with
+        os.chmod(FID.name, _file_mode(fileName))
+        replace_file(FID.name, fileName)
+    except:
+        if os.path.exists(FID.name):
+            os.remove(FID.name)
+        raise
+
+    fingerprints[fileName] = (digest, _stat_key(fileName))
+    return True
+
+def write_library(lib, fileName, fingerprints):
+    return write_if_changed(fileName, encode_library(lib), fingerprints)
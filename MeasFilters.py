@@ -3,12 +3,12 @@ Measurement filters
 """
 
 from atom.api import Atom, Int, Float, List, Str, Dict, Bool, Enum, Coerced, Typed, observe, Instance
-import enaml
-from enaml.qt.qt_application import QtApplication
 
 from DictManager import DictManager
 import json
 from JSONLibraryUtils import LibraryCoders
+import LibraryCache
+import LibraryWriter
 
 class MeasFilter(Atom):
     label = Str()
@@ -54,21 +54,50 @@ class KernelIntegration(MeasFilter):
     IFfreq = Float(10e6)
     samplingRate = Float(250e6)
 
+    def kernel_key(self):
+        if self.simpleKernel:
+            return ('boxcar', self.boxCarStart, self.boxCarStop, self.IFfreq, self.samplingRate)
+        else:
+            return ('kernel', self.kernel)
+
+    def build_kernel(self):
+        import numpy as np
+        if self.simpleKernel:
+            kernel = np.hstack((np.zeros(self.boxCarStart, dtype=np.complex128), np.ones(self.boxCarStop-self.boxCarStart)))
+            kernel *= np.exp(1j*2*np.pi*self.IFfreq*np.arange(self.boxCarStop)/self.samplingRate)
+            return kernel
+        else:
+            return eval(self.kernel)
+
+    def get_kernel(self):
+        """
+        The integration kernel as a read-only numpy array: either the boxcar
+        times the I.F. phasor or the evaluated kernel string. Kernels are
+        memoized on the parameters they are built from.
+        """
+        from processing.integration import kernelCache
+        return kernelCache.get(self.kernel_key(), self.build_kernel)
+
+    def kernel_arrays(self):
+        """
+        Kernels keyed by the name of the field they replace in the encoded filter.
+        """
+        import numpy as np
+        try:
+            kernel = np.asarray(self.get_kernel(), dtype=np.complex128)
+        except:
+            kernel = np.zeros(0, dtype=np.complex128)
+        return {'kernel': kernel}
+
     def json_encode(self, matlabCompatible=False):
         jsonDict = super(KernelIntegration, self).json_encode(matlabCompatible)
         if matlabCompatible:
             # re-encode kernel in base64
             jsonDict.pop('kernel')
 
-            import numpy as np
             import base64
             try:
-                if self.simpleKernel:
-                    kernel = np.hstack((np.zeros(self.boxCarStart, dtype=np.complex), np.ones(self.boxCarStop-self.boxCarStart)))
-                    kernel *= np.exp(1j*2*np.pi*self.IFfreq*np.arange(self.boxCarStop)/self.samplingRate)
-                    kernel = base64.b64encode(kernel).decode('ascii')
-                else:
-                    kernel = base64.b64encode(eval(self.kernel)).decode('ascii')
+                kernel = base64.b64encode(self.get_kernel()).decode('ascii')
             except:
                 kernel = []
             jsonDict['kernel'] = kernel
@@ -105,6 +134,8 @@ class MeasFilterLibrary(Atom):
     libFile = Str().tag(transient=True)
     filterManager = Typed(DictManager)
     version = Int(1)
+    useCache = Bool(False).tag(transient=True)
+    fileFingerprints = Dict().tag(transient=True)
 
     def __init__(self, **kwargs):
         super(MeasFilterLibrary, self).__init__(**kwargs)
@@ -119,11 +150,16 @@ class MeasFilterLibrary(Atom):
         libFileName = fileName if fileName != None else self.libFile
 
         if libFileName:
-            with open(libFileName, 'w') as FID:
-                json.dump(self, FID, cls=LibraryCoders.LibraryEncoder, indent=2, sort_keys=True)
+            LibraryWriter.write_library(self, libFileName, self.fileFingerprints)
 
     def load_from_library(self):
         if self.libFile:
+            if self.useCache:
+                cached = LibraryCache.load(self.libFile)
+                if cached is not None:
+                    self.filterDict.update(cached['filterDict'])
+                    self.version = cached['version']
+                    return
             try:
                 with open(self.libFile, 'r') as FID:
                     tmpLib = json.load(FID, cls=LibraryCoders.LibraryDecoder)
@@ -138,6 +174,9 @@ class MeasFilterLibrary(Atom):
                         self.filterDict.update(tmpLib.filterDict)
                         # grab library version
                         self.version = tmpLib.version
+                        if self.useCache:
+                            LibraryCache.store(self.libFile, {'filterDict': tmpLib.filterDict,
+                                                              'version': tmpLib.version})
             except IOError:
                 print("No measurement library found.")
 
@@ -154,6 +193,8 @@ class MeasFilterLibrary(Atom):
 measFilterList = [RawStream, DigitalDemod, KernelIntegration, Correlator, StateComparator, StreamSelector]
 
 if __name__ == "__main__":
+    import enaml
+    from enaml.qt.qt_application import QtApplication
 
     #Work around annoying problem with multiple class definitions
     from MeasFilters import DigitalDemod, Correlator, MeasFilterLibrary
@@ -0,0 +1,94 @@
+"""
+Encoders for the experiment settings file read by the Matlab experiment scripter.
+
+ScripterEncoder writes the JSON settings file and ScripterHDF5Writer the same
+layout as HDF5. They only depend on the library objects, not on the GUI.
+"""
+import json
+
+import h5py
+import numpy as np
+from atom.api import Atom
+
+
+class ScripterEncoder(json.JSONEncoder):
+    """
+    Helper for QLab to encode all the classes for the matlab experiment script.
+    """
+
+    def __init__(self, CWMode=False, **kwargs):
+        super(ScripterEncoder, self).__init__(**kwargs)
+        self.CWMode = CWMode
+
+    def default(self, obj):
+        if isinstance(obj, Atom):
+            #Check for a json_encode option
+            try:
+                jsonDict = obj.json_encode(matlabCompatible=True)
+            except AttributeError:
+                jsonDict = obj.__getstate__()
+            except:
+                print("Unexpected error encoding to JSON")
+                raise
+
+            #Patch up some issues on the JSON dictionary
+            #Matlab doesn't use the label
+            jsonDict.pop('label', None)
+
+            return jsonDict
+
+        else:
+            return super(ScripterEncoder, self).default(obj)
+
+
+class ScripterHDF5Writer(object):
+    """
+    Write the experiment settings with the same layout as ScripterEncoder, but
+    to HDF5. Dictionaries become groups, scalar settings become attributes, and
+    kernels and numeric lists become datasets. Kernels are stored as contiguous,
+    uncompressed complex128 datasets so readers can memory-map them.
+    """
+
+    def __init__(self, CWMode=False):
+        self.encoder = ScripterEncoder(CWMode=CWMode)
+
+    def write(self, obj, fileName):
+        with h5py.File(fileName, 'w') as FID:
+            self.write_group(FID, self.encode(obj))
+
+    def encode(self, obj):
+        if not isinstance(obj, Atom):
+            return obj
+        jsonDict = self.encoder.default(obj)
+        # swap the base64 kernel strings for the arrays themselves
+        if hasattr(obj, 'kernel_arrays'):
+            jsonDict.update(obj.kernel_arrays())
+        return jsonDict
+
+    def write_group(self, group, jsonDict):
+        for key, value in jsonDict.items():
+            key = str(key)
+            value = self.encode(value)
+            if isinstance(value, dict):
+                self.write_group(group.create_group(key), value)
+            elif isinstance(value, np.ndarray):
+                group.create_dataset(key, data=value)
+            elif isinstance(value, (list, tuple)):
+                self.write_list(group, key, value)
+            elif value is None:
+                group.attrs[key] = h5py.Empty('f')
+            else:
+                group.attrs[key] = value
+
+    def write_list(self, group, key, value):
+        value = [self.encode(v) for v in value]
+        if all(isinstance(v, str) for v in value) and value:
+            group.attrs[key] = value
+        elif all(np.isscalar(v) and not isinstance(v, str) for v in value):
+            group.create_dataset(key, data=np.array(value, dtype=None if value else float))
+        else:
+            # nested structures (e.g. lists of dictionaries) keep their order
+            # as numbered sub-groups
+            subgroup = group.create_group(key)
+            subgroup.attrs['x__list__'] = len(value)
+            self.write_group(subgroup, {str(ct): v for ct, v in enumerate(value)})
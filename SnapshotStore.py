@@ -0,0 +1,184 @@
+"""
+Content-addressed store for configuration snapshots.
+
+A snapshot records the library and experiment settings files saved by a
+calibration run. Every file is split into one blob per library item (each
+instrument, channel, sweep, ...) addressed by the hash of its JSON, plus a
+small manifest with the remaining top-level values. Items that did not change
+between runs are stored once no matter how many snapshots refer to them.
+
+Restoring a snapshot only rewrites the working files whose contents differ,
+and two snapshots can be compared item by item from their manifests alone.
+
+The integration kernels the instrument library refers to by hash are kept in
+a KernelStore inside the snapshot store.
+"""
+import hashlib
+import json
+import os
+
+import KernelStore
+import LibraryWriter
+
+def canonical_text(jsonDict):
+    # same layout as the library writers so restored files match written ones
+    return json.dumps(jsonDict, indent=2, sort_keys=True)
+
+def text_hash(text):
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return hashlib.sha1(text).hexdigest()
+
+def is_item_dict(value):
+    return isinstance(value, dict) and len(value) > 0 and all(isinstance(v, dict) for v in value.values())
+
+class SnapshotStore(object):
+
+    def __init__(self, root):
+        self.root = root
+        self.objectDir = os.path.join(root, 'objects')
+        self.snapshotDir = os.path.join(root, 'snapshots')
+        self.kernelDir = os.path.join(root, 'kernels')
+        for path in [self.objectDir, self.snapshotDir]:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+    #####################################################################################
+    ## Blobs
+
+    def blob_path(self, digest):
+        return os.path.join(self.objectDir, digest[:2], digest[2:])
+
+    def put_blob(self, value):
+        text = json.dumps(value, sort_keys=True, separators=(',', ':'))
+        digest = text_hash(text)
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            LibraryWriter.write_if_changed(path, text, {})
+        return digest
+
+    def get_blob(self, digest):
+        with open(self.blob_path(digest), 'r') as FID:
+            return json.load(FID)
+
+    def kernel_store(self):
+        return KernelStore.KernelStore(self.kernelDir)
+
+    #####################################################################################
+    ## Snapshots
+
+    def manifest_path(self, name):
+        return os.path.join(self.snapshotDir, name + '.json')
+
+    def list_snapshots(self):
+        return sorted(os.path.splitext(f)[0] for f in os.listdir(self.snapshotDir) if f.endswith('.json'))
+
+    def load_manifest(self, name):
+        with open(self.manifest_path(name), 'r') as FID:
+            return json.load(FID)
+
+    def split_file(self, fileName):
+        with open(fileName, 'r') as FID:
+            jsonDict = json.load(FID)
+        entry = {'sha1': text_hash(canonical_text(jsonDict)), 'values': {}, 'items': {}}
+        for key, value in jsonDict.items():
+            if is_item_dict(value):
+                entry['items'][key] = {label: self.put_blob(item) for label, item in value.items()}
+            else:
+                entry['values'][key] = value
+        return entry
+
+    def save(self, name, fileNames, overwrite=False, kernelStore=None):
+        """
+        Store the given files as snapshot `name`. Files are keyed by base name.
+        An existing snapshot of the same name is only replaced with overwrite.
+        The kernels the files refer to are copied from kernelStore, if given.
+        """
+        if not overwrite and os.path.exists(self.manifest_path(name)):
+            raise ValueError("Snapshot {0} already exists".format(name))
+        if kernelStore is not None:
+            kernelStore.copy_referenced(fileNames, self.kernel_store())
+        manifest = {'files': {}}
+        for fileName in fileNames:
+            manifest['files'][os.path.basename(fileName)] = self.split_file(fileName)
+        LibraryWriter.write_if_changed(self.manifest_path(name), canonical_text(manifest), {})
+        return manifest
+
+    def import_directory(self, name, path, overwrite=False):
+        """
+        Store a directory written by ExpSettings.save_config as snapshot `name`.
+        """
+        fileNames = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.json')]
+        return self.save(name, fileNames, overwrite, KernelStore.config_store(path))
+
+    def assemble(self, entry):
+        jsonDict = dict(entry['values'])
+        for key, items in entry['items'].items():
+            jsonDict[key] = {label: self.get_blob(digest) for label, digest in items.items()}
+        return jsonDict
+
+    def restore(self, name, targets, kernelStore=None):
+        """
+        Write the files of snapshot `name` to the paths given by `targets`, a
+        dictionary from file base name to path. Files whose current contents
+        already match the snapshot, whatever their layout, are left alone.
+        The kernels the files refer to are copied into kernelStore, if given.
+        Returns the paths written.
+        """
+        manifest = self.load_manifest(name)
+        written = []
+        for baseName, entry in sorted(manifest['files'].items()):
+            if baseName not in targets:
+                continue
+            target = targets[baseName]
+            try:
+                with open(target, 'r') as FID:
+                    current = canonical_text(json.load(FID))
+            except (IOError, ValueError):
+                current = None
+            unchanged = current is not None and text_hash(current) == entry['sha1']
+            text = current if unchanged else canonical_text(self.assemble(entry))
+            if kernelStore is not None:
+                # before the file so a reload of the library finds its kernels
+                self.kernel_store().copy_to(kernelStore, KernelStore.find_references(text))
+            if unchanged:
+                continue
+            LibraryWriter.write_if_changed(target, text, {})
+            written.append(target)
+        return written
+
+    def diff(self, nameA, nameB):
+        """
+        Structural difference between two snapshots computed from the manifests:
+        for every file, the items added, removed or changed and the top-level
+        values that differ.
+        """
+        filesA = self.load_manifest(nameA)['files']
+        filesB = self.load_manifest(nameB)['files']
+        result = {}
+        for baseName in sorted(set(filesA) | set(filesB)):
+            if baseName not in filesA or baseName not in filesB:
+                result[baseName] = 'added' if baseName in filesB else 'removed'
+                continue
+            entryA, entryB = filesA[baseName], filesB[baseName]
+            if entryA['sha1'] == entryB['sha1']:
+                continue
+            fileDiff = {}
+            for key in sorted(set(entryA['values']) | set(entryB['values'])):
+                if entryA['values'].get(key) != entryB['values'].get(key):
+                    fileDiff.setdefault('values', []).append(key)
+            for key in sorted(set(entryA['items']) | set(entryB['items'])):
+                itemsA = entryA['items'].get(key, {})
+                itemsB = entryB['items'].get(key, {})
+                changes = {
+                    'added': sorted(set(itemsB) - set(itemsA)),
+                    'removed': sorted(set(itemsA) - set(itemsB)),
+                    'changed': sorted(l for l in set(itemsA) & set(itemsB) if itemsA[l] != itemsB[l])
+                }
+                changes = {k: v for k, v in changes.items() if v}
+                if changes:
+                    fileDiff.setdefault('items', {})[key] = changes
+            result[baseName] = fileDiff
+        return result
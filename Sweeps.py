@@ -4,8 +4,6 @@ Various sweeps for scanning experiment parameters
 
 from atom.api import Atom, Str, Float, Int, Bool, Dict, List, Enum, \
     Coerced, Property, Typed, observe, cached_property, Int
-import enaml
-from enaml.qt.qt_application import QtApplication
 
 from instruments.MicrowaveSources import MicrowaveSource
 from instruments.Instrument import Instrument
@@ -14,9 +12,13 @@ from instruments.plugins import find_plugins
 from DictManager import DictManager
 
 import numpy as np
+import base64
+import itertools
 import json
 import floatbits
 from JSONLibraryUtils import LibraryCoders
+import LibraryCache
+import LibraryWriter
 
 class Sweep(Atom):
     label = Str()
@@ -35,6 +37,38 @@ class Sweep(Atom):
             jsonDict['x__module__'] = self.__class__.__module__
         return jsonDict
 
+    def get_points(self):
+        """
+        Return the values the sweep steps through as a NumPy array.
+
+        Subclasses override this; the default covers sweep plugins that only
+        declare the usual point members: a points list, start/stop with
+        numPoints or step, or numRepeats.
+        """
+        members = self.members()
+        if 'points' in members and len(self.points):
+            return np.asarray(self.points)
+        if 'start' in members and 'stop' in members:
+            if 'numPoints' in members:
+                return np.linspace(self.start, self.stop, self.numPoints)
+            if 'step' in members and self.step:
+                return np.arange(self.start, self.stop + 0.5*self.step, self.step)
+        if 'numRepeats' in members:
+            return np.arange(1, self.numRepeats+1)
+        if not self.defines_points():
+            raise TypeError("{} neither defines get_points nor the usual point members".format(self.__class__.__name__))
+        raise ValueError("{} has no sweep points set".format(self.label or self.__class__.__name__))
+
+    @classmethod
+    def defines_points(cls):
+        """
+        Whether get_points works for the class, either overridden or from the default point members.
+        """
+        members = cls.members()
+        overridden = any('get_points' in vars(base) for base in cls.__mro__[:cls.__mro__.index(Sweep)])
+        return (overridden or 'points' in members or 'numRepeats' in members or
+                ('start' in members and 'stop' in members and ('numPoints' in members or 'step' in members)))
+
 class PointsSweep(Sweep):
     """
     A class for sweeps with floating points with one instrument.
@@ -62,11 +96,27 @@ class PointsSweep(Sweep):
             # update the step to keep numPoints fixed
             self.get_member('step').reset(self)
 
+    def get_points(self):
+        return np.linspace(self.start, self.stop, self.numPoints)
+
 class Power(PointsSweep):
     label = Str(default='Power')
     instr = Str()
     units = Enum('dBm', 'Watts').tag(desc='Logarithmic or linear power sweep')
 
+    def get_points(self, units=None):
+        """
+        Sweep points in the sweep's own units or converted to `units` ('dBm' or 'Watts').
+        """
+        points = super(Power, self).get_points()
+        if units is None or units == self.units:
+            return points
+        if units == 'Watts':
+            return 1e-3 * 10**(points/10)
+        elif units == 'dBm':
+            return 10*np.log10(points/1e-3)
+        raise ValueError("Unknown power units {}".format(units))
+
 class Frequency(PointsSweep):
     label = Str(default='Frequency')
     instr = Str()
@@ -77,15 +127,49 @@ class HeterodyneFrequency(PointsSweep):
     instr2 = Str()
     diffFreq = Float(10.0e-3).tag(desc="IF frequency (GHz)")
 
+    def get_points(self):
+        """
+        (numPoints, 2) array of the (instr1, instr2) frequency pairs.
+        """
+        freqs = super(HeterodyneFrequency, self).get_points()
+        return np.column_stack((freqs, freqs + self.diffFreq))
+
+def encode_points(points):
+    """
+    Compact JSON form of a points array. Arithmetic progressions that decode
+    back to exactly the same values are stored as start/step/count, anything
+    else longer than a couple of points as base64 encoded float64 data.
+    """
+    if points.size < 3:
+        return points.tolist()
+    start = float(points[0])
+    step = float(points[-1] - points[0]) / (points.size - 1)
+    encoded = {'start': start, 'step': step, 'count': int(points.size)}
+    if np.array_equal(points, decode_points(encoded)):
+        return encoded
+    return {'dtype': 'float64', 'data': base64.b64encode(points.astype(np.float64).tobytes()).decode('ascii')}
+
+def decode_points(value):
+    """
+    Inverse of encode_points; also accepts plain lists and arrays.
+    """
+    if isinstance(value, dict):
+        if 'step' in value:
+            return value['start'] + value['step'] * np.arange(value['count'], dtype=np.float64)
+        return np.frombuffer(base64.b64decode(value['data']), dtype=value['dtype']).astype(np.float64)
+    return np.array(value, dtype=np.float64).ravel()
+
 class SegmentNum(PointsSweep):
     label = Str(default='SegmentNum')
-    points = List()
+    points = Coerced(np.ndarray, factory=lambda: np.zeros(0), coercer=decode_points)
     usePointsList = Bool(False)
 
     def json_encode(self, matlabCompatible=False):
         jsonDict = super(SegmentNum, self).json_encode(matlabCompatible)
         if not matlabCompatible:
+            jsonDict['points'] = encode_points(self.points)
             return jsonDict
+        jsonDict['points'] = self.points.tolist()
         usePointsList = jsonDict.pop('usePointsList')
         if usePointsList:
             del jsonDict['start']
@@ -96,6 +180,11 @@ class SegmentNum(PointsSweep):
             del jsonDict['points']
         return jsonDict
 
+    def get_points(self):
+        if self.usePointsList:
+            return self.points
+        return super(SegmentNum, self).get_points()
+
 class SegmentNumWithCals(SegmentNum):
     label = Str(default='SegmentNumWithCals')
     numCals = Int(0)
@@ -106,20 +195,34 @@ class SegmentNumWithCals(SegmentNum):
             # pose as a normal SegmentNum sweep with a few extra points
             jsonDict['type'] = 'SegmentNum'
             if self.usePointsList:
-                # approximate a step from end points
-                step = (self.points[-1] - self.points[0]) / max(1, len(self.points)-1)
-                extra_points = self.points[-1] + np.arange(1, self.numCals+1) * step
-                jsonDict['points'] = self.points + list(extra_points)
+                jsonDict['points'] = self.get_points().tolist()
             else:
                 jsonDict['stop'] = self.stop + self.step * self.numCals
                 jsonDict['numPoints'] = self.numPoints + self.numCals
         return jsonDict
 
+    def get_points(self):
+        """
+        Segment points followed by numCals calibration points continuing at the same step.
+        """
+        points = super(SegmentNumWithCals, self).get_points()
+        if self.numCals == 0 or points.size == 0:
+            return points
+        if self.usePointsList:
+            # approximate a step from end points
+            step = (points[-1] - points[0]) / max(1, points.size-1)
+        else:
+            step = self.step
+        return np.hstack((points, points[-1] + np.arange(1, self.numCals+1) * step))
+
 class Repeat(Sweep):
     label = Str(default='Repeat')
     numRepeats = Int(1).tag(desc='How many times to loop.')
     delay = Float(1.0).tag(desc='delay between repeats in seconds')
 
+    def get_points(self):
+        return np.arange(1, self.numRepeats+1)
+
 class AWGChannel(PointsSweep):
     label = Str(default='AWGChannel')
     channel = Enum('1','2','3','4','1&2','3&4').tag(desc='Which channel or pair to sweep')
@@ -133,6 +236,9 @@ class AWGSequence(Sweep):
     step = Int(1)
     sequenceFile = Str().tag(desc='Base string for the sequence files')
 
+    def get_points(self):
+        return np.arange(self.start, self.stop+1, self.step)
+
 class Attenuation(PointsSweep):
     label = Str(default='Attenuation (dB)')
     channel = Enum(1, 2, 3).tag(desc='Which channel to sweep')
@@ -159,6 +265,8 @@ class SweepLibrary(Atom):
     sweepManager = Typed(DictManager)
 
     libFile = Str()
+    useCache = Bool(False).tag(transient=True)
+    fileFingerprints = Dict().tag(transient=True)
 
     def __init__(self, **kwargs):
         super(SweepLibrary, self).__init__(**kwargs)
@@ -184,11 +292,15 @@ class SweepLibrary(Atom):
         libFileName = fileName if fileName != None else self.libFile
 
         if libFileName:
-            with open(libFileName, 'w') as FID:
-                json.dump(self, FID, cls=LibraryCoders.LibraryEncoder, indent=2, sort_keys=True)
+            LibraryWriter.write_library(self, libFileName, self.fileFingerprints)
 
     def load_from_library(self):
         if self.libFile:
+            if self.useCache:
+                cached = LibraryCache.load(self.libFile)
+                if cached is not None:
+                    self.update_from_state(cached)
+                    return
             try:
                 with open(self.libFile, 'r') as FID:
                     try:
@@ -198,18 +310,49 @@ class SweepLibrary(Atom):
                          return
 
                     if isinstance(tmpLib, SweepLibrary):
-                        self.sweepDict.update(tmpLib.sweepDict)
-                        del self.possibleInstrs[:]
-                        for instr in tmpLib.possibleInstrs:
-                            self.possibleInstrs.append(instr)
-                        del self.sweepOrder[:]
-                        for sweepStr in tmpLib.sweepOrder:
-                            self.sweepOrder.append(sweepStr)
-                        # grab library version
-                        self.version = tmpLib.version
+                        state = {'sweepDict': tmpLib.sweepDict,
+                                 'possibleInstrs': list(tmpLib.possibleInstrs),
+                                 'sweepOrder': list(tmpLib.sweepOrder),
+                                 'version': tmpLib.version}
+                        self.update_from_state(state)
+                        if self.useCache:
+                            LibraryCache.store(self.libFile, state)
             except IOError:
                 print('No sweep library found.')
 
+    def update_from_state(self, state):
+        self.sweepDict.update(state['sweepDict'])
+        del self.possibleInstrs[:]
+        for instr in state['possibleInstrs']:
+            self.possibleInstrs.append(instr)
+        del self.sweepOrder[:]
+        for sweepStr in state['sweepOrder']:
+            self.sweepOrder.append(sweepStr)
+        # grab library version
+        self.version = state['version']
+
+    def iter_points(self, chunkSize=None):
+        """
+        Lazily walk the grid spanned by the sweeps in sweepOrder, with the
+        first sweep varying fastest. The full Cartesian product is never built.
+
+        Yields a tuple with one value per sweep for each grid point or, when
+        chunkSize is given, a list with one array per sweep holding the values
+        for the next chunkSize grid points.
+        """
+        axes = [self.sweepDict[name].get_points() for name in self.sweepOrder]
+        if not axes:
+            return
+        if chunkSize is None:
+            for point in itertools.product(*reversed(axes)):
+                yield point[::-1]
+            return
+        shape = tuple(len(axis) for axis in axes)
+        numPoints = int(np.prod(shape))
+        for start in range(0, numPoints, chunkSize):
+            idx = np.unravel_index(np.arange(start, min(start+chunkSize, numPoints)), shape, order='F')
+            yield [axis[i] for axis, i in zip(axes, idx)]
+
     def json_encode(self, matlabCompatible=False):
             if matlabCompatible:
                 #  re-assign based on sweepOrder
@@ -227,6 +370,8 @@ class SweepLibrary(Atom):
 def find_sweeps_plugins():
     plugins = find_plugins(Sweep, verbose=False)
     for plugin in plugins:
+        if not plugin.defines_points():
+            print("WARNING: sweep plugin {} neither defines get_points nor the usual point members".format(plugin.__name__))
         if plugin not in newSweepClasses:
             newSweepClasses.append(plugin)
         if plugin.__name__ not in globals().keys():
@@ -234,6 +379,8 @@ def find_sweeps_plugins():
             print("Registered Plugin {}".format(plugin.__name__))
 
 if __name__ == "__main__":
+    import enaml
+    from enaml.qt.qt_application import QtApplication
 
     from instruments.MicrowaveSources import AgilentN5183A
     testSource1 = AgilentN5183A(label='TestSource1')
@@ -0,0 +1,220 @@
+"""
+Wiring graph between logical channels, physical channels and instruments.
+
+Logical channels are wired to a physical channel (physChan) and physical
+channels to an instrument (instrument label). The graph keeps forward and
+reverse adjacency for these links so questions such as "which logical channels
+drive AWG X" or "which physical channels must be renamed with AWG X" are
+answered with a dictionary lookup instead of a scan of the channel library.
+It is kept in sync through the itemChanged events of the DictManagers and
+libraries it is attached to and by observing the channels and instruments.
+"""
+import json
+
+import QGL.Channels
+
+class WiringGraph(object):
+
+    # node colors used for the DOT export, first match wins
+    colorMap = (
+        (QGL.Channels.LogicalMarkerChannel, "lightblue"),
+        (QGL.Channels.PhysicalMarkerChannel, "red"),
+        (QGL.Channels.PhysicalQuadratureChannel, "blue"),
+        (QGL.Channels.Qubit, "yellow"),
+    )
+
+    def __init__(self, channelLib=None, instrumentDict=None):
+        self.channels = channelLib
+        self.instruments = instrumentDict
+        self.reset()
+        if channelLib is not None:
+            self.build()
+
+    def reset(self):
+        self.kinds = {}      # label -> 'logical', 'physical' or 'instrument'
+        self.colors = {}
+        self.forward = {}    # label -> label it is wired to
+        self.reverse = {}    # label -> set of labels wired to it
+        self.driving = {}    # instrument -> set of logical channels ultimately wired to it
+        self.watched = set()
+
+    def build(self):
+        """
+        (Re)build the graph from the channel and instrument libraries.
+        """
+        self.reset()
+        for label in list(self.instruments.keys()):
+            self.update_instrument(label)
+        for label in list(self.channels.keys()):
+            self.update_channel(label)
+
+    #####################################################################################
+    ## Queries
+
+    def physical_channels(self, instrument):
+        """Physical channels wired to an instrument."""
+        return set(self.reverse.get(instrument, ()))
+
+    def logical_channels(self, physicalChannel):
+        """Logical channels wired to a physical channel."""
+        return set(self.reverse.get(physicalChannel, ()))
+
+    def logical_channels_driving(self, instrument):
+        """Logical channels whose physical channel is wired to an instrument."""
+        return set(self.driving.get(instrument, ()))
+
+    def instrument_of(self, channel):
+        """Instrument a logical or physical channel ends up on, or None."""
+        target = self.forward.get(channel)
+        if self.kinds.get(channel) == 'logical':
+            target = self.forward.get(target)
+        return target
+
+    #####################################################################################
+    ## Maintenance
+
+    def watch(self, obj, members):
+        if id(obj) in self.watched:
+            return
+        for member in members:
+            obj.observe(member, self.member_changed)
+        self.watched.add(id(obj))
+
+    def member_changed(self, change):
+        if change['type'] != 'update':
+            return
+        obj = change['object']
+        if change['name'] == 'label':
+            self.rename(change['oldvalue'], change['value'])
+        elif obj.label in self.kinds:
+            self.update_channel(obj.label)
+
+    def link(self, src, dst):
+        self.unlink(src)
+        if dst is None:
+            return
+        self.forward[src] = dst
+        self.reverse.setdefault(dst, set()).add(src)
+        kind = self.kinds.get(src)
+        if kind == 'logical':
+            instrument = self.forward.get(dst)
+            if instrument is not None:
+                self.driving.setdefault(instrument, set()).add(src)
+        elif kind == 'physical':
+            for logical in self.reverse.get(src, ()):
+                self.driving.setdefault(dst, set()).add(logical)
+
+    def unlink(self, src):
+        dst = self.forward.pop(src, None)
+        if dst is None:
+            return
+        self.reverse[dst].discard(src)
+        kind = self.kinds.get(src)
+        if kind == 'logical':
+            instrument = self.forward.get(dst)
+            if instrument in self.driving:
+                self.driving[instrument].discard(src)
+        elif kind == 'physical' and dst in self.driving:
+            self.driving[dst].difference_update(self.reverse.get(src, ()))
+
+    def update_instrument(self, label):
+        if label not in self.instruments:
+            self.remove(label)
+            return
+        self.kinds[label] = 'instrument'
+        self.colors[label] = 'green'
+        self.watch(self.instruments[label], ['label'])
+
+    def update_channel(self, label):
+        if label not in self.channels:
+            self.remove(label)
+            return
+        chan = self.channels[label]
+        self.unlink(label)
+        self.colors.pop(label, None)
+        for channelType, color in self.colorMap:
+            if isinstance(chan, channelType):
+                self.colors[label] = color
+                break
+        if isinstance(chan, QGL.Channels.LogicalChannel):
+            self.kinds[label] = 'logical'
+            self.link(label, chan.physChan.label if chan.physChan is not None else None)
+            self.watch(chan, ['label', 'physChan'])
+        elif isinstance(chan, QGL.Channels.PhysicalChannel):
+            self.kinds[label] = 'physical'
+            self.link(label, chan.instrument or None)
+            self.watch(chan, ['label', 'instrument'])
+        else:
+            self.kinds.pop(label, None)
+
+    def remove(self, label):
+        self.unlink(label)
+        self.kinds.pop(label, None)
+        self.colors.pop(label, None)
+
+    def rename(self, oldLabel, newLabel):
+        if oldLabel not in self.kinds or oldLabel == newLabel:
+            return
+        kind = self.kinds.pop(oldLabel)
+        self.kinds[newLabel] = kind
+        if oldLabel in self.colors:
+            self.colors[newLabel] = self.colors.pop(oldLabel)
+
+        # outgoing edge
+        dst = self.forward.pop(oldLabel, None)
+        if dst is not None:
+            self.forward[newLabel] = dst
+            self.reverse[dst].discard(oldLabel)
+            self.reverse[dst].add(newLabel)
+            if kind == 'logical':
+                instrument = self.forward.get(dst)
+                if instrument in self.driving:
+                    self.driving[instrument].discard(oldLabel)
+                    self.driving[instrument].add(newLabel)
+
+        # incoming edges
+        users = self.reverse.pop(oldLabel, set())
+        if users:
+            self.reverse[newLabel] = users
+            for src in users:
+                self.forward[src] = newLabel
+        if kind == 'instrument' and oldLabel in self.driving:
+            self.driving[newLabel] = self.driving.pop(oldLabel)
+
+    def attach(self, manager, kind):
+        """
+        Subscribe to the itemChanged events of a DictManager or library.
+        kind is one of 'channel' or 'instrument'.
+        """
+        manager.observe('itemChanged', lambda change: self.item_changed(kind, *change['value']))
+
+    def item_changed(self, kind, action, *labels):
+        if action == 'refresh':
+            self.build()
+        elif action == 'rename':
+            self.rename(*labels)
+        else:
+            update = self.update_channel if kind == 'channel' else self.update_instrument
+            for label in labels:
+                update(label)
+
+    #####################################################################################
+    ## Export
+
+    def edges(self):
+        return sorted((src, dst) for src, dst in self.forward.items() if src in self.kinds)
+
+    def to_dot(self):
+        lines = ["digraph Exp {"]
+        for src, dst in self.edges():
+            lines.append('"{0}" -> "{1}";'.format(src, dst))
+        for label in sorted(self.colors):
+            lines.append('"{0}" [color={1},style=filled];'.format(label, self.colors[label]))
+        lines.append("}")
+        return '\n'.join(lines)
+
+    def to_json(self):
+        return json.dumps({
+            'nodes': [{'label': label, 'kind': self.kinds[label]} for label in sorted(self.kinds)],
+            'edges': [list(edge) for edge in self.edges()]
+        }, indent=2, sort_keys=True)
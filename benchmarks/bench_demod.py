@@ -0,0 +1,29 @@
+"""
+Throughput of the offline DigitalDemod engine in records per second.
+
+usage: python benchmarks/bench_demod.py [recordLength] [numRecords] [chunkSize]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.demod import DemodEngine
+
+if __name__ == '__main__':
+    recordLength = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    numRecords = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    chunkSize = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    records = np.random.randn(numRecords, recordLength).astype(np.float32)
+    for decimFactors in [(1, 1, 1), (4, 2, 1), (4, 2, 2)]:
+        engine = DemodEngine(IFfreq=10e6, bandwidth=5e6, samplingRate=250e6,
+                             decimFactor1=decimFactors[0], decimFactor2=decimFactors[1], decimFactor3=decimFactors[2])
+        start = time.time()
+        out = engine.process_records(records, chunkSize)
+        elapsed = time.time() - start
+        print("decimation {0}: {1:.0f} records/s ({2} -> {3} samples)".format(
+            decimFactors, numRecords/elapsed, recordLength, out.shape[1]))
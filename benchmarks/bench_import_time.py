@@ -0,0 +1,37 @@
+"""
+Report the cold-start cost of importing the model modules and check that no GUI
+or HDF5 modules are dragged in along the way.
+
+Each import is timed in a fresh interpreter so nothing is shared between runs.
+
+usage: python benchmarks/bench_import_time.py [repeats]
+"""
+import json
+import os
+import subprocess
+import sys
+
+rootFolder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+t = time.time()
+import {module}
+elapsed = time.time() - t
+heavy = sorted(set(m.split('.')[0] for m in sys.modules) & set(['enaml', 'PyQt4', 'PyQt5', 'PySide', 'h5py']))
+print(json.dumps({{'elapsed': elapsed, 'heavy': heavy}}))
+"""
+
+def time_import(module):
+    out = subprocess.check_output([sys.executable, '-c', PROBE.format(module=module)], cwd=rootFolder)
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for module in ['Libraries', 'ExpSettingsVal']:
+        results = [time_import(module) for _ in range(repeats)]
+        print("import {:<15} best {:.3f} s  median {:.3f} s  GUI/HDF5 modules loaded: {}".format(
+            module,
+            min(r['elapsed'] for r in results),
+            sorted(r['elapsed'] for r in results)[len(results)//2],
+            ', '.join(results[0]['heavy']) or 'none'))
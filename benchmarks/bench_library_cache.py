@@ -0,0 +1,59 @@
+"""
+Compare cold (JSON decode) and warm (binary cache) load times of an instrument
+library holding a number of X6 digitizers with large integration kernels.
+
+usage: python benchmarks/bench_library_cache.py [numX6] [kernelLength]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from JSONLibraryUtils import LibraryCoders
+from instruments.InstrumentManager import InstrumentLibrary
+from instruments.Digitizers import X6
+import LibraryCache
+
+def make_library(fileName, numX6, kernelLength):
+    instrDict = {}
+    for ct in range(numX6):
+        label = 'X6_{}'.format(ct)
+        instr = X6(label=label)
+        for chan in instr.channels.values():
+            kernel = np.exp(2j*np.pi*np.random.rand(kernelLength))
+            chan.demodKernel = repr(kernel.tolist())
+            chan.rawKernel = repr(kernel.tolist())
+        instrDict[label] = instr
+    with open(fileName, 'w') as FID:
+        json.dump(InstrumentLibrary(instrDict=instrDict), FID,
+                  cls=LibraryCoders.LibraryEncoder, indent=2, sort_keys=True)
+
+def load(fileName, useCache):
+    return InstrumentLibrary(libFile=fileName, useCache=useCache)
+
+if __name__ == '__main__':
+    numX6 = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    kernelLength = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+
+    tmpDir = tempfile.mkdtemp()
+    try:
+        fileName = os.path.join(tmpDir, 'Instruments.json')
+        make_library(fileName, numX6, kernelLength)
+        print("Library size: {:.1f} MB".format(os.path.getsize(fileName)/1e6))
+
+        cold = min(timeit.repeat(lambda: load(fileName, False), number=1, repeat=3))
+        LibraryCache.invalidate(fileName)
+        load(fileName, True) # populate the cache
+        warm = min(timeit.repeat(lambda: load(fileName, True), number=1, repeat=3))
+
+        print("Cold load (JSON decode): {:.3f} s".format(cold))
+        print("Warm load (binary cache): {:.3f} s".format(warm))
+        print("Speedup: {:.1f}x".format(cold/warm))
+    finally:
+        shutil.rmtree(tmpDir)
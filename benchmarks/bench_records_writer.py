@@ -0,0 +1,29 @@
+"""
+Sustained throughput of the background HDF5 records writer.
+
+usage: python benchmarks/bench_records_writer.py [fileName] [numBlocks] [compression]
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.records import RecordsWriter
+
+if __name__ == '__main__':
+    fileName = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.gettempdir(), 'bench_records.h5')
+    numBlocks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    compression = sys.argv[3] if len(sys.argv) > 3 else None
+
+    # 1000 records of 4096 float32 samples per block, as from a digitizer
+    block = np.random.randn(1000, 4096).astype(np.float32)
+    with RecordsWriter(fileName, compression=compression) as writer:
+        for ct in range(numBlocks):
+            writer.write('records', block)
+    stats = writer.stats()
+    print("{0:.0f} MB at {1:.1f} MB/s ({2:.1f} MB/s while writing), {3} stalls for {4:.2f} s".format(
+        stats['MBWritten'], stats['MBps'], stats['diskMBps'], stats['stalls'], stats['stallTime']))
+    os.remove(fileName)
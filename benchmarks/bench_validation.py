@@ -0,0 +1,60 @@
+"""
+Time the channel library validation on a synthetic library of N qubits.
+
+Each qubit gets its own APS2 for control and one for measurement, plus a
+marker channel per measurement, so the library holds roughly 5N channels.
+
+usage: python benchmarks/bench_validation.py [numQubits]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import QGL.Channels as Channels
+from instruments.drivers.APS2 import APS2
+import ExpSettingsVal
+
+def make_libraries(numQubits):
+    channels = {}
+    instruments = {}
+
+    def physical(awg, chan, cls):
+        label = '{}-{}'.format(awg, chan)
+        channels[label] = cls(label=label, instrument=awg, translator='APS2Pattern')
+        return channels[label]
+
+    for ct in range(numQubits):
+        for awg in ['APS2q{}'.format(ct), 'APS2m{}'.format(ct)]:
+            instruments[awg] = APS2(label=awg)
+        qubit = 'q{}'.format(ct)
+        channels[qubit] = Channels.Qubit(label=qubit,
+            physChan=physical('APS2q{}'.format(ct), '12', Channels.PhysicalQuadratureChannel))
+        meas = 'M-q{}'.format(ct)
+        channels[meas] = Channels.Measurement(label=meas,
+            physChan=physical('APS2m{}'.format(ct), '12', Channels.PhysicalQuadratureChannel))
+        marker = 'trig-q{}'.format(ct)
+        channels[marker] = Channels.LogicalMarkerChannel(label=marker,
+            physChan=physical('APS2m{}'.format(ct), '12m1', Channels.PhysicalMarkerChannel))
+
+    channels['digitizerTrig'] = Channels.LogicalMarkerChannel(label='digitizerTrig',
+        physChan=physical('APS2m0', '12m2', Channels.PhysicalMarkerChannel))
+    channels['slaveTrig'] = Channels.LogicalMarkerChannel(label='slaveTrig',
+        physChan=physical('APS2q0', '12m1', Channels.PhysicalMarkerChannel))
+    return channels, instruments
+
+if __name__ == '__main__':
+    numQubits = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    channels, instruments = make_libraries(numQubits)
+    ExpSettingsVal.channels = channels
+    ExpSettingsVal.instruments = instruments
+
+    print("{} channels, {} instruments".format(len(channels), len(instruments)))
+    errors = ExpSettingsVal.validate_channelLib()
+    print("{} validation errors".format(len(errors)))
+
+    indexTime = min(timeit.repeat(ExpSettingsVal.build_index, number=1, repeat=5))
+    totalTime = min(timeit.repeat(ExpSettingsVal.validate_channelLib, number=1, repeat=5))
+    print("Index build: {:.1f} ms".format(1e3*indexTime))
+    print("validate_channelLib: {:.1f} ms".format(1e3*totalTime))
@@ -28,3 +28,12 @@ AWGDir = os.path.abspath(PyQLabCfg['AWGDir'])
 instrumentLibFile = os.path.abspath(PyQLabCfg['InstrumentLibraryFile'])
 sweepLibFile = os.path.abspath(PyQLabCfg['SweepLibraryFile'])
 measurementLibFile = os.path.abspath(PyQLabCfg['MeasurementLibraryFile'])
+
+#optional binary cache of the decoded libraries next to each JSON file
+libraryCache = PyQLabCfg.get('LibraryCache', False)
+
+#content-addressed store for configuration snapshots
+snapshotDir = os.path.abspath(PyQLabCfg.get('SnapshotDir', os.path.join(rootFolder, 'snapshots')))
+
+#hash-addressed store for integration kernels referenced from the instrument library
+kernelStoreDir = os.path.abspath(PyQLabCfg.get('KernelStoreDir', os.path.join(rootFolder, 'kernels')))
@@ -6,9 +6,6 @@ from atom.api import Atom, List, Int, Float, Range, Enum, Bool, Constant, Str
 
 from .Instrument import Instrument
 
-import enaml
-from enaml.qt.qt_application import QtApplication
-
 import glob
 import copy
 
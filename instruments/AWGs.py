@@ -7,9 +7,6 @@ from atom.api import Atom, List, Int, Float, Range, Enum, Bool, Constant, Str
 from .Instrument import Instrument
 
 
-import enaml
-from enaml.qt.qt_application import QtApplication
-
 from instruments.AWGBase import AWGChannel, AWG
 
 from .plugins import find_plugins
@@ -26,6 +23,9 @@ for plugin in plugins:
             print("Registered Plugin {}".format(plugin.__name__))
 
 if __name__ == "__main__":
+    import enaml
+    from enaml.qt.qt_application import QtApplication
+
     with enaml.imports():
         from AWGsViews import AWGView
 
@@ -6,9 +6,6 @@ from .Instrument import Instrument
 from atom.api import Atom, Str, Int, Float, Bool, Enum, List, Dict, Coerced
 import itertools, ast
 
-import enaml
-from enaml.qt.qt_application import QtApplication
-
 class Digitizer(Instrument):
 	pass
 
@@ -55,6 +52,7 @@ class X6VirtualChannel(Atom):
 	enableDemodResultStream = Bool(True).tag(desc='Enable demod result data stream')
 	enableRawResultStream = Bool(True).tag(desc='Enable raw result data stream')
 	IFfreq = Float(10e6).tag(desc='IF Frequency')
+	# kernels are either Python literals or "kernel:<sha1>" references into the KernelStore
 	demodKernel = Str().tag(desc='Integration kernel vector for demod stream')
 	demodKernelBias = Str("").tag(desc="Kernel bias for integrated demod stream")
 	rawKernel = Str().tag(desc='Integration kernel vector for raw stream')
@@ -62,27 +60,73 @@ class X6VirtualChannel(Atom):
 	threshold = Float(0.0).tag(desc='Qubit state decision threshold')
 	thresholdInvert = Bool(False).tag(desc="Invert thresholder output")
 
+	kernelFields = ['demodKernel', 'demodKernelBias', 'rawKernel', 'rawKernelBias']
+
+	def get_kernel(self, name, store=None):
+		"""
+		Evaluate one of the kernel or kernel bias strings, or load it from the
+		kernel store. Biases are always complex.
+		"""
+		import numpy as np
+		import KernelStore
+		text = getattr(self, name)
+		if KernelStore.is_reference(text):
+			kernel = (store or KernelStore.default_store()).get(text)
+		else:
+			kernel = eval(text)
+		if name.endswith('Bias'):
+			return np.array(kernel, dtype=np.complex128)
+		else:
+			return kernel
+
+	def externalize_kernels(self, store=None):
+		"""
+		Move the kernels written as Python literals into the kernel store and
+		keep only their references.
+		"""
+		import KernelStore
+		store = store or KernelStore.default_store()
+		for name in self.kernelFields:
+			text = getattr(self, name)
+			if text and not KernelStore.is_reference(text):
+				try:
+					kernel = self.get_kernel(name)
+				except:
+					# leave literals that do not evaluate for the user to fix
+					continue
+				setattr(self, name, store.put(kernel))
+
+	def kernel_arrays(self):
+		"""
+		Kernels and biases as complex arrays, empty where the string does not evaluate.
+		"""
+		import numpy as np
+		arrays = {}
+		for name in self.kernelFields:
+			try:
+				arrays[name] = np.atleast_1d(np.asarray(self.get_kernel(name), dtype=np.complex128))
+			except:
+				arrays[name] = np.zeros(0, dtype=np.complex128)
+		return arrays
+
 	def json_encode(self, matlabCompatible=False):
 		jsonDict = self.__getstate__()
 		if matlabCompatible:
-			import numpy as np
 			import base64
-			try:
-				jsonDict['demodKernel'] = base64.b64encode(eval(self.demodKernel)).decode('ascii')
-			except:
-				jsonDict['demodKernel'] = []
-			try:
-				jsonDict['demodKernelBias'] = base64.b64encode(np.array(eval(self.demodKernelBias), dtype=np.complex128)).decode('ascii')
-			except:
-				jsonDict['demodKernelBias'] = []
-			try:
-				jsonDict['rawKernel'] = base64.b64encode(eval(self.rawKernel)).decode('ascii')
-			except:
-				jsonDict['rawKernel'] = []
-			try:
-				jsonDict['rawKernelBias'] = base64.b64encode(np.array(eval(self.rawKernelBias), dtype=np.complex128)).decode('ascii')
-			except:
-				jsonDict['rawKernelBias'] = []
+			import numpy as np
+			import KernelStore
+			for name in self.kernelFields:
+				text = getattr(self, name)
+				try:
+					if KernelStore.is_reference(text):
+						jsonDict[name] = KernelStore.default_store().encoded(text,
+							np.complex128 if name.endswith('Bias') else None)
+					else:
+						key = (name.endswith('Bias'), KernelStore.text_digest(text))
+						jsonDict[name] = KernelStore.literalEncodings.get(key,
+							lambda: base64.b64encode(self.get_kernel(name)).decode('ascii'))
+				except:
+					jsonDict[name] = []
 		return jsonDict
 
 class X6(Digitizer):
@@ -127,7 +171,14 @@ class X6(Digitizer):
 		params.pop('channels')
 		super(X6, self).update_from_jsondict(params)
 
+	def externalize_kernels(self, store=None):
+		for channel in self.channels.values():
+			channel.externalize_kernels(store)
+
 if __name__ == "__main__":
+	import enaml
+	from enaml.qt.qt_application import QtApplication
+
 	from Digitizers import X6
 	digitizer = X6(label='scope')
 	with enaml.imports():
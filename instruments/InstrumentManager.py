@@ -1,18 +1,21 @@
 import json
 import importlib
+import hashlib
 import sys
+import threading
 
-import enaml
 from atom.api import (Atom, Str, List, Dict, Property, Typed, Unicode, Coerced,
-                      Int, Callable)
-from enaml.qt.qt_application import QtApplication
+                      Int, Callable, Bool, Float, Value, Event)
 
 from .Instrument import Instrument
 from . import MicrowaveSources
 from . import AWGs
-from JSONLibraryUtils import FileWatcher, LibraryCoders
+from JSONLibraryUtils import LibraryCoders
+import LibraryCache
+import LibraryWatcher
+import LibraryWriter
 
-from DictManager import DictManager
+from DictManager import DictManager, DictIndex
 
 from . import Digitizers, Analysers, DCSources, Attenuators
 
@@ -29,6 +32,28 @@ for plugin in plugins:
     print("Registered Digitizer Driver {}".format(plugin.__name__))
 
 
+def instr_hash(instrParams):
+    """
+    Content hash of the JSON parameters of one instrument.
+    """
+    return hashlib.sha1(json.dumps(instrParams, sort_keys=True).encode('utf-8')).hexdigest()
+
+def decode_library(jsonDict):
+    """
+    Turn an already parsed library file into objects the way
+    json.loads(..., cls=LibraryDecoder) does, i.e. applying the decoder's
+    object hook to the innermost objects first, so the file is parsed only once.
+    """
+    objectHook = LibraryCoders.LibraryDecoder().object_hook
+    def decode(obj):
+        if isinstance(obj, dict):
+            return objectHook({key: decode(value) for key, value in obj.items()})
+        elif isinstance(obj, list):
+            return [decode(value) for value in obj]
+        return obj
+    return decode(jsonDict)
+
+
 class AWGDictManager(DictManager):
     """
     Specialization of DictManager for AWGs to support auto populating channels.
@@ -42,6 +67,7 @@ class AWGDictManager(DictManager):
         """
         Create a new item dialog window and handle the result
         """
+        import enaml
         with enaml.imports():
             from widgets.dialogs import AddAWGDialog
         dialogBox = AddAWGDialog(
@@ -53,7 +79,8 @@ class AWGDictManager(DictManager):
             if dialogBox.newLabel not in self.itemDict.keys():
                 self.itemDict[dialogBox.newLabel] = self.possibleItems[
                     dialogBox.newModelNum](label=dialogBox.newLabel)
-                self.displayList.append(dialogBox.newLabel)
+                self.index.add([dialogBox.newLabel])
+                self.itemChanged = ('add', dialogBox.newLabel)
                 if dialogBox.auto_populate_channels and self.populate_physical_channels is not None:
                     self.populate_physical_channels(
                         [self.itemDict[dialogBox.newLabel]])
@@ -66,44 +93,61 @@ class InstrumentLibrary(Atom):
     #All the instruments are stored as a dictionary keyed of the instrument name
     instrDict = Dict()
     libFile = Str().tag(transient=True)
+    useCache = Bool(False).tag(transient=True)
+    fileFingerprints = Dict().tag(transient=True)
 
     #Some helpers to manage types of instruments
     AWGs = Typed(DictManager)
     markedInstrs = Typed(DictManager)
     sources = Typed(DictManager)
     others = Typed(DictManager)
+    # sorted display lists of the managers above, kept up to date incrementally
+    index = Typed(DictIndex)
     version = Int(3)
 
-    fileWatcher = Typed(FileWatcher.LibraryFileWatcher)
+    fileWatcher = Typed(LibraryWatcher.LibraryFileWatcher)
+    # content hash of each instrument as last read from file so reloads only touch what changed
+    instrHashes = Dict().tag(transient=True)
+    # bursts of file events within this many seconds are collapsed into one reload
+    reloadDelay = Float(0.1).tag(transient=True)
+    reloadTimer = Value().tag(transient=True)
+    reloadLock = Value(factory=threading.Lock).tag(transient=True)
+    # fired with ('add'|'update'|'remove', instrName) for each instrument changed by update_from_file
+    itemChanged = Event()
 
     def __init__(self, **kwargs):
         super(InstrumentLibrary, self).__init__(**kwargs)
         self.load_from_library()
         if self.libFile:
-            self.fileWatcher = FileWatcher.LibraryFileWatcher(
-                self.libFile, self.update_from_file)
+            self.fileWatcher = LibraryWatcher.LibraryFileWatcher(
+                self.libFile, self.schedule_update)
 
         #Setup the dictionary managers for the different instrument types
+        self.index = DictIndex(self.instrDict)
         self.AWGs = AWGDictManager(
             itemDict=self.instrDict,
             displayFilter=lambda x: isinstance(x, AWGs.AWG),
-            possibleItems=AWGs.AWGList)
+            possibleItems=AWGs.AWGList,
+            index=self.index)
 
         self.sources = DictManager(
             itemDict=self.instrDict,
             displayFilter=lambda x: isinstance(x, MicrowaveSources.MicrowaveSource),
-            possibleItems=MicrowaveSources.MicrowaveSourceList)
+            possibleItems=MicrowaveSources.MicrowaveSourceList,
+            index=self.index)
 
         self.others = DictManager(
             itemDict=self.instrDict,
             displayFilter=lambda x: not isinstance(x, AWGs.AWG) and not isinstance(x, MicrowaveSources.MicrowaveSource),
-            possibleItems=newOtherInstrs)
+            possibleItems=newOtherInstrs,
+            index=self.index)
 
         # To enable routing physical marker channels to more generic devices
         self.markedInstrs = DictManager(
             itemDict=self.instrDict,
             displayFilter=lambda x: not isinstance(x, AWGs.AWG) and hasattr(x, 'takes_marker') and x.takes_marker,
-            possibleItems=newOtherInstrs)
+            possibleItems=newOtherInstrs,
+            index=self.index)
 
     #Overload [] to allow direct pulling out of an instrument
     def __getitem__(self, instrName):
@@ -120,35 +164,65 @@ class InstrumentLibrary(Atom):
                 self.fileWatcher.pause()
 
                 if libFileName:
-                    with open(libFileName, 'w') as FID:
-                        json.dump(self,
-                                  FID,
-                                  cls=LibraryCoders.LibraryEncoder,
-                                  indent=2,
-                                  sort_keys=True)
+                    # keep kernel literals out of the library file
+                    for instr in self.instrDict.values():
+                        if hasattr(instr, 'externalize_kernels'):
+                            instr.externalize_kernels()
+                    LibraryWriter.write_library(self, libFileName, self.fileFingerprints)
 
             if self.fileWatcher:
                 self.fileWatcher.resume()
 
     def load_from_library(self):
         if self.libFile:
+            if self.useCache:
+                cached = LibraryCache.load(self.libFile)
+                if cached is not None and 'instrHashes' in cached:
+                    self.instrDict.update(cached['instrDict'])
+                    self.instrHashes.update(cached['instrHashes'])
+                    self.version = cached['version']
+                    return
             try:
                 with open(self.libFile, 'r') as FID:
-                    tmpLib = json.load(FID, cls=LibraryCoders.LibraryDecoder)
-                    if isinstance(tmpLib, InstrumentLibrary):
-                        self.instrDict.update(tmpLib.instrDict)
-                        # grab library version
-                        self.version = tmpLib.version
+                    jsonDict = json.load(FID)
+                instrHashes = {}
+                if isinstance(jsonDict, dict) and isinstance(jsonDict.get('instrDict'), dict):
+                    instrHashes = {instrName: instr_hash(instrParams)
+                                   for instrName, instrParams in jsonDict['instrDict'].items()}
+                tmpLib = decode_library(jsonDict)
+                if isinstance(tmpLib, InstrumentLibrary):
+                    self.instrDict.update(tmpLib.instrDict)
+                    # grab library version
+                    self.version = tmpLib.version
+                    # seed the hashes so the first reload only touches what changed since
+                    self.instrHashes.update(instrHashes)
+                    if self.useCache:
+                        LibraryCache.store(self.libFile, {'instrDict': tmpLib.instrDict,
+                                                          'instrHashes': instrHashes,
+                                                          'version': tmpLib.version})
             except IOError:
                 print('No instrument library found')
             except ValueError:
                 print('Failed to load instrument library')
 
+    def schedule_update(self):
+        """
+        File watcher callback: (re)start a short timer so that a burst of
+        file events results in a single call to update_from_file.
+        """
+        with self.reloadLock:
+            if self.reloadTimer is not None:
+                self.reloadTimer.cancel()
+            self.reloadTimer = threading.Timer(self.reloadDelay, self.update_from_file)
+            self.reloadTimer.daemon = True
+            self.reloadTimer.start()
+
     def update_from_file(self):
         """
         Only update relevant parameters
         Helps avoid stale references by replacing whole channel objects as in load_from_library
         and the overhead of recreating everything.
+        Instruments whose JSON is unchanged since the last update are skipped.
         """
         if self.libFile:
             with open(self.libFile, 'r') as FID:
@@ -162,6 +236,9 @@ class InstrumentLibrary(Atom):
 
                 # update and add new items
                 for instrName, instrParams in allParams.items():
+                    instrHash = instr_hash(instrParams)
+                    if instrName in self.instrDict and self.instrHashes.get(instrName) == instrHash:
+                        continue
                     # Re-encode the strings as ascii (this should go away in Python 3)
                     if sys.version_info[0] < 3:
                         instrParams = {k.encode('ascii'): v
@@ -170,6 +247,8 @@ class InstrumentLibrary(Atom):
                     if instrName in self.instrDict:
                         self.instrDict[instrName].update_from_jsondict(
                             instrParams)
+                        self.instrHashes[instrName] = instrHash
+                        self.itemChanged = ('update', instrName)
                     else:
                         # load class from name and update from json
                         className = instrParams['x__class__']
@@ -180,11 +259,20 @@ class InstrumentLibrary(Atom):
                         self.instrDict[instrName] = cls()
                         self.instrDict[instrName].update_from_jsondict(
                             instrParams)
+                        self.instrHashes[instrName] = instrHash
+                        # listeners see the display lists already updated
+                        if self.index is not None:
+                            self.index.add([instrName])
+                        self.itemChanged = ('add', instrName)
 
                 # delete removed items
-                for instrName in self.instrDict.keys():
+                for instrName in list(self.instrDict.keys()):
                     if instrName not in allParams:
                         del self.instrDict[instrName]
+                        self.instrHashes.pop(instrName, None)
+                        if self.index is not None:
+                            self.index.remove([instrName])
+                        self.itemChanged = ('remove', instrName)
 
     def json_encode(self, matlabCompatible=False):
         #When serializing for matlab return only enabled instruments, otherwise all
@@ -201,6 +289,8 @@ class InstrumentLibrary(Atom):
 
 
 if __name__ == '__main__':
+    import enaml
+    from enaml.qt.qt_application import QtApplication
 
     from MicrowaveSources import AgilentN5183A
     instrLib = InstrumentLibrary(
@@ -1,8 +1,5 @@
 from atom.api import Atom, Float, Enum, Bool
 
-import enaml
-from enaml.qt.qt_application import QtApplication
-
 from .Instrument import Instrument
 
 class MicrowaveSource(Instrument):
@@ -58,6 +55,9 @@ class HP8340B(MicrowaveSource):
 MicrowaveSourceList = [AgilentN5183A, HolzworthHS9000, Labbrick, RhodeSchwarzSMIQ03, HP8673B, HP8340B, BNC845]
 
 if __name__ == "__main__":
+    import enaml
+    from enaml.qt.qt_application import QtApplication
+
     from MicrowaveSources import AgilentN5183A
     mySource = AgilentN5183A(label="Agilent1")
     with enaml.imports():
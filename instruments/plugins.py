@@ -2,9 +2,12 @@
 Device driver pluggins
 """
 from glob import glob
+import hashlib
 from importlib import import_module
+import json
 import os
 import inspect
+import sys
 
 class PluginViewMap(object):
     viewMap = {}
@@ -13,6 +16,133 @@ class PluginViewMap(object):
 def isStrictSubclass( clsObj, baseClass):
     return issubclass(clsObj, baseClass) and clsObj.__name__ != baseClass.__name__
 
+def user_cache_dir():
+    """
+    Per-user directory for PyQLab caches.
+    """
+    if os.name == 'nt':
+        root = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    else:
+        root = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(root, 'PyQLab')
+
+def file_stamps(fileNames):
+    stamps = {}
+    for fileName in fileNames:
+        try:
+            stamps[fileName] = os.path.getmtime(fileName)
+        except OSError:
+            stamps[fileName] = None
+    return stamps
+
+class PluginRegistry(object):
+    """
+    Process-wide index of the classes found in the driver modules.
+
+    The drivers are scanned at most once per process. The class name to module
+    map, along with the names of each class' bases, is saved in the user cache
+    directory and reused on later startups as long as neither the driver files
+    nor the modules defining their base classes changed, so only the modules
+    that can hold a requested plugin are imported.
+    """
+    def __init__(self, package='instruments.drivers', driverDir=None, indexFile=None):
+        self.package = package
+        self.driverDir = os.path.abspath(driverDir or os.path.join(os.path.dirname(__file__), 'drivers'))
+        # one index per driver directory so several checkouts do not share one
+        self.indexFile = indexFile or os.path.join(user_cache_dir(), 'plugin_index-{0}.json'.format(
+            hashlib.sha1(self.driverDir.encode('utf-8')).hexdigest()[:12]))
+        # the directory holding the top level package; base classes defined below it are tracked
+        self.sourceRoot = self.driverDir
+        for ct in range(len(package.split('.'))):
+            self.sourceRoot = os.path.dirname(self.sourceRoot)
+        # moduleName -> [(className, [names of the classes in its MRO])]
+        self.index = None
+        self.lookups = {}
+
+    def driver_stamps(self):
+        stamps = {}
+        for fileName in glob(os.path.join(self.driverDir, '*.py')):
+            stamps[os.path.basename(fileName)] = os.path.getmtime(fileName)
+        return stamps
+
+    def scan(self):
+        """
+        Import every driver module and index the classes it exposes. Also
+        returns the source files of the base classes defined in the code base
+        outside the drivers.
+        """
+        index = {}
+        baseFiles = set()
+        for fileName in sorted(self.driver_stamps().keys()):
+            moduleName = self.package + '.' + os.path.splitext(fileName)[0]
+            driver = import_module(moduleName)
+            index[moduleName] = []
+            for name, clsObj in inspect.getmembers(driver, inspect.isclass):
+                mro = inspect.getmro(clsObj)
+                index[moduleName].append((name, [c.__name__ for c in mro]))
+                for c in mro:
+                    sourceFile = getattr(sys.modules.get(c.__module__), '__file__', None)
+                    if sourceFile and not c.__module__.startswith(self.package + '.'):
+                        sourceFile = os.path.abspath(os.path.splitext(sourceFile)[0] + '.py')
+                        if sourceFile.startswith(self.sourceRoot + os.sep):
+                            baseFiles.add(sourceFile)
+        return index, sorted(baseFiles)
+
+    def load_index(self):
+        if self.index is not None:
+            return self.index
+        stamps = self.driver_stamps()
+        try:
+            with open(self.indexFile, 'r') as FID:
+                saved = json.load(FID)
+            if saved['stamps'] == stamps and saved['baseStamps'] == file_stamps(saved['baseStamps']):
+                self.index = saved['index']
+                return self.index
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+        self.index, baseFiles = self.scan()
+        try:
+            import LibraryWriter
+            if not os.path.isdir(os.path.dirname(self.indexFile)):
+                os.makedirs(os.path.dirname(self.indexFile))
+            LibraryWriter.write_if_changed(self.indexFile,
+                json.dumps({'stamps': stamps, 'baseStamps': file_stamps(baseFiles), 'index': self.index},
+                           sort_keys=True), {})
+        except (IOError, OSError):
+            pass
+        return self.index
+
+    def find(self, baseClass):
+        """
+        Return the driver classes that are strict subclasses of baseClass.
+        """
+        if baseClass in self.lookups:
+            return list(self.lookups[baseClass])
+        plugins = []
+        for moduleName, members in sorted(self.load_index().items()):
+            candidates = [name for name, mro in members if baseClass.__name__ in mro]
+            if not candidates:
+                continue
+            driver = import_module(moduleName)
+            for name in candidates:
+                clsObj = getattr(driver, name)
+                if isStrictSubclass(clsObj, baseClass) and clsObj not in plugins:
+                    plugins.append(clsObj)
+        self.lookups[baseClass] = plugins
+        return list(plugins)
+
+    def get(self, className):
+        """
+        Import and return a driver class by name.
+        """
+        for moduleName, members in sorted(self.load_index().items()):
+            if className in [name for name, mro in members]:
+                return getattr(import_module(moduleName), className)
+        raise KeyError("No driver class named {}".format(className))
+
+registry = PluginRegistry()
+
 def find_view_maps(baseClass, viewMap):
     def addToMap(newMap):
         keys = newMap.viewMap.keys()
@@ -26,20 +156,10 @@ def find_view_maps(baseClass, viewMap):
         addToMap(plugin)
 
 def find_plugins(baseClass, verbose=True):
-    plugins = []
-    dirPath = os.path.dirname(__file__)
-    searchString = '{0}{1}drivers{2}*.py'.format(dirPath, os.sep, os.sep)
-    for file in glob(searchString):
-        driverName = file.split(os.sep)[-1].split('.')[0]
-        fullDriverName = 'instruments.drivers.' + driverName
-        driver = import_module(fullDriverName)
-        clsmembers = inspect.getmembers(driver, inspect.isclass)
-        # register subclasses of AWG excluding AWG
-        for name, clsObj in clsmembers:
-            if isStrictSubclass(clsObj, baseClass):
-                plugins.append(clsObj)
-                if verbose:
-                    print("Registered Driver {}".format(name))
+    plugins = registry.find(baseClass)
+    if verbose:
+        for plugin in plugins:
+            print("Registered Driver {}".format(plugin.__name__))
     return plugins
 
 
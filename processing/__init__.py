@@ -0,0 +1,3 @@
+"""
+Offline NumPy implementations of the measurement filter chain.
+"""
@@ -0,0 +1,83 @@
+"""
+Software averager reproducing the averager mode of the AlazarATS9870.
+
+In digitizer mode the card returns every record, ordered as nbrRoundRobins
+passes over nbrSegments segments each repeated nbrWaveforms times. In averager
+mode it returns the mean record of every segment over all waveforms and round
+robins instead. SoftwareAverager folds digitizer mode buffers into
+preallocated accumulators as they arrive, so the host can stand in for the
+averaging firmware. Its result has shape (nbrSegments, recordLength), the
+same memory layout as the recordLength x nbrSegments averager data of the
+Matlab driver.
+"""
+import numpy as np
+
+class SoftwareAverager(object):
+
+    def __init__(self, recordLength=1024, nbrSegments=1, nbrWaveforms=1, nbrRoundRobins=1, dtype=np.float64):
+        self.recordLength = recordLength
+        self.nbrSegments = nbrSegments
+        self.nbrWaveforms = nbrWaveforms
+        self.nbrRoundRobins = nbrRoundRobins
+        self.recordsPerRoundRobin = nbrSegments*nbrWaveforms
+        self.totalRecords = self.recordsPerRoundRobin*nbrRoundRobins
+        self.accumulator = np.zeros((nbrSegments, recordLength), dtype=dtype)
+        self.scratch = np.zeros((nbrSegments, recordLength), dtype=dtype)
+        self.counts = np.zeros(nbrSegments, dtype=np.int64)
+        self.recordCount = 0
+
+    @classmethod
+    def from_digitizer(cls, digitizer, **kwargs):
+        """
+        Averager for the recordLength/nbrSegments/nbrWaveforms/nbrRoundRobins
+        settings of an AlazarATS9870 (or X6).
+        """
+        return cls(digitizer.recordLength, digitizer.nbrSegments, digitizer.nbrWaveforms,
+                   digitizer.nbrRoundRobins, **kwargs)
+
+    def reset(self):
+        self.accumulator[:] = 0
+        self.counts[:] = 0
+        self.recordCount = 0
+
+    @property
+    def done(self):
+        return self.recordCount >= self.totalRecords
+
+    def process(self, buffer):
+        """
+        Fold a digitizer mode buffer of whole records into the averages. The
+        buffer continues where the previous one stopped; records beyond the
+        last round robin are ignored.
+        """
+        records = np.asarray(buffer).reshape(-1, self.recordLength)
+        records = records[:max(0, self.totalRecords - self.recordCount)]
+        numRecords = records.shape[0]
+        # records up to the next round robin boundary
+        lead = min(numRecords, (-self.recordCount) % self.recordsPerRoundRobin)
+        if lead:
+            self.add_records(records[:lead], self.recordCount)
+        numRoundRobins = (numRecords - lead) // self.recordsPerRoundRobin
+        if numRoundRobins:
+            stop = lead + numRoundRobins*self.recordsPerRoundRobin
+            block = records[lead:stop].reshape(numRoundRobins, self.nbrSegments, self.nbrWaveforms, self.recordLength)
+            np.sum(block, axis=(0, 2), dtype=self.scratch.dtype, out=self.scratch)
+            self.accumulator += self.scratch
+            self.counts += numRoundRobins*self.nbrWaveforms
+            lead = stop
+        if lead < numRecords:
+            self.add_records(records[lead:], self.recordCount + lead)
+        self.recordCount += numRecords
+
+    def add_records(self, records, firstRecord):
+        # partial round robin: unbuffered add by segment index
+        segments = ((firstRecord + np.arange(records.shape[0])) // self.nbrWaveforms) % self.nbrSegments
+        np.add.at(self.accumulator, segments, records)
+        np.add.at(self.counts, segments, 1)
+
+    def result(self):
+        """
+        Averaged records per segment; segments without data are NaN.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.accumulator / self.counts[:, np.newaxis]
@@ -0,0 +1,142 @@
+"""
+Vectorized state comparator with bit-packed shot storage.
+
+StateComparator integrates the leading integrationTime samples of each record
+with a cumulative sum and thresholds whole blocks of records at once. The
+resulting qubit states are appended to a BitPackedStates store at one bit
+per shot, 1/64th of the memory of float64 records.
+"""
+import numpy as np
+
+# number of set bits in each byte value
+popcount = np.array([bin(ct).count('1') for ct in range(256)], dtype=np.uint8)
+
+class BitPackedStates(object):
+    """
+    Growable array of booleans stored eight to a byte.
+    """
+    def __init__(self, capacity=1024):
+        self.bytes = np.zeros(max(1, (capacity + 7)//8), dtype=np.uint8)
+        self.numBits = 0
+
+    def __len__(self):
+        return self.numBits
+
+    def reserve(self, numBits):
+        numBytes = (numBits + 7)//8
+        if numBytes > self.bytes.size:
+            grown = np.zeros(max(numBytes, 2*self.bytes.size), dtype=np.uint8)
+            grown[:self.bytes.size] = self.bytes
+            self.bytes = grown
+
+    def append(self, states):
+        states = np.asarray(states, dtype=bool).reshape(-1)
+        if not states.size:
+            return
+        self.reserve(self.numBits + states.size)
+        start = self.numBits // 8
+        partial = self.numBits % 8
+        if partial:
+            # re-pack the partially filled last byte together with the new states
+            states = np.concatenate((np.unpackbits(self.bytes[start:start+1])[:partial].astype(bool), states))
+        packed = np.packbits(states)
+        self.bytes[start:start+packed.size] = packed
+        self.numBits = start*8 + states.size
+
+    def unpack(self, start=0, stop=None):
+        stop = self.numBits if stop is None else min(stop, self.numBits)
+        firstByte = start // 8
+        bits = np.unpackbits(self.bytes[firstByte:(stop + 7)//8])
+        return bits[start - firstByte*8:stop - firstByte*8].astype(bool)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self.numBits
+        if not 0 <= idx < self.numBits:
+            raise IndexError("state index out of range")
+        return bool((self.bytes[idx // 8] >> (7 - idx % 8)) & 1)
+
+    def count(self):
+        """Number of True states."""
+        fullBytes = self.numBits // 8
+        total = int(np.sum(popcount[self.bytes[:fullBytes]], dtype=np.int64))
+        return total + int(np.sum(self.unpack(fullBytes*8)))
+
+    def mean(self, numSegments=1):
+        """Fraction of True states per segment for shots interleaved over numSegments."""
+        states = self.unpack()
+        numRows = states.size // numSegments
+        return states[:numRows*numSegments].reshape(numRows, numSegments).mean(axis=0)
+
+    def save(self, fileName):
+        np.savez(fileName, bytes=self.bytes[:(self.numBits + 7)//8], numBits=self.numBits)
+
+    @classmethod
+    def load(cls, fileName):
+        with np.load(fileName) as data:
+            states = cls(capacity=int(data['numBits']))
+            states.bytes[:data['bytes'].size] = data['bytes']
+            states.numBits = int(data['numBits'])
+        return states
+
+class StateComparator(object):
+
+    def __init__(self, threshold=0.0, integrationTime=-1):
+        if integrationTime == 0:
+            raise ValueError("Comparator integration time must be positive, or -1 for the entire record")
+        self.threshold = threshold
+        self.integrationTime = integrationTime
+        self.states = BitPackedStates()
+        self.buffer = None
+
+    @classmethod
+    def from_filter(cls, filt):
+        """
+        Build the comparator from a MeasFilters.StateComparator.
+        """
+        return cls(filt.threshold, filt.integrationTime)
+
+    def cumulative(self, records, stop=None):
+        """
+        Running integral of the records over their first stop samples, computed
+        into a buffer that is reused between blocks of the same shape.
+        """
+        records = np.atleast_2d(records)
+        stop = records.shape[-1] if stop is None else min(stop, records.shape[-1])
+        shape = records.shape[:-1] + (stop,)
+        dtype = np.result_type(records, np.float64)
+        if self.buffer is None or self.buffer.shape != shape or self.buffer.dtype != dtype:
+            self.buffer = np.empty(shape, dtype=dtype)
+        return np.cumsum(records[..., :stop], axis=-1, out=self.buffer)
+
+    def integrate(self, records):
+        records = np.asarray(records)
+        if records.ndim < 2:
+            # already integrated
+            return records
+        stop = None if self.integrationTime < 0 else self.integrationTime
+        return self.cumulative(records, stop)[..., -1].copy()
+
+    def compare(self, records):
+        """
+        Qubit states of a block of records, also appended to self.states.
+        """
+        states = np.real(self.integrate(records)) > self.threshold
+        self.states.append(states)
+        return states
+
+    def process(self, inputs):
+        """Filter graph entry point."""
+        return self.compare(inputs[0])
+
+    def sweep_integration_time(self, records, integrationTimes):
+        """
+        States for several integration times from a single cumulative sum, with
+        shape (len(integrationTimes),) + records.shape[:-1].
+        """
+        records = np.atleast_2d(records)
+        integrationTimes = np.asarray(integrationTimes, dtype=int)
+        if not integrationTimes.size or integrationTimes.min() < 1 or integrationTimes.max() > records.shape[-1]:
+            raise ValueError("Integration times must lie between 1 and the record length {0}".format(records.shape[-1]))
+        cumulative = self.cumulative(records, integrationTimes.max())
+        return np.moveaxis(np.real(cumulative[..., integrationTimes - 1]), -1, 0) > self.threshold
@@ -0,0 +1,100 @@
+"""
+Streaming correlator with running statistics per segment.
+
+Inputs are streams of integrated shots in acquisition order. Chunks are
+flattened in C order, and the k-th value since the start of the stream
+belongs to segment k % numSegments, so chunks need not hold whole rounds of
+segments. The correlator multiplies the inputs element-wise and folds the
+products into preallocated per-segment accumulators of count, mean and sum of
+squared deviations (Chan et al. parallel update), so millions of shots are
+reduced without keeping them around or looping over shots in Python.
+"""
+import numpy as np
+
+class Correlator(object):
+
+    def __init__(self, numSegments, dtype=np.complex128):
+        self.numSegments = numSegments
+        self.dtype = np.dtype(dtype)
+        self.count = np.zeros(numSegments, dtype=np.int64)
+        self.mean = np.zeros(numSegments, dtype=self.dtype)
+        # sum of squared magnitudes of the deviations from the mean
+        self.m2 = np.zeros(numSegments, dtype=np.float64)
+        self.offset = 0
+
+    @classmethod
+    def from_filter(cls, filt, numSegments):
+        """
+        Build the correlator for a MeasFilters.Correlator given the number of
+        segments from the digitizer settings.
+        """
+        return cls(numSegments)
+
+    def reset(self):
+        self.count[:] = 0
+        self.mean[:] = 0
+        self.m2[:] = 0
+        self.offset = 0
+
+    def correlate(self, inputs):
+        """
+        Element-wise product of the input chunks, multiplied in place into a
+        single output array.
+        """
+        product = np.array(inputs[0], dtype=self.dtype)
+        for data in inputs[1:]:
+            np.multiply(product, data, out=product, casting='unsafe')
+        return product
+
+    def process(self, inputs):
+        """
+        Correlate one chunk of each input and fold it into the statistics.
+        Returns the correlated chunk.
+        """
+        product = self.correlate(inputs)
+        flat = product.reshape(-1)
+        # line the chunk up with the segments so that each row is one shot of every segment
+        lead = (-self.offset) % self.numSegments
+        lead = min(lead, flat.size)
+        if lead:
+            self.update(flat[:lead], (self.offset + np.arange(lead)) % self.numSegments)
+        body = flat[lead:]
+        numRows = body.size // self.numSegments
+        if numRows:
+            self.update_rows(body[:numRows*self.numSegments].reshape(numRows, self.numSegments))
+        tail = body[numRows*self.numSegments:]
+        if tail.size:
+            self.update(tail, np.arange(tail.size))
+        self.offset += flat.size
+        return product
+
+    def update_rows(self, rows):
+        # merge the statistics of a block of whole rows into the accumulators
+        numRows = rows.shape[0]
+        blockMean = rows.mean(axis=0)
+        deviation = rows - blockMean
+        blockM2 = np.sum(deviation.real**2 + deviation.imag**2, axis=0) if np.iscomplexobj(rows) \
+            else np.sum(deviation**2, axis=0)
+        self.merge(np.s_[:], numRows, blockMean, blockM2)
+
+    def update(self, values, segments):
+        # at most one value per segment here
+        self.merge(segments, 1, values, 0.0)
+
+    def merge(self, index, n, blockMean, blockM2):
+        count = self.count[index]
+        total = count + n
+        delta = blockMean - self.mean[index]
+        weight = n / total.astype(np.float64)
+        self.mean[index] += delta * weight
+        self.m2[index] += blockM2 + np.abs(delta)**2 * count * weight
+        self.count[index] = total
+
+    @property
+    def variance(self):
+        """Sample variance per segment."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.m2 / (self.count - 1)
+
+    def stats(self):
+        return {'count': self.count.copy(), 'mean': self.mean.copy(), 'variance': self.variance}
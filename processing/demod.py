@@ -0,0 +1,142 @@
+"""
+Streaming NumPy implementation of the DigitalDemod filter chain.
+
+The chain follows the DigitalDemod settings:
+- polyphase decimation by decimFactor1
+- mixing with an NCO at IFfreq (rotated by phase)
+- polyphase decimation by decimFactor2
+- a low-pass IIR filter at bandwidth
+- polyphase decimation by decimFactor3
+
+Records are blocks of shape (numRecords, numSamples). Successive calls to
+DemodEngine.process continue the same records along the sample axis with the
+filter state carried over, so long records can be streamed through in pieces.
+reset() starts a new set of records.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from scipy import signal
+
+def lowpass_taps(decimFactor, tapsPerPhase=8):
+    """
+    Hamming windowed-sinc anti-aliasing filter for decimation by decimFactor,
+    normalized to unity gain at DC.
+    """
+    numTaps = tapsPerPhase*decimFactor + 1
+    n = np.arange(numTaps) - (numTaps - 1)/2.0
+    taps = np.sinc(n/decimFactor) * np.hamming(numTaps)
+    return taps / np.sum(taps)
+
+class PolyphaseDecimator(object):
+    """
+    FIR filter and downsample by decimFactor, computing only the kept outputs.
+    """
+    def __init__(self, decimFactor, taps=None):
+        self.decimFactor = decimFactor
+        self.taps = lowpass_taps(decimFactor) if taps is None else np.asarray(taps)
+        self.history = None
+        self.offset = 0
+
+    def reset(self):
+        self.history = None
+        self.offset = 0
+
+    def process(self, block):
+        if self.decimFactor == 1:
+            return block
+        numTaps = self.taps.size
+        if self.history is None:
+            self.history = np.zeros((block.shape[0], numTaps - 1), dtype=block.dtype)
+        data = np.concatenate((self.history.astype(np.result_type(self.history, block)), block), axis=1)
+        # output n uses the numTaps samples ending at input sample offset + n*decimFactor
+        numOut = max(0, (block.shape[1] - self.offset + self.decimFactor - 1)//self.decimFactor)
+        windows = as_strided(data[:, self.offset:],
+                             shape=(data.shape[0], numOut, numTaps),
+                             strides=(data.strides[0], data.strides[1]*self.decimFactor, data.strides[1]))
+        out = np.dot(windows, self.taps[::-1])
+        self.offset = self.offset + numOut*self.decimFactor - block.shape[1]
+        self.history = data[:, data.shape[1] - (numTaps - 1):].copy()
+        return out
+
+class IIRFilter(object):
+    """
+    Butterworth low-pass filter run along the sample axis as a cascade of
+    second-order sections, vectorized across records.
+    """
+    def __init__(self, cutoff, samplingRate, order=4):
+        if not 0 < cutoff < samplingRate/2.0:
+            raise ValueError("IIR cutoff {0} must lie between 0 and the Nyquist frequency {1}".format(cutoff, samplingRate/2.0))
+        self.sos = signal.butter(order, cutoff/(samplingRate/2.0), output='sos')
+        self.state = None
+
+    def reset(self):
+        self.state = None
+
+    def process(self, block):
+        if self.state is None:
+            self.state = np.zeros((self.sos.shape[0], block.shape[0], 2), dtype=np.complex128)
+        if block.shape[1] == 0:
+            return np.zeros(block.shape, dtype=np.complex128)
+        out, self.state = signal.sosfilt(self.sos, block, axis=-1, zi=self.state)
+        return out
+
+class DemodEngine(object):
+    """
+    Runs the DigitalDemod chain over blocks of raw records.
+    """
+    def __init__(self, IFfreq=10e6, bandwidth=5e6, samplingRate=250e6, phase=0.0,
+                 decimFactor1=1, decimFactor2=1, decimFactor3=1):
+        self.IFfreq = IFfreq
+        self.phase = phase
+        self.mixRate = samplingRate/decimFactor1
+        self.stage1 = PolyphaseDecimator(decimFactor1)
+        self.stage2 = PolyphaseDecimator(decimFactor2)
+        self.iir = IIRFilter(bandwidth, self.mixRate/decimFactor2)
+        self.stage3 = PolyphaseDecimator(decimFactor3)
+        self.reset()
+
+    @classmethod
+    def from_filter(cls, filt):
+        """
+        Build the engine from a MeasFilters.DigitalDemod.
+        """
+        return cls(**{k: getattr(filt, k) for k in ['IFfreq', 'bandwidth', 'samplingRate', 'phase',
+                                                    'decimFactor1', 'decimFactor2', 'decimFactor3']})
+
+    def reset(self):
+        for stage in [self.stage1, self.stage2, self.iir, self.stage3]:
+            stage.reset()
+        self.mixCount = 0
+
+    def process(self, block):
+        """
+        Push the next samples of the current records through the chain.
+        Returns the complex demodulated samples produced by this block.
+        """
+        block = np.atleast_2d(block)
+        data = self.stage1.process(block)
+        t = (self.mixCount + np.arange(data.shape[1]))/self.mixRate
+        self.mixCount += data.shape[1]
+        data = data * np.exp(-1j*2*np.pi*self.IFfreq*t + 1j*self.phase)
+        data = self.stage2.process(data)
+        data = self.iir.process(data)
+        return self.stage3.process(data)
+
+    def process_records(self, records, chunkSize=None):
+        """
+        Demodulate whole records, optionally streaming them through in chunks
+        of chunkSize samples. The output does not depend on chunkSize.
+        """
+        records = np.atleast_2d(records)
+        self.reset()
+        chunkSize = chunkSize or records.shape[1]
+        out = [self.process(records[:, ct:ct+chunkSize]) for ct in range(0, records.shape[1], chunkSize)]
+        return np.concatenate(out, axis=1)
+
+    def iter_records(self, blocks, chunkSize=None):
+        """
+        Demodulate an iterable of record blocks, e.g. read from a RawStream
+        records file, one block at a time.
+        """
+        for records in blocks:
+            yield self.process_records(records, chunkSize)
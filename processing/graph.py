@@ -0,0 +1,268 @@
+"""
+Dataflow scheduler for the measurement filter graph.
+
+The enabled filters of a MeasFilterLibrary form a DAG: every filter reads from
+the filter named by its dataSource, a Correlator reads from all of its filters,
+and RawStream/StreamSelector filters are the sources fed with digitizer data.
+FilterGraph sorts the graph topologically and streams chunks of records
+through it. Every filter processes its chunks in order, but independent
+filters (parallel branches, or successive stages working on different chunks)
+run concurrently on a thread pool. A filter's output is handed as the same
+read-only view to all its consumers, and the input queues are bounded so
+fast sources cannot run ahead of slow filters. Filters with several inputs
+consume one chunk from each, so all the sources must be fed the same number
+of chunks.
+"""
+from collections import deque
+from multiprocessing.pool import ThreadPool
+import threading
+import time
+
+import numpy as np
+
+from processing.comparator import StateComparator
+from processing.correlator import Correlator
+from processing.demod import DemodEngine
+from processing.integration import IntegrationEngine
+from processing.records import RecordsWriter
+
+sourceTypes = ['RawStream', 'StreamSelector']
+
+def demod_processor(filt, settings):
+    engine = DemodEngine.from_filter(filt)
+    return lambda inputs: engine.process_records(inputs[0])
+
+def integration_processor(filt, settings):
+    engine = IntegrationEngine.from_filters([filt])
+    return lambda inputs: engine.integrate(inputs[0])
+
+def correlator_processor(filt, settings):
+    return Correlator.from_filter(filt, settings.get('nbrSegments', 1)).process
+
+def comparator_processor(filt, settings):
+    return StateComparator.from_filter(filt).process
+
+# filter class name -> factory(filter, acquisition settings) returning a function
+# from the list of input chunks to the output chunk
+processorFactories = {
+    'DigitalDemod': demod_processor,
+    'KernelIntegration': integration_processor,
+    'Correlator': correlator_processor,
+    'StateComparator': comparator_processor,
+}
+
+class NodeMetrics(object):
+    def __init__(self):
+        self.calls = 0
+        self.busyTime = 0.0
+        self.maxQueueDepth = 0
+        self.queueDepthSum = 0
+
+    def record(self, elapsed, queueDepth):
+        self.calls += 1
+        self.busyTime += elapsed
+        self.maxQueueDepth = max(self.maxQueueDepth, queueDepth)
+        self.queueDepthSum += queueDepth
+
+    def as_dict(self):
+        return {'calls': self.calls,
+                'busyTime': self.busyTime,
+                'meanTime': self.busyTime/self.calls if self.calls else 0.0,
+                'maxQueueDepth': self.maxQueueDepth,
+                'meanQueueDepth': float(self.queueDepthSum)/self.calls if self.calls else 0.0}
+
+class FilterGraph(object):
+
+    def __init__(self, filterLib, processors=None, settings=None):
+        """
+        settings holds the acquisition settings the processors and records
+        writers need, e.g. nbrSegments and nbrWaveforms of the digitizer.
+        """
+        filterDict = getattr(filterLib, 'filterDict', filterLib)
+        self.filters = {label: filt for label, filt in filterDict.items() if filt.enabled}
+        self.upstream = {label: self.data_sources(label) for label in self.filters}
+        self.downstream = {label: [] for label in self.filters}
+        for label, sources in self.upstream.items():
+            for source in sources:
+                self.downstream[source].append(label)
+        self.order = self.topological_sort()
+        self.processorFactories = dict(processorFactories)
+        self.processorFactories.update(processors or {})
+        self.settings = settings or {}
+        self.processors = {}
+        self.metrics = {}
+        self.writerStats = {}
+
+    def data_sources(self, label):
+        filt = self.filters[label]
+        if filt.__class__.__name__ in sourceTypes:
+            return []
+        if filt.__class__.__name__ == 'Correlator':
+            sources = [f if isinstance(f, str) else f.label for f in filt.filters if f is not None]
+        else:
+            sources = [filt.dataSource]
+        for source in sources:
+            if source not in self.filters:
+                raise ValueError("Data source {0} of filter {1} is not an enabled filter".format(source, label))
+        return sources
+
+    def topological_sort(self):
+        inDegree = {label: len(sources) for label, sources in self.upstream.items()}
+        ready = sorted(label for label, degree in inDegree.items() if degree == 0)
+        order = []
+        while ready:
+            label = ready.pop(0)
+            order.append(label)
+            for consumer in sorted(self.downstream[label]):
+                inDegree[consumer] -= 1
+                if inDegree[consumer] == 0:
+                    ready.append(consumer)
+        if len(order) != len(self.filters):
+            raise ValueError("Measurement filters contain a cycle through {0}".format(
+                sorted(set(self.filters) - set(order))))
+        return order
+
+    def sources(self):
+        return [label for label in self.order if not self.upstream[label]]
+
+    def sinks(self):
+        return [label for label in self.order if not self.downstream[label]]
+
+    def records_writers(self, writerOptions=None):
+        """
+        One RecordsWriter per recordsFilePath of the filters with saveRecords set.
+        """
+        writers = {}
+        byPath = {}
+        for label in self.order:
+            filt = self.filters[label]
+            if getattr(filt, 'saveRecords', False) and filt.recordsFilePath:
+                if filt.recordsFilePath not in byPath:
+                    byPath[filt.recordsFilePath] = RecordsWriter.from_filter(filt, self.settings, **(writerOptions or {}))
+                writers[label] = byPath[filt.recordsFilePath]
+        return writers
+
+    def run(self, feeds, collect=None, numThreads=None, maxQueue=4, saveRecords=True, writerOptions=None):
+        """
+        Stream data through the graph.
+
+        feeds maps each source filter to an iterable of record chunks. Returns a
+        dictionary from filter label to the list of its output chunks for the
+        filters in collect (by default the sinks of the graph). Per filter
+        timing and input queue depths are left in self.metrics.
+        With saveRecords the outputs of the filters with saveRecords set are
+        written to their recordsFilePath in the background, see RecordsWriter.
+        """
+        missing = set(self.sources()) - set(feeds)
+        if missing:
+            raise ValueError("No data fed to source filters {0}".format(sorted(missing)))
+        collect = self.sinks() if collect is None else list(collect)
+
+        processors = {}
+        for label in self.order:
+            if self.upstream[label]:
+                className = self.filters[label].__class__.__name__
+                if className not in self.processorFactories:
+                    raise ValueError("No processor for filter {0} of type {1}".format(label, className))
+                processors[label] = self.processorFactories[className](self.filters[label], self.settings)
+        self.processors = processors
+        iterators = {label: iter(feeds[label]) for label in self.sources()}
+        writers = self.records_writers(writerOptions) if saveRecords else {}
+
+        queues = {label: {source: deque() for source in self.upstream[label]} for label in self.order}
+        results = {label: [] for label in collect}
+        self.metrics = {label: NodeMetrics() for label in self.order}
+        running = set()
+        exhausted = set()
+        errors = []
+        cond = threading.Condition()
+
+        def execute(label, inputs, queueDepth):
+            start = time.time()
+            output, done = None, False
+            try:
+                if label in iterators:
+                    try:
+                        output = next(iterators[label])
+                    except StopIteration:
+                        done = True
+                else:
+                    output = processors[label](inputs)
+            except Exception as e:
+                errors.append((label, e))
+            elapsed = time.time() - start
+            if isinstance(output, np.ndarray):
+                # shared by all the consumers; a read-only view leaves the
+                # writeable flag of the caller's or processor's array alone
+                output = output.view()
+                output.flags.writeable = False
+            if label in writers and output is not None and not done:
+                try:
+                    # blocks here when the disk falls behind
+                    writers[label].write(label, output)
+                except Exception as e:
+                    errors.append((label, e))
+            with cond:
+                running.discard(label)
+                if done:
+                    exhausted.add(label)
+                elif not errors:
+                    self.metrics[label].record(elapsed, queueDepth)
+                    for consumer in self.downstream[label]:
+                        queues[consumer][label].append(output)
+                    if label in results:
+                        results[label].append(output)
+                cond.notify()
+
+        def ready(label):
+            if label in running or label in exhausted:
+                return False
+            if any(len(queues[consumer][label]) >= maxQueue for consumer in self.downstream[label]):
+                return False
+            return all(queues[label].values()) if self.upstream[label] else True
+
+        for writer in set(writers.values()):
+            writer.start()
+        pool = ThreadPool(numThreads)
+        try:
+            with cond:
+                while not errors:
+                    for label in self.order:
+                        if ready(label):
+                            queueDepth = max([len(q) for q in queues[label].values()] or [0])
+                            inputs = [queues[label][source].popleft() for source in self.upstream[label]]
+                            running.add(label)
+                            pool.apply_async(execute, (label, inputs, queueDepth))
+                    if not running:
+                        break
+                    cond.wait()
+                if not errors:
+                    # chunks left over when the graph stalls are inputs without partners
+                    unmatched = sorted(label for label in self.order if any(queues[label].values()))
+                    if unmatched:
+                        raise ValueError("Filters {0} were left with unmatched input chunks; "
+                                         "feed all sources the same number of chunks".format(unmatched))
+        finally:
+            pool.close()
+            pool.join()
+            for writer in set(writers.values()):
+                try:
+                    writer.close()
+                except Exception as e:
+                    errors.append((writer.fileName, e))
+                self.writerStats[writer.fileName] = writer.stats()
+        if errors:
+            label, e = errors[0]
+            raise RuntimeError("Measurement filter {0} failed: {1!r}".format(label, e))
+        return results
+
+    def engine(self, label):
+        """
+        The engine behind a filter's processor after a run, e.g. the Correlator
+        holding the running statistics or the StateComparator holding the states.
+        """
+        processor = self.processors[label]
+        return getattr(processor, '__self__', processor)
+
+    def metrics_report(self):
+        return {label: metrics.as_dict() for label, metrics in self.metrics.items()}
@@ -0,0 +1,112 @@
+"""
+Kernel cache and batched kernel integration.
+
+Building a KernelIntegration kernel means either evaluating a boxcar times
+I.F. phasor or eval'ing the kernel string. KernelCache memoizes the result per
+set of kernel parameters with least-recently-used eviction (LRUCache, which
+also backs the KernelStore caches). IntegrationEngine stacks one or more
+kernels into a matrix and integrates a whole block of records with a single
+matrix product.
+"""
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+class LRUCache(object):
+    """
+    Thread-safe memo of factory results with least-recently-used eviction.
+    """
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        """
+        Return the value stored under key, building it with factory() on a miss.
+        """
+        with self.lock:
+            if key in self.items:
+                self.hits += 1
+                value = self.items.pop(key)
+                self.items[key] = value
+                return value
+        value = factory()
+        with self.lock:
+            self.misses += 1
+            self.items[key] = value
+            while len(self.items) > self.maxSize:
+                self.items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+class KernelCache(LRUCache):
+
+    def __init__(self, maxSize=32):
+        super(KernelCache, self).__init__(maxSize)
+
+    def get(self, key, factory):
+        """
+        Return the kernel stored under key, building it with factory() on a miss.
+        Cached kernels are read-only since they are shared.
+        """
+        def build():
+            kernel = np.asarray(factory())
+            kernel.flags.writeable = False
+            return kernel
+        return super(KernelCache, self).get(key, build)
+
+kernelCache = KernelCache()
+
+class IntegrationEngine(object):
+    """
+    Integrate records against a set of kernels: out = records . kernels + bias.
+
+    Kernels of different lengths are zero padded to the longest; records longer
+    than that are truncated and shorter ones use the leading kernel samples.
+    """
+    def __init__(self, kernels, biases=None):
+        kernels = [np.asarray(k) for k in kernels]
+        self.kernelLength = max(k.size for k in kernels)
+        self.kernels = np.zeros((self.kernelLength, len(kernels)), dtype=np.result_type(np.complex128, *kernels))
+        for ct, k in enumerate(kernels):
+            self.kernels[:k.size, ct] = k
+        self.biases = np.zeros(len(kernels)) if biases is None else np.asarray(biases)
+
+    @classmethod
+    def from_filters(cls, filters):
+        """
+        Build the engine from a list of MeasFilters.KernelIntegration.
+        """
+        return cls([filt.get_kernel() for filt in filters], [filt.bias for filt in filters])
+
+    def integrate(self, records, chunkSize=None):
+        """
+        Integrate records of shape (..., numSamples). Returns an array of shape
+        (..., numKernels), squeezed to (...) for a single kernel.
+        """
+        records = np.asarray(records)
+        numSamples = min(records.shape[-1], self.kernelLength)
+        kernels = self.kernels[:numSamples]
+        flat = records.reshape(-1, records.shape[-1])[:, :numSamples]
+        out = np.empty((flat.shape[0], kernels.shape[1]), dtype=np.result_type(flat, kernels))
+        chunkSize = chunkSize or max(flat.shape[0], 1)
+        for ct in range(0, flat.shape[0], chunkSize):
+            np.dot(flat[ct:ct+chunkSize], kernels, out=out[ct:ct+chunkSize])
+        out += self.biases
+        out = out.reshape(records.shape[:-1] + (kernels.shape[1],))
+        return out[..., 0] if kernels.shape[1] == 1 else out
@@ -0,0 +1,333 @@
+"""
+Single-shot record files.
+
+RecordsReader gives offline analysis a lazily sliced view of such a file, or
+of a raw binary records file, indexed by (round robin, segment, waveform,
+sample), so files larger than memory can be streamed over.
+
+RecordsWriter is the sink behind the saveRecords/recordsFilePath settings of
+RawStream, DigitalDemod and StreamSelector. Blocks of records are queued and
+appended to chunked, optionally compressed HDF5 datasets by a background
+thread, one dataset per filter label. Blocks are queued as they are, without
+copying, so the caller must not modify them afterwards (the filter graph hands
+out read-only arrays). When the queue is full the disk is falling behind: the
+writer either blocks the producer, counting the stall, or raises
+RecordsBackpressure.
+"""
+import os
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import h5py
+import numpy as np
+
+class RecordsBackpressure(IOError):
+    """The records writer queue is full because the disk cannot keep up."""
+    pass
+
+class RecordsWriter(object):
+
+    def __init__(self, fileName, chunkRecords=256, compression=None, maxQueue=16, block=True, timeout=None,
+                 nbrSegments=None, nbrWaveforms=None):
+        """
+        chunkRecords is the number of records per HDF5 chunk and compression
+        one of the h5py filters (e.g. 'gzip' or 'lzf'). With block=False, or
+        when timeout seconds pass while waiting for room in the queue, write
+        raises RecordsBackpressure instead of waiting. nbrSegments and
+        nbrWaveforms, when given, are stored as attributes of each dataset so
+        RecordsReader can recover the record layout.
+        """
+        self.fileName = fileName
+        self.chunkRecords = chunkRecords
+        self.nbrSegments = nbrSegments
+        self.nbrWaveforms = nbrWaveforms
+        self.compression = compression
+        self.block = block
+        self.timeout = timeout
+        self.queue = queue.Queue(maxsize=maxQueue)
+        self.bytesWritten = 0
+        self.recordsWritten = {}
+        self.writeTime = 0.0
+        self.stalls = 0
+        self.stallTime = 0.0
+        self.error = None
+        self.startTime = None
+        self.stopTime = None
+        self.thread = None
+        self.FID = None
+
+    @classmethod
+    def from_filter(cls, filt, settings=None, **kwargs):
+        """
+        Writer for the recordsFilePath of a RawStream, DigitalDemod or
+        StreamSelector. The record layout is taken from the nbrSegments and
+        nbrWaveforms of the acquisition settings, if present.
+        """
+        for key in ['nbrSegments', 'nbrWaveforms']:
+            if settings and key in settings:
+                kwargs.setdefault(key, settings[key])
+        return cls(filt.recordsFilePath, **kwargs)
+
+    def start(self):
+        self.FID = h5py.File(self.fileName, 'w')
+        self.startTime = time.time()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, name, records):
+        """
+        Queue a block of records of shape (numRecords, ...) for dataset name.
+        """
+        if self.error is not None:
+            raise self.error
+        if self.thread is None or not self.thread.is_alive():
+            # nothing would ever drain the queue
+            raise RuntimeError("Records writer for {0} is not running; call start() first".format(self.fileName))
+        item = (name, np.asarray(records))
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            if not self.block:
+                raise RecordsBackpressure("Records writer for {0} fell behind".format(self.fileName))
+        self.stalls += 1
+        start = time.time()
+        try:
+            self.queue.put(item, timeout=self.timeout)
+        except queue.Full:
+            raise RecordsBackpressure("Records writer for {0} fell behind by more than {1} s".format(
+                self.fileName, self.timeout))
+        finally:
+            self.stallTime += time.time() - start
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            name, records = item
+            try:
+                start = time.time()
+                self.append(name, records)
+                self.writeTime += time.time() - start
+            except Exception as e:
+                self.error = e
+
+    def append(self, name, records):
+        if records.ndim == 1:
+            records = records[:, np.newaxis]
+        if name not in self.FID:
+            dataset = self.FID.create_dataset(name, shape=(0,) + records.shape[1:], maxshape=(None,) + records.shape[1:],
+                                              dtype=records.dtype, chunks=(self.chunkRecords,) + records.shape[1:],
+                                              compression=self.compression)
+            for attr in ['nbrSegments', 'nbrWaveforms']:
+                if getattr(self, attr) is not None:
+                    dataset.attrs[attr] = getattr(self, attr)
+        dataset = self.FID[name]
+        start = dataset.shape[0]
+        dataset.resize(start + records.shape[0], axis=0)
+        dataset[start:] = records
+        self.recordsWritten[name] = start + records.shape[0]
+        self.bytesWritten += records.nbytes
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        if self.FID is not None:
+            self.FID.close()
+            self.FID = None
+            self.stopTime = time.time()
+        if self.error is not None:
+            raise self.error
+
+    def throughput(self):
+        """Sustained MB/s since start, including time spent waiting for data."""
+        elapsed = (self.stopTime or time.time()) - self.startTime if self.startTime else 0.0
+        return self.bytesWritten/1e6/elapsed if elapsed else 0.0
+
+    def stats(self):
+        return {'MBWritten': self.bytesWritten/1e6,
+                'MBps': self.throughput(),
+                'diskMBps': self.bytesWritten/1e6/self.writeTime if self.writeTime else 0.0,
+                'records': dict(self.recordsWritten),
+                'queueDepth': self.queue.qsize(),
+                'stalls': self.stalls,
+                'stallTime': self.stallTime}
+
+class RecordsReader(object):
+    """
+    Lazily sliced view of a saved records dataset with shape
+    (round robin, segment, waveform, sample).
+
+    Contiguous uncompressed HDF5 datasets and raw binary files are memory
+    mapped, so any slice only touches the pages it needs. Chunked datasets, as
+    written by RecordsWriter, cannot be mapped; indexing then reads only the
+    selected records, in contiguous runs, and passes the sample selection on
+    to HDF5.
+    """
+    def __init__(self, fileName, name=None, nbrSegments=None, nbrWaveforms=None, nbrRoundRobins=None,
+                 recordLength=None, dtype=np.float32):
+        """
+        name is the dataset of an HDF5 file, which RecordsWriter names after
+        the filter label; it may be left out for files with a single
+        dataset. Raw binary files hold records of
+        recordLength samples of the given dtype back to back. nbrSegments and
+        nbrWaveforms default to the attributes stored by RecordsWriter, or 1.
+        """
+        self.fileName = fileName
+        self.FID = None
+        self.dataset = None
+        self.array = None
+        if h5py.is_hdf5(fileName):
+            self.FID = h5py.File(fileName, 'r')
+            if name is None:
+                names = sorted(key for key, value in self.FID.items() if isinstance(value, h5py.Dataset))
+                if len(names) != 1:
+                    self.close()
+                    raise ValueError("{0} holds the datasets {1}; pick one by name".format(fileName, names))
+                name = names[0]
+            self.dataset = self.FID[name]
+            if nbrSegments is None:
+                nbrSegments = int(self.dataset.attrs.get('nbrSegments', 1))
+            if nbrWaveforms is None:
+                nbrWaveforms = int(self.dataset.attrs.get('nbrWaveforms', 1))
+            numRecords = self.dataset.shape[0]
+            recordShape = self.dataset.shape[1:]
+            self.dtype = self.dataset.dtype
+            offset = self.dataset.id.get_offset()
+            if self.dataset.chunks is None and offset is not None:
+                self.array = np.memmap(fileName, dtype=self.dtype, mode='r', offset=offset, shape=self.dataset.shape)
+        else:
+            if recordLength is None:
+                raise ValueError("recordLength is needed to read raw records from {0}".format(fileName))
+            self.dtype = np.dtype(dtype)
+            nbrSegments = nbrSegments or 1
+            nbrWaveforms = nbrWaveforms or 1
+            numRecords = os.path.getsize(fileName) // (self.dtype.itemsize * recordLength)
+            recordShape = (recordLength,)
+            self.array = np.memmap(fileName, dtype=self.dtype, mode='r', shape=(numRecords, recordLength))
+
+        self.recordsPerRoundRobin = nbrSegments*nbrWaveforms
+        available = numRecords // self.recordsPerRoundRobin
+        if nbrRoundRobins is None or nbrRoundRobins > available:
+            nbrRoundRobins = available
+        self.shape = (nbrRoundRobins, nbrSegments, nbrWaveforms) + tuple(recordShape)
+        if self.array is not None:
+            self.array = self.array[:nbrRoundRobins*self.recordsPerRoundRobin].reshape(self.shape)
+
+    @classmethod
+    def from_digitizer(cls, fileName, digitizer, name=None, **kwargs):
+        """
+        Take the shape from the nbrSegments, nbrWaveforms, nbrRoundRobins and
+        recordLength settings of a digitizer.
+        """
+        return cls(fileName, name, nbrSegments=digitizer.nbrSegments, nbrWaveforms=digitizer.nbrWaveforms,
+                   nbrRoundRobins=digitizer.nbrRoundRobins, recordLength=digitizer.recordLength, **kwargs)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __getitem__(self, key):
+        if self.array is not None:
+            return self.array[key]
+        if not isinstance(key, tuple):
+            key = (key,)
+        for ct, k in enumerate(key):
+            if k is Ellipsis:
+                key = key[:ct] + (slice(None),)*(self.ndim - len(key) + 1) + key[ct+1:]
+                break
+        key = key + (slice(None),)*(self.ndim - len(key))
+
+        # Read the box of records and samples touched by the index, then apply
+        # the index in local coordinates so the result matches numpy indexing.
+        positions = []
+        localKey = []
+        for n, k in zip(self.shape[:3], key[:3]):
+            if isinstance(k, slice):
+                positions.append(np.arange(n)[k])
+                localKey.append(slice(None))
+            elif np.ndim(k) == 0:
+                positions.append(np.arange(n)[[k]])
+                localKey.append(0)
+            else:
+                idx = np.arange(n)[k]
+                unique, inverse = np.unique(idx, return_inverse=True)
+                positions.append(unique)
+                localKey.append(inverse.reshape(idx.shape))
+        rr, seg, wf = positions
+        recordIds = (rr[:, np.newaxis, np.newaxis]*self.recordsPerRoundRobin +
+                     seg[np.newaxis, :, np.newaxis]*self.shape[2] + wf[np.newaxis, np.newaxis, :])
+
+        # h5py takes forward slices; anything fancier is applied after the read
+        sampleKey = []
+        for n, k in zip(self.shape[3:], key[3:]):
+            if isinstance(k, slice) and (k.step is None or k.step > 0):
+                sampleKey.append(k)
+                localKey.append(slice(None))
+            elif not isinstance(k, slice) and np.ndim(k) == 0:
+                k = int(np.arange(n)[k])
+                sampleKey.append(slice(k, k + 1))
+                localKey.append(0)
+            else:
+                sampleKey.append(slice(None))
+                localKey.append(k)
+
+        records = self.read_records(recordIds.ravel(), tuple(sampleKey))
+        return records.reshape(recordIds.shape + records.shape[1:])[tuple(localKey)]
+
+    def read_records(self, recordIds, sampleKey=()):
+        """
+        Read the given records, in the given order, with one HDF5 read per
+        contiguous run of record numbers.
+        """
+        unique = np.unique(recordIds)
+        breaks = np.flatnonzero(np.diff(unique) != 1) + 1
+        runs = zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [unique.size])))
+        blocks = [self.dataset[(slice(int(unique[a]), int(unique[b - 1]) + 1),) + sampleKey]
+                  for a, b in runs if b > a]
+        if not blocks:
+            return np.zeros((0,) + self.shape[3:], dtype=self.dtype)[(slice(None),) + sampleKey]
+        records = np.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+        if unique.size == recordIds.size and np.all(unique == recordIds):
+            return records
+        return records[np.searchsorted(unique, recordIds)]
+
+    def iter_round_robins(self, chunkSize=1):
+        """
+        Stream over the file chunkSize round robins at a time.
+        """
+        for start in range(0, self.shape[0], chunkSize):
+            yield self[start:start + chunkSize]
+
+    def close(self):
+        self.array = None
+        if self.FID is not None:
+            self.FID.close()
+            self.FID = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
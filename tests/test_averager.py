@@ -0,0 +1,23 @@
+import unittest
+import numpy as np
+
+from processing.averager import SoftwareAverager
+
+
+class TestSoftwareAverager(unittest.TestCase):
+
+	def test_matches_averager_mode(self):
+		recordLength, nbrSegments, nbrWaveforms, nbrRoundRobins = 64, 5, 3, 7
+		data = np.random.randn(nbrRoundRobins, nbrSegments, nbrWaveforms, recordLength)
+		averager = SoftwareAverager(recordLength, nbrSegments, nbrWaveforms, nbrRoundRobins)
+		records = data.reshape(-1, recordLength)
+		start = 0
+		# buffers that do not line up with the round robins
+		for size in [2, 20, 1, 50, 40, 100]:
+			averager.process(records[start:start+size])
+			start += size
+		self.assertTrue(averager.done)
+		np.testing.assert_allclose(averager.result(), np.mean(data, axis=(0, 2)))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+
+from processing.comparator import BitPackedStates, StateComparator
+
+
+class TestStateComparator(unittest.TestCase):
+
+	def test_bit_packing(self):
+		states = BitPackedStates(capacity=4)
+		expected = []
+		# appends that do not end on byte boundaries
+		for size in [3, 5, 1, 13, 100]:
+			chunk = np.random.rand(size) > 0.5
+			states.append(chunk)
+			expected.append(chunk)
+		expected = np.concatenate(expected)
+		self.assertEqual(len(states), expected.size)
+		np.testing.assert_array_equal(states.unpack(), expected)
+		np.testing.assert_array_equal(states.unpack(5, 77), expected[5:77])
+		self.assertEqual(states.count(), np.sum(expected))
+		self.assertEqual(states[-1], expected[-1])
+
+	def test_integration_time(self):
+		records = np.random.randn(50, 64)
+		comparator = StateComparator(threshold=0.1, integrationTime=20)
+		np.testing.assert_array_equal(comparator.compare(records), np.sum(records[:, :20], axis=1) > 0.1)
+		np.testing.assert_array_equal(comparator.states.unpack(), np.sum(records[:, :20], axis=1) > 0.1)
+		self.assertRaises(ValueError, StateComparator, 0.1, 0)
+
+	def test_sweep_integration_time(self):
+		records = np.random.randn(50, 64)
+		comparator = StateComparator(threshold=0.1)
+		states = comparator.sweep_integration_time(records, [1, 20, 64])
+		for times, expected in zip([1, 20, 64], states):
+			np.testing.assert_array_equal(expected, np.sum(records[:, :times], axis=1) > 0.1)
+		for times in [[0, 10], [10, 65], []]:
+			self.assertRaises(ValueError, comparator.sweep_integration_time, records, times)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+import numpy as np
+
+from processing.correlator import Correlator
+
+
+class TestCorrelator(unittest.TestCase):
+
+	def test_running_statistics(self):
+		numSegments = 7
+		a = np.random.randn(1000) + 1j*np.random.randn(1000)
+		b = np.random.randn(1000)
+		correlator = Correlator(numSegments)
+		start = 0
+		# chunk boundaries deliberately not aligned with the segments
+		for size in [3, 100, 5, 892]:
+			correlator.process([a[start:start+size], b[start:start+size]])
+			start += size
+		product = a*b
+		for segment in range(numSegments):
+			values = product[segment::numSegments]
+			self.assertEqual(correlator.count[segment], values.size)
+			np.testing.assert_allclose(correlator.mean[segment], values.mean())
+			np.testing.assert_allclose(correlator.variance[segment], np.var(values, ddof=1))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+import numpy as np
+
+from processing.demod import DemodEngine, PolyphaseDecimator
+
+
+class TestDemodEngine(unittest.TestCase):
+
+	def test_decimator_matches_convolution(self):
+		records = np.random.randn(3, 200)
+		decimator = PolyphaseDecimator(4)
+		expected = np.array([np.convolve(r, decimator.taps)[:200] for r in records])[:, ::4]
+		np.testing.assert_allclose(decimator.process(records), expected, atol=1e-12)
+
+	def test_chunking_is_transparent(self):
+		engine = DemodEngine(decimFactor1=4, decimFactor2=2, decimFactor3=2)
+		records = np.random.randn(5, 1000)
+		np.testing.assert_allclose(engine.process_records(records), engine.process_records(records, chunkSize=37))
+
+	def test_tone_is_mixed_to_baseband(self):
+		t = np.arange(2000)/250e6
+		records = np.cos(2*np.pi*10e6*t + 0.3)[np.newaxis, :]
+		out = DemodEngine(IFfreq=10e6, bandwidth=2e6).process_records(records)
+		np.testing.assert_allclose(out[0, -1], 0.5*np.exp(0.3j), atol=1e-2)
+
+if __name__ == '__main__':
+	unittest.main()
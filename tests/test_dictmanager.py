@@ -0,0 +1,49 @@
+import unittest
+
+from atom.api import Atom, Str
+
+from DictManager import DictManager, DictIndex
+
+
+class Foo(Atom):
+	label = Str()
+
+class Bar(Atom):
+	label = Str()
+
+
+class TestDictIndex(unittest.TestCase):
+
+	def setUp(self):
+		self.itemDict = {label: Foo(label=label) for label in ['d', 'b']}
+		self.itemDict.update({label: Bar(label=label) for label in ['c', 'a']})
+		index = DictIndex(self.itemDict)
+		self.foos = DictManager(itemDict=self.itemDict, displayFilter=lambda x: isinstance(x, Foo), index=index)
+		self.bars = DictManager(itemDict=self.itemDict, displayFilter=lambda x: isinstance(x, Bar), index=index)
+
+	def assertSorted(self):
+		for manager in [self.foos, self.bars]:
+			expected = sorted(v.label for v in self.itemDict.values() if manager.displayFilter(v))
+			self.assertEqual(list(manager.displayList), expected)
+
+	def test_bulk_add(self):
+		events = []
+		self.bars.observe('itemChanged', lambda change: events.append(change['value']))
+		self.bars.add_items({'e': Bar(label='e'), 'aa': Foo(label='aa'), 'z': Bar(label='z')})
+		self.assertSorted()
+		self.assertEqual(events, [('add', 'aa', 'e', 'z')])
+
+	def test_remove_and_rename(self):
+		self.foos.remove_item('b')
+		self.assertSorted()
+		self.bars.name_changed('c', 'zz')
+		self.assertSorted()
+		self.assertEqual(list(self.bars.displayList), ['a', 'zz'])
+
+	def test_refresh_after_direct_edit(self):
+		self.itemDict['0'] = Foo(label='0')
+		self.bars.update_display_list(None)
+		self.assertSorted()
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from processing.graph import FilterGraph
+from processing.records import RecordsReader
+
+
+class Filter(object):
+	def __init__(self, label, dataSource=None, enabled=True):
+		self.label = label
+		self.dataSource = dataSource
+		self.enabled = enabled
+
+class RawStream(Filter):
+	pass
+
+class Scale(Filter):
+	pass
+
+class Correlator(Filter):
+	def __init__(self, label, filters):
+		super(Correlator, self).__init__(label)
+		self.filters = filters
+
+processors = {
+	'Scale': lambda filt, settings: lambda inputs: 2*inputs[0],
+	'Correlator': lambda filt, settings: lambda inputs: inputs[0]*inputs[1],
+}
+
+
+class TestFilterGraph(unittest.TestCase):
+
+	def setUp(self):
+		filters = [RawStream('A'), RawStream('B'), Scale('D', 'A'), Correlator('C', ['D', 'B']),
+				   Scale('S', 'C'), Scale('off', 'A', enabled=False)]
+		self.graph = FilterGraph({f.label: f for f in filters}, processors=processors)
+
+	def test_topological_order(self):
+		order = self.graph.order
+		self.assertEqual(sorted(order), ['A', 'B', 'C', 'D', 'S'])
+		for label, sources in self.graph.upstream.items():
+			for source in sources:
+				self.assertLess(order.index(source), order.index(label))
+		self.assertEqual(self.graph.sources(), ['A', 'B'])
+		self.assertEqual(self.graph.sinks(), ['S'])
+
+	def test_cycle(self):
+		filters = [RawStream('A'), Correlator('C', ['A', 'E']), Scale('E', 'C')]
+		self.assertRaises(ValueError, FilterGraph, {f.label: f for f in filters}, processors)
+
+	def test_run_leaves_feeds_writeable(self):
+		feedA = [np.random.randn(4, 8) for ct in range(5)]
+		feedB = [np.random.randn(4, 8) for ct in range(5)]
+		results = self.graph.run({'A': feedA, 'B': feedB}, collect=['A', 'S'], numThreads=3, maxQueue=2)
+		for a, b, s in zip(feedA, feedB, results['S']):
+			np.testing.assert_allclose(s, 4*a*b)
+		for a, out in zip(feedA, results['A']):
+			self.assertTrue(a.flags.writeable)
+			self.assertFalse(out.flags.writeable)
+
+	def test_uneven_sources(self):
+		feeds = {'A': [np.ones((2, 4))]*3, 'B': [np.ones((2, 4))]*2}
+		self.assertRaises(ValueError, self.graph.run, feeds)
+		feeds = {'A': [np.ones((2, 4))]*20, 'B': [np.ones((2, 4))]*2}
+		self.assertRaises(ValueError, self.graph.run, feeds, maxQueue=2)
+
+	def test_saved_records_keep_the_layout(self):
+		tmpDir = tempfile.mkdtemp()
+		try:
+			source = RawStream('A')
+			source.saveRecords = True
+			source.recordsFilePath = os.path.join(tmpDir, 'records.h5')
+			graph = FilterGraph({'A': source, 'D': Scale('D', 'A')}, processors=processors,
+								settings={'nbrSegments': 3, 'nbrWaveforms': 2})
+			feed = [np.random.randn(12, 8) for ct in range(3)]
+			graph.run({'A': feed})
+			with RecordsReader(source.recordsFilePath) as reader:
+				self.assertEqual(reader.dataset.name, '/A')
+				self.assertEqual(reader.shape, (6, 3, 2, 8))
+				np.testing.assert_array_equal(reader[:, :, :, :], np.concatenate(feed).reshape(6, 3, 2, 8))
+		finally:
+			shutil.rmtree(tmpDir)
+
+if __name__ == '__main__':
+	unittest.main()
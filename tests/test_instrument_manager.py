@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from atom.api import Int
+
+import LibraryWriter
+from JSONLibraryUtils import LibraryCoders
+from instruments.InstrumentManager import InstrumentLibrary, decode_library
+from instruments.MicrowaveSources import AgilentN5183A, HolzworthHS9000
+from instruments.Digitizers import AlazarATS9870
+
+
+class CountingLibrary(InstrumentLibrary):
+	reloads = Int(0)
+
+	def update_from_file(self):
+		self.reloads += 1
+		super(CountingLibrary, self).update_from_file()
+
+
+class TestInstrumentLibraryReload(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpDir = tempfile.mkdtemp()
+		self.libFile = os.path.join(self.tmpDir, 'Instruments.json')
+		lib = InstrumentLibrary()
+		lib.instrDict['Agilent1'] = AgilentN5183A(label='Agilent1')
+		lib.instrDict['scope'] = AlazarATS9870(label='scope')
+		lib.instrDict['Holz1'] = HolzworthHS9000(label='Holz1')
+		LibraryWriter.write_library(lib, self.libFile, {})
+		self.lib = CountingLibrary(libFile=self.libFile)
+		# reloads are driven by hand below; test_watcher_reloads covers the watcher
+		self.lib.fileWatcher.stop()
+		self.events = []
+		self.lib.observe('itemChanged', self.record)
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpDir)
+
+	def record(self, change):
+		action, instrName = change['value']
+		# the display lists are up to date by the time listeners hear about a change
+		self.events.append((action, instrName, instrName in self.lib.sources.displayList + self.lib.others.displayList))
+
+	def edit_file(self, edit):
+		with open(self.libFile, 'r') as FID:
+			jsonDict = json.load(FID)
+		edit(jsonDict['instrDict'])
+		with open(self.libFile, 'w') as FID:
+			json.dump(jsonDict, FID)
+
+	def test_decode_library(self):
+		with open(self.libFile, 'r') as FID:
+			text = FID.read()
+		expected = json.loads(text, cls=LibraryCoders.LibraryDecoder)
+		decoded = decode_library(json.loads(text))
+		self.assertIsInstance(decoded, InstrumentLibrary)
+		self.assertEqual(sorted(decoded.instrDict), sorted(expected.instrDict))
+		for instrName, instr in expected.instrDict.items():
+			self.assertIs(type(decoded[instrName]), type(instr))
+			self.assertEqual(decoded[instrName].__getstate__(), instr.__getstate__())
+
+	def test_unchanged(self):
+		self.assertEqual(set(self.lib.instrHashes), {'Agilent1', 'Holz1', 'scope'})
+		self.lib.update_from_file()
+		self.assertEqual(self.events, [])
+
+	def test_changed(self):
+		def edit(instrDict):
+			instrDict['scope']['address'] = '2'
+		self.edit_file(edit)
+		self.lib.update_from_file()
+		self.assertEqual(self.events, [('update', 'scope', True)])
+		self.assertEqual(self.lib['scope'].address, '2')
+
+	def test_added_and_removed(self):
+		def edit(instrDict):
+			instrDict['Agilent2'] = dict(instrDict['Agilent1'], label='Agilent2')
+			del instrDict['Holz1']
+		self.edit_file(edit)
+		self.lib.update_from_file()
+		self.assertEqual(sorted(self.events), [('add', 'Agilent2', True), ('remove', 'Holz1', False)])
+		self.assertEqual(self.lib.sources.displayList, ['Agilent1', 'Agilent2'])
+		self.assertEqual(self.lib.others.displayList, ['scope'])
+		self.lib.update_from_file()
+		self.assertEqual(len(self.events), 2)
+
+	def test_schedule_update_collapses_bursts(self):
+		self.lib.reloadDelay = 0.05
+		def edit(instrDict):
+			instrDict['Holz1']['address'] = 'HS9004A-009-2'
+		self.edit_file(edit)
+		for ct in range(5):
+			self.lib.schedule_update()
+		self.lib.reloadTimer.join(1.0)
+		self.assertEqual(self.lib.reloads, 1)
+		self.assertEqual(self.events, [('update', 'Holz1', True)])
+
+	def test_watcher_reloads(self):
+		# a library saved by another process replaces the file atomically
+		lib = InstrumentLibrary(libFile=self.libFile)
+		try:
+			reloaded = threading.Event()
+			lib.observe('itemChanged', lambda change: reloaded.set())
+			self.lib['scope'].address = '2'
+			LibraryWriter.write_library(self.lib, self.libFile, {})
+			self.assertTrue(reloaded.wait(5))
+			self.assertEqual(lib['scope'].address, '2')
+		finally:
+			lib.fileWatcher.stop()
+
+if __name__ == '__main__':
+	unittest.main()
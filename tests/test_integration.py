@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+
+import MeasFilters
+from processing.integration import IntegrationEngine, KernelCache, kernelCache
+
+
+class TestKernelCache(unittest.TestCase):
+
+	def test_memoizes_with_lru_eviction(self):
+		cache = KernelCache(maxSize=2)
+		builds = []
+		def factory(value):
+			def build():
+				builds.append(value)
+				return np.full(4, value)
+			return build
+		first = cache.get('a', factory(1))
+		self.assertIs(cache.get('a', factory(-1)), first)
+		self.assertFalse(first.flags.writeable)
+		cache.get('b', factory(2))
+		cache.get('a', factory(-1))
+		# 'b' is now the least recently used
+		cache.get('c', factory(3))
+		cache.get('b', factory(4))
+		self.assertEqual(builds, [1, 2, 3, 4])
+		self.assertEqual((cache.hits, cache.misses), (2, 4))
+		self.assertEqual(list(cache.items), ['c', 'b'])
+		cache.clear()
+		self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+	def test_filter_kernels(self):
+		filt = MeasFilters.KernelIntegration(label='M1', boxCarStart=2, boxCarStop=10, IFfreq=10e6)
+		kernel = filt.get_kernel()
+		self.assertIs(filt.get_kernel(), kernel)
+		expected = np.exp(1j*2*np.pi*10e6*np.arange(10)/250e6)
+		expected[:2] = 0
+		np.testing.assert_allclose(kernel, expected)
+		# changing a parameter the kernel depends on builds a new one
+		filt.IFfreq = 20e6
+		self.assertIsNot(filt.get_kernel(), kernel)
+		filt.simpleKernel = False
+		filt.kernel = 'np.arange(4.0)'
+		np.testing.assert_array_equal(filt.get_kernel(), np.arange(4.0))
+		self.assertIn(('kernel', 'np.arange(4.0)'), kernelCache)
+
+
+class TestIntegrationEngine(unittest.TestCase):
+
+	def test_matches_per_kernel_sums(self):
+		kernels = [np.exp(1j*np.linspace(0, 1, 32)), np.ones(20), np.arange(8.0)]
+		engine = IntegrationEngine(kernels, [0.5, 0, -1j])
+		records = np.random.randn(3, 7, 40)
+		out = engine.integrate(records)
+		self.assertEqual(out.shape, (3, 7, 3))
+		for ct, (kernel, bias) in enumerate(zip(kernels, [0.5, 0, -1j])):
+			expected = np.sum(records[..., :kernel.size]*kernel, axis=-1) + bias
+			np.testing.assert_allclose(out[..., ct], expected)
+		np.testing.assert_allclose(engine.integrate(records, chunkSize=4), out)
+
+	def test_short_records_and_single_kernel(self):
+		engine = IntegrationEngine([np.arange(1.0, 11.0)], [2.0])
+		records = np.ones((5, 4))
+		out = engine.integrate(records)
+		self.assertEqual(out.shape, (5,))
+		np.testing.assert_allclose(out, np.full(5, 1 + 2 + 3 + 4 + 2.0))
+
+	def test_from_filters(self):
+		filters = [MeasFilters.KernelIntegration(label='M1', boxCarStart=0, boxCarStop=16, bias=1.0),
+				   MeasFilters.KernelIntegration(label='M2', simpleKernel=False, kernel='np.ones(8)')]
+		engine = IntegrationEngine.from_filters(filters)
+		records = np.random.randn(10, 16)
+		out = engine.integrate(records)
+		np.testing.assert_allclose(out[:, 0], np.dot(records, filters[0].get_kernel()) + 1.0)
+		np.testing.assert_allclose(out[:, 1], np.sum(records[:, :8], axis=1))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,107 @@
+import base64
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import KernelStore
+from KernelStore import KernelStore as Store, LRUCache
+from instruments.Digitizers import X6, X6VirtualChannel
+
+
+class TestLRUCache(unittest.TestCase):
+
+	def test_evicts_least_recently_used(self):
+		cache = LRUCache(2)
+		calls = []
+		def factory(value):
+			def make():
+				calls.append(value)
+				return value
+			return make
+		cache.get('a', factory(1))
+		cache.get('b', factory(2))
+		# touch 'a' so 'b' is the oldest
+		self.assertEqual(cache.get('a', factory(-1)), 1)
+		cache.get('c', factory(3))
+		self.assertEqual(calls, [1, 2, 3])
+		self.assertIn('a', cache)
+		self.assertNotIn('b', cache)
+		self.assertEqual(len(cache), 2)
+		self.assertEqual(cache.get('b', factory(4)), 4)
+		self.assertNotIn('a', cache)
+
+
+class TestKernelStore(unittest.TestCase):
+
+	def setUp(self):
+		self.root = tempfile.mkdtemp()
+		self.store = Store(self.root, maxSize=4)
+
+	def tearDown(self):
+		shutil.rmtree(self.root)
+
+	def test_put_get(self):
+		kernel = np.exp(1j*np.linspace(0, 2*np.pi, 100))
+		reference = self.store.put(kernel)
+		self.assertTrue(KernelStore.is_reference(reference))
+		self.assertEqual(self.store.put(kernel.copy()), reference)
+		self.assertNotEqual(self.store.put(kernel.astype(np.complex64)), reference)
+		# a fresh store reads the blob back from disk
+		np.testing.assert_array_equal(Store(self.root).get(reference), kernel)
+		self.assertRaises(ValueError, self.store.get, 'np.ones(4)')
+
+	def test_encoded(self):
+		kernel = np.arange(8, dtype=np.float64)
+		reference = self.store.put(kernel)
+		self.assertEqual(self.store.encoded(reference),
+			base64.b64encode(kernel).decode('ascii'))
+		self.assertEqual(self.store.encoded(reference, np.complex128),
+			base64.b64encode(kernel.astype(np.complex128)).decode('ascii'))
+		self.assertEqual(len(self.store.encodings), 2)
+
+	def test_externalize_kernels(self):
+		digitizer = X6(label='X6-1')
+		channel = digitizer.channels['s11']
+		channel.demodKernel = 'np.ones(16, dtype=np.complex128)'
+		channel.demodKernelBias = '1.5'
+		channel.rawKernel = 'not a kernel'
+		before = channel.json_encode(matlabCompatible=True)
+
+		digitizer.externalize_kernels(self.store)
+		self.assertTrue(KernelStore.is_reference(channel.demodKernel))
+		self.assertTrue(KernelStore.is_reference(channel.demodKernelBias))
+		self.assertEqual(channel.rawKernel, 'not a kernel')
+		np.testing.assert_array_equal(channel.get_kernel('demodKernel', self.store), np.ones(16))
+		np.testing.assert_array_equal(channel.get_kernel('demodKernelBias', self.store), [1.5])
+		# externalizing again leaves the references alone
+		references = [channel.demodKernel, channel.demodKernelBias]
+		channel.externalize_kernels(self.store)
+		self.assertEqual([channel.demodKernel, channel.demodKernelBias], references)
+		self.assertEqual(before['demodKernel'],
+			self.store.encoded(channel.demodKernel))
+
+	def test_copy_referenced(self):
+		references = [self.store.put(np.arange(n, dtype=np.complex128)) for n in [4, 8]]
+		libFile = os.path.join(self.root, 'Instruments.json')
+		with open(libFile, 'w') as FID:
+			FID.write('{{"demodKernel": "{0}", "rawKernel": "{1}", "label": "kernel:bad"}}'.format(*references))
+		target = KernelStore.config_store(os.path.join(self.root, 'saved'))
+		copied = self.store.copy_referenced([libFile, os.path.join(self.root, 'missing.json')], target)
+		self.assertEqual(sorted(copied), sorted(self.store.digest(r) for r in references))
+		np.testing.assert_array_equal(target.get(references[1]), np.arange(8))
+		# blobs the target has already are not copied again
+		self.assertEqual(self.store.copy_referenced([libFile], target), [])
+
+	def test_literal_encodings_memoized(self):
+		channel = X6VirtualChannel(label='q1', demodKernel='np.arange(4.0)')
+		encoded = channel.json_encode(matlabCompatible=True)['demodKernel']
+		key = (False, KernelStore.text_digest(channel.demodKernel))
+		self.assertIn(key, KernelStore.literalEncodings)
+		self.assertEqual(KernelStore.literalEncodings.get(key, None), encoded)
+		self.assertEqual(encoded, base64.b64encode(np.arange(4.0)).decode('ascii'))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import types
+import unittest
+
+import Libraries
+
+
+class TestMigrationCheck(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpDir = tempfile.mkdtemp()
+		self.libFile = os.path.join(self.tmpDir, 'Instruments.json')
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpDir)
+
+	def save(self, version):
+		# the layout LibraryWriter.encode_library produces
+		jsonDict = {'instrDict': {'scope': {'label': 'scope', 'version': 1}}, 'version': version}
+		with open(self.libFile, 'w') as FID:
+			json.dump(jsonDict, FID, indent=2, sort_keys=True)
+
+	def test_file_version(self):
+		self.save(3)
+		self.assertEqual(Libraries.file_version(self.libFile), 3)
+		with open(self.libFile, 'w') as FID:
+			json.dump({'version': 2, 'instrDict': {}}, FID)
+		self.assertEqual(Libraries.file_version(self.libFile), 2)
+		with open(self.libFile, 'w') as FID:
+			FID.write('{"instrDict": {}}')
+		self.assertEqual(Libraries.file_version(self.libFile), None)
+
+	def test_needs_migration(self):
+		self.save(2)
+		self.assertTrue(Libraries.needs_migration([(self.libFile, 3)]))
+		self.save(3)
+		self.assertFalse(Libraries.needs_migration([(self.libFile, 3)]))
+		self.assertTrue(Libraries.needs_migration([(self.libFile, None)]))
+		# libraries that do not exist yet have nothing to migrate
+		self.assertFalse(Libraries.needs_migration([(os.path.join(self.tmpDir, 'Sweeps.json'), 1)]))
+
+	def test_library_versions(self):
+		from instruments.InstrumentManager import InstrumentLibrary
+		from Sweeps import SweepLibrary
+		from MeasFilters import MeasFilterLibrary
+		for name, cls in [('instruments', InstrumentLibrary), ('sweeps', SweepLibrary), ('measurements', MeasFilterLibrary)]:
+			self.assertEqual(Libraries.libraryVersions[name], cls.members()['version'].default_value_mode[1])
+
+	def test_version_check_imports_no_library(self):
+		probe = ("import sys, Libraries; Libraries._library_versions(); "
+				 "print(sorted(m for m in ['instruments.InstrumentManager', 'Sweeps', 'MeasFilters', 'QGL.ChannelLibrary'] if m in sys.modules))")
+		rootFolder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+		out = subprocess.check_output([sys.executable, '-c', probe], cwd=rootFolder)
+		self.assertEqual(out.decode('utf-8').strip().splitlines()[-1], '[]')
+
+	def test_saved_current_library_is_not_migrated(self):
+		runs = []
+		migrators = types.ModuleType('JSONLibraryUtils.JSONMigrators')
+		migrators.migrate_all = lambda config: runs.append(config) or []
+		import JSONLibraryUtils
+		library_versions = Libraries._library_versions
+		Libraries._library_versions = lambda: [(self.libFile, 3)]
+		sys.modules['JSONLibraryUtils.JSONMigrators'] = migrators
+		JSONLibraryUtils.JSONMigrators = migrators
+		try:
+			# a GUI save rewrites the file at the current version
+			self.save(3)
+			Libraries._migrated = False
+			Libraries.migrate_libraries()
+			self.assertEqual(runs, [])
+
+			self.save(2)
+			Libraries._migrated = False
+			Libraries.migrate_libraries()
+			self.assertEqual(len(runs), 1)
+		finally:
+			Libraries._library_versions = library_versions
+			del sys.modules['JSONLibraryUtils.JSONMigrators']
+			del JSONLibraryUtils.JSONMigrators
+
+if __name__ == '__main__':
+	unittest.main()
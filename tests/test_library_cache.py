@@ -0,0 +1,79 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import LibraryCache
+import LibraryWriter
+import MeasFilters
+import Sweeps
+
+
+class TestLibraryCache(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpDir = tempfile.mkdtemp()
+		self.libFile = os.path.join(self.tmpDir, 'Measurements.json')
+		lib = MeasFilters.MeasFilterLibrary()
+		lib.filterDict['R1'] = MeasFilters.RawStream(label='R1')
+		lib.filterDict['D1'] = MeasFilters.DigitalDemod(label='D1', dataSource='R1', IFfreq=10e6)
+		lib.filterDict['C'] = MeasFilters.Correlator(label='C', filters=[lib.filterDict['R1'], lib.filterDict['D1']])
+		LibraryWriter.write_library(lib, self.libFile, {})
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpDir)
+
+	def load(self):
+		return MeasFilters.MeasFilterLibrary(libFile=self.libFile, useCache=True)
+
+	def test_cache_hit_keeps_correlator_identity(self):
+		self.load()
+		self.assertIsNotNone(LibraryCache.load(self.libFile))
+		lib = self.load()
+		self.assertIs(lib['C'].filters[0], lib['R1'])
+		self.assertIs(lib['C'].filters[1], lib['D1'])
+
+	def test_edit_invalidates_cache(self):
+		self.load()
+		with open(self.libFile, 'r') as FID:
+			jsonDict = json.load(FID)
+		# same size, so only the content hash tells the files apart
+		jsonDict['filterDict']['D1']['IFfreq'] = 20e6
+		with open(self.libFile, 'w') as FID:
+			json.dump(jsonDict, FID, indent=2, sort_keys=True)
+		self.assertIsNone(LibraryCache.load(self.libFile))
+		lib = self.load()
+		self.assertEqual(lib['D1'].IFfreq, 20e6)
+		self.assertIs(lib['C'].filters[1], lib['D1'])
+		self.assertEqual(self.load()['D1'].IFfreq, 20e6)
+
+	def test_corrupt_cache_is_ignored(self):
+		self.load()
+		cacheFile = LibraryCache.cache_file(self.libFile)
+		with open(cacheFile, 'rb') as FID:
+			contents = FID.read()
+		for corrupt in [contents[:len(contents)//2], b'not a pickle', b'']:
+			with open(cacheFile, 'wb') as FID:
+				FID.write(corrupt)
+			self.assertIsNone(LibraryCache.load(self.libFile))
+			lib = self.load()
+			self.assertEqual(sorted(lib.filterDict), ['C', 'D1', 'R1'])
+			# the cache was rebuilt from the JSON file
+			self.assertIsNotNone(LibraryCache.load(self.libFile))
+
+	def test_sweep_library(self):
+		libFile = os.path.join(self.tmpDir, 'Sweeps.json')
+		lib = Sweeps.SweepLibrary()
+		lib.sweepDict['Frequency'] = Sweeps.Frequency(label='Frequency', start=1.0, stop=2.0)
+		lib.sweepOrder.append('Frequency')
+		LibraryWriter.write_library(lib, libFile, {})
+		Sweeps.SweepLibrary(libFile=libFile, useCache=True)
+		lib['Frequency'].stop = 3.0
+		LibraryWriter.write_library(lib, libFile, {})
+		cached = Sweeps.SweepLibrary(libFile=libFile, useCache=True)
+		self.assertEqual(cached['Frequency'].stop, 3.0)
+		self.assertEqual(list(cached.sweepOrder), ['Frequency'])
+
+if __name__ == '__main__':
+	unittest.main()
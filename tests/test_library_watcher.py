@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import LibraryWriter
+from LibraryWatcher import LibraryFileWatcher
+
+
+class TestLibraryFileWatcher(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpDir = tempfile.mkdtemp()
+		self.libFile = os.path.join(self.tmpDir, 'Instruments.json')
+		with open(self.libFile, 'w') as FID:
+			FID.write('{}')
+		self.called = threading.Event()
+		self.watcher = LibraryFileWatcher(self.libFile, self.called.set)
+
+	def tearDown(self):
+		self.watcher.stop()
+		shutil.rmtree(self.tmpDir)
+
+	def test_atomic_write(self):
+		self.assertTrue(LibraryWriter.write_if_changed(self.libFile, '{"a": 1}', {}))
+		self.assertTrue(self.called.wait(5))
+
+	def test_in_place_write(self):
+		with open(self.libFile, 'w') as FID:
+			FID.write('{"a": 1}')
+		self.assertTrue(self.called.wait(5))
+
+	def test_ignores_other_files_and_pauses(self):
+		LibraryWriter.write_if_changed(os.path.join(self.tmpDir, 'Sweeps.json'), '{}', {})
+		self.watcher.pause()
+		LibraryWriter.write_if_changed(self.libFile, '{"a": 1}', {})
+		self.assertFalse(self.called.wait(0.5))
+
+	def test_stop(self):
+		self.watcher.stop()
+		self.assertFalse(self.watcher.observer.is_alive())
+		LibraryWriter.write_if_changed(self.libFile, '{"a": 1}', {})
+		self.assertFalse(self.called.wait(0.5))
+
+if __name__ == '__main__':
+	unittest.main()
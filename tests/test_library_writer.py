@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import LibraryWriter
+
+
+class TestWriteIfChanged(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpDir = tempfile.mkdtemp()
+		self.fileName = os.path.join(self.tmpDir, 'Sweeps.json')
+		with open(self.fileName, 'w') as FID:
+			FID.write('{"version": 1}')
+		# an old mtime so any rewrite shows up
+		os.utime(self.fileName, (1e9, 1e9))
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpDir)
+
+	def test_unchanged_save_leaves_file_alone(self):
+		fingerprints = {}
+		# nothing recorded yet: the file on disk is compared instead
+		self.assertFalse(LibraryWriter.write_if_changed(self.fileName, '{"version": 1}', fingerprints))
+		self.assertEqual(os.stat(self.fileName).st_mtime, 1e9)
+		self.assertFalse(LibraryWriter.write_if_changed(self.fileName, '{"version": 1}', fingerprints))
+		self.assertEqual(os.stat(self.fileName).st_mtime, 1e9)
+
+	def test_changed_save_is_atomic(self):
+		fingerprints = {}
+		inode = os.stat(self.fileName).st_ino
+		self.assertTrue(LibraryWriter.write_if_changed(self.fileName, '{"version": 2}', fingerprints))
+		with open(self.fileName) as FID:
+			self.assertEqual(FID.read(), '{"version": 2}')
+		# the new contents were renamed into place rather than written over the old file
+		self.assertNotEqual(os.stat(self.fileName).st_ino, inode)
+		self.assertEqual(os.listdir(self.tmpDir), ['Sweeps.json'])
+		self.assertFalse(LibraryWriter.write_if_changed(self.fileName, '{"version": 2}', fingerprints))
+
+	def test_failed_save_keeps_old_file(self):
+		def fail(src, dst):
+			raise OSError("disk full")
+		replace_file = LibraryWriter.replace_file
+		LibraryWriter.replace_file = fail
+		try:
+			self.assertRaises(OSError, LibraryWriter.write_if_changed, self.fileName, '{"version": 3}', {})
+		finally:
+			LibraryWriter.replace_file = replace_file
+		with open(self.fileName) as FID:
+			self.assertEqual(FID.read(), '{"version": 1}')
+		self.assertEqual(os.listdir(self.tmpDir), ['Sweeps.json'])
+
+	def test_external_edit_is_overwritten(self):
+		fingerprints = {}
+		LibraryWriter.write_if_changed(self.fileName, '{"version": 2}', fingerprints)
+		with open(self.fileName, 'w') as FID:
+			FID.write('{"version": 5}')
+		os.utime(self.fileName, (2e9, 2e9))
+		self.assertTrue(LibraryWriter.write_if_changed(self.fileName, '{"version": 2}', fingerprints))
+		with open(self.fileName) as FID:
+			self.assertEqual(FID.read(), '{"version": 2}')
+
+if __name__ == '__main__':
+	unittest.main()
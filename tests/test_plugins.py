@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from instruments.plugins import PluginRegistry
+
+
+class TestPluginRegistry(unittest.TestCase):
+
+	def setUp(self):
+		self.root = tempfile.mkdtemp()
+		self.driverDir = os.path.join(self.root, 'pluginpkg', 'drivers')
+		os.makedirs(self.driverDir)
+		for path in ['pluginpkg', 'pluginpkg/drivers']:
+			open(os.path.join(self.root, path, '__init__.py'), 'w').close()
+		self.write('pluginpkg/base.py', 'class Base(object):\n\tpass\n\nclass Other(object):\n\tpass\n')
+		self.write('pluginpkg/drivers/scope.py', 'from pluginpkg.base import Other\n\nclass Scope(Other):\n\tpass\n')
+		self.indexFile = os.path.join(self.root, 'cache', 'index.json')
+		sys.path.insert(0, self.root)
+
+	def tearDown(self):
+		sys.path.remove(self.root)
+		self.forget_modules()
+		shutil.rmtree(self.root)
+
+	def write(self, path, text, mtime=1e9):
+		fileName = os.path.join(self.root, path)
+		with open(fileName, 'w') as FID:
+			FID.write(text)
+		os.utime(fileName, (mtime, mtime))
+
+	def forget_modules(self):
+		# as if in a new process
+		for name in list(sys.modules):
+			if name.split('.')[0] == 'pluginpkg':
+				del sys.modules[name]
+
+	def registry(self):
+		self.forget_modules()
+		return PluginRegistry('pluginpkg.drivers', self.driverDir, self.indexFile)
+
+	def find(self, baseName):
+		registry = self.registry()
+		base = getattr(__import__('pluginpkg.base', fromlist=['base']), baseName)
+		return [cls.__name__ for cls in registry.find(base)]
+
+	def test_index_location(self):
+		self.assertEqual(self.find('Other'), ['Scope'])
+		self.assertTrue(os.path.isfile(self.indexFile))
+		self.assertFalse([f for f in os.listdir(self.driverDir) if f.endswith('.json')])
+		saved = json.load(open(self.indexFile))
+		self.assertEqual(list(saved['baseStamps']), [os.path.join(self.root, 'pluginpkg', 'base.py')])
+		# the default index lives outside the package
+		default = PluginRegistry().indexFile
+		self.assertFalse(default.startswith(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep))
+
+	def test_base_module_change_invalidates_index(self):
+		self.assertEqual(self.find('Base'), [])
+		# the saved index is reused while nothing changed
+		registry = self.registry()
+		registry.scan = None
+		self.assertIn('pluginpkg.drivers.scope', registry.load_index())
+		# Other now derives from Base; the driver file itself is untouched
+		self.write('pluginpkg/base.py', 'class Base(object):\n\tpass\n\nclass Other(Base):\n\tpass\n', mtime=2e9)
+		self.assertIn('Scope', self.find('Base'))
+
+	def test_driver_change_invalidates_index(self):
+		self.assertEqual(self.find('Other'), ['Scope'])
+		self.write('pluginpkg/drivers/awg.py', 'from pluginpkg.base import Other\n\nclass AWG(Other):\n\tpass\n')
+		self.assertEqual(sorted(self.find('Other')), ['AWG', 'Scope'])
+
+	def test_scanned_once(self):
+		registry = self.registry()
+		scans = []
+		scan = registry.scan
+		registry.scan = lambda: scans.append(1) or scan()
+		base = __import__('pluginpkg.base', fromlist=['base'])
+		found = registry.find(base.Other)
+		self.assertEqual([cls.__name__ for cls in found], ['Scope'])
+		# lookups are memoized and hand out copies
+		found.append(None)
+		self.assertEqual(len(registry.find(base.Other)), 1)
+		self.assertEqual(registry.find(base.Base), [])
+		self.assertEqual(len(scans), 1)
+
+	def test_get(self):
+		registry = self.registry()
+		self.assertEqual(registry.get('Scope').__module__, 'pluginpkg.drivers.scope')
+		self.assertRaises(KeyError, registry.get, 'Missing')
+
+	def test_index_written_without_library_coders(self):
+		# the registry only needs the plain file helpers of LibraryWriter
+		probe = ("import sys; sys.modules['JSONLibraryUtils'] = None; sys.path.insert(0, {0!r}); "
+				 "from instruments.plugins import PluginRegistry; from pluginpkg.base import Other; "
+				 "print([c.__name__ for c in PluginRegistry('pluginpkg.drivers', {1!r}, {2!r}).find(Other)])").format(
+				 self.root, self.driverDir, self.indexFile)
+		rootFolder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+		out = subprocess.check_output([sys.executable, '-c', probe], cwd=rootFolder)
+		self.assertEqual(out.decode('utf-8').strip().splitlines()[-1], "['Scope']")
+		self.assertTrue(os.path.isfile(self.indexFile))
+
+	def test_corrupt_index_is_rebuilt(self):
+		self.assertEqual(self.find('Other'), ['Scope'])
+		with open(self.indexFile, 'w') as FID:
+			FID.write('{"stamps": ')
+		self.assertEqual(self.find('Other'), ['Scope'])
+		self.assertIn('pluginpkg.drivers.scope', json.load(open(self.indexFile))['index'])
+
+if __name__ == '__main__':
+	unittest.main()
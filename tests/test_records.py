@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from processing.records import RecordsWriter, RecordsReader
+
+
+class TestRecordFiles(unittest.TestCase):
+
+	def setUp(self):
+		self.fileName = os.path.join(tempfile.mkdtemp(), 'records.h5')
+
+	def tearDown(self):
+		os.remove(self.fileName)
+		os.rmdir(os.path.dirname(self.fileName))
+
+	def test_round_trip(self):
+		# 5 round robins of 3 segments x 2 waveforms plus a partial round robin
+		records = np.random.randn(33, 16).astype(np.float32)
+		with RecordsWriter(self.fileName, chunkRecords=4) as writer:
+			writer.write('R1', records[:10])
+			writer.write('R1', records[10:])
+		expected = records[:30].reshape(5, 3, 2, 16)
+		with RecordsReader(self.fileName, 'R1', nbrSegments=3, nbrWaveforms=2) as reader:
+			self.assertEqual(reader.shape, (5, 3, 2, 16))
+			for key in [1, (slice(1, 3), 2), (slice(None, None, 2), 0, 1, slice(3, 5)), ([0, 3],)]:
+				np.testing.assert_array_equal(reader[key], expected[key])
+			np.testing.assert_array_equal(np.concatenate(list(reader.iter_round_robins(2))), expected)
+
+	def test_partial_reads(self):
+		records = np.random.randn(60, 16).astype(np.float32)
+		with RecordsWriter(self.fileName, chunkRecords=4, nbrSegments=3, nbrWaveforms=4) as writer:
+			writer.write('R1', records)
+		expected = records.reshape(5, 3, 4, 16)
+		with RecordsReader(self.fileName, 'R1') as reader:
+			# the layout comes from the dataset attributes
+			self.assertEqual(reader.shape, (5, 3, 4, 16))
+			keys = [(slice(None), 1), (2, slice(None), 3, slice(2, 10, 3)), (slice(None), [2, 0], slice(1, 3), 5),
+					(slice(None, None, -1), 0, slice(None), [1, 4]), (1, [0, 2], [3, 1]), ([4, 1], slice(None), 2),
+					(slice(None), slice(None), slice(None), slice(None, None, -2)), (slice(3, 3),)]
+			for key in keys:
+				np.testing.assert_array_equal(reader[key], expected[key])
+
+			# only the records of the selected segment are read
+			reads = []
+			dataset = reader.dataset
+			class CountingDataset(object):
+				def __getitem__(self, key):
+					block = dataset[key]
+					reads.append(block.shape[0])
+					return block
+			reader.dataset = CountingDataset()
+			np.testing.assert_array_equal(reader[:, 1, :, :4], expected[:, 1, :, :4])
+			self.assertEqual(reads, [4]*5)
+
+	def test_dataset_name(self):
+		with RecordsWriter(self.fileName) as writer:
+			writer.write('R1', np.zeros((4, 8)))
+		with RecordsReader(self.fileName) as reader:
+			self.assertEqual(reader.shape, (4, 1, 1, 8))
+		with RecordsWriter(self.fileName) as writer:
+			writer.write('R1', np.zeros((4, 8)))
+			writer.write('D1', np.zeros((4, 2)))
+		self.assertRaises(ValueError, RecordsReader, self.fileName)
+		with RecordsReader(self.fileName, 'D1') as reader:
+			self.assertEqual(reader.shape, (4, 1, 1, 2))
+
+	def test_write_requires_running_writer(self):
+		writer = RecordsWriter(self.fileName, maxQueue=1)
+		self.assertRaises(RuntimeError, writer.write, 'R1', np.zeros((2, 4)))
+		with writer:
+			writer.write('R1', np.zeros((2, 4)))
+		self.assertRaises(RuntimeError, writer.write, 'R1', np.zeros((2, 4)))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+import MeasFilters
+from instruments.Digitizers import X6
+from ScripterEncoders import ScripterEncoder, ScripterHDF5Writer
+
+
+class TestScripterHDF5Writer(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpDir = tempfile.mkdtemp()
+		self.fileName = os.path.join(self.tmpDir, 'settings.h5')
+		measurements = MeasFilters.MeasFilterLibrary()
+		measurements.filterDict['M1'] = MeasFilters.KernelIntegration(label='M1', simpleKernel=False,
+			kernel='np.exp(1j*np.linspace(0, np.pi, 16))', bias=0.5)
+		measurements.filterDict['R1'] = MeasFilters.RawStream(label='R1')
+		digitizer = X6(label='X6-1')
+		digitizer.channels['s11'].demodKernel = 'np.ones(8)'
+		self.settings = {'measurements': measurements, 'instruments': {'X6-1': digitizer},
+						 'sweepOrder': ['Frequency', 'Repeat'], 'points': [1.0, 2.0, 3.0],
+						 'pulses': [{'amp': 1.0}, {'amp': 0.5}], 'trigger': None, 'CWMode': False}
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpDir)
+
+	def test_layout_matches_json(self):
+		ScripterHDF5Writer().write(self.settings, self.fileName)
+		jsonDict = json.loads(json.dumps(self.settings, cls=ScripterEncoder))
+
+		def compare(group, jsonDict):
+			self.assertEqual(sorted(list(group.keys()) + list(group.attrs.keys())),
+							 sorted(k for k in jsonDict if k != 'x__list__'))
+			for key, value in jsonDict.items():
+				if isinstance(value, dict):
+					compare(group[key], value)
+
+		with h5py.File(self.fileName, 'r') as FID:
+			compare(FID, jsonDict)
+
+	def test_values(self):
+		ScripterHDF5Writer().write(self.settings, self.fileName)
+		with h5py.File(self.fileName, 'r') as FID:
+			kernel = FID['measurements/M1/kernel']
+			self.assertEqual(kernel.dtype, np.complex128)
+			# contiguous and uncompressed so it can be memory mapped
+			self.assertIsNone(kernel.chunks)
+			self.assertIsNotNone(kernel.id.get_offset())
+			np.testing.assert_allclose(kernel[()], np.exp(1j*np.linspace(0, np.pi, 16)))
+			self.assertEqual(FID['measurements/M1'].attrs['bias'], 0.5)
+			self.assertEqual(FID['measurements/M1'].attrs['filterType'], 'KernelIntegration')
+			np.testing.assert_allclose(FID['instruments/X6-1/channels/s11/demodKernel'][()], np.ones(8))
+
+			self.assertEqual(list(FID.attrs['sweepOrder']), ['Frequency', 'Repeat'])
+			np.testing.assert_array_equal(FID['points'][()], [1.0, 2.0, 3.0])
+			self.assertEqual(FID['pulses'].attrs['x__list__'], 2)
+			self.assertEqual(FID['pulses/1'].attrs['amp'], 0.5)
+			self.assertIsInstance(FID.attrs['trigger'], h5py.Empty)
+			self.assertEqual(FID.attrs['CWMode'], False)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from KernelStore import KernelStore
+from SnapshotStore import SnapshotStore
+
+
+class TestSnapshotStore(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpDir = tempfile.mkdtemp()
+		self.store = SnapshotStore(os.path.join(self.tmpDir, 'store'))
+		self.libFile = os.path.join(self.tmpDir, 'Instruments.json')
+		self.library = {'instrDict': {'scope': {'label': 'scope', 'address': '1'},
+									  'APS1': {'label': 'APS1', 'address': '192.168.5.20'}},
+						'version': 3}
+		self.write(self.library, indent=None)
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpDir)
+
+	def write(self, jsonDict, **kwargs):
+		with open(self.libFile, 'w') as FID:
+			json.dump(jsonDict, FID, **kwargs)
+		os.utime(self.libFile, (1e9, 1e9))
+
+	def test_restore_skips_equivalent_files(self):
+		self.store.save('cal', [self.libFile])
+		# same contents in a different layout than the store writes
+		self.assertEqual(self.store.restore('cal', {'Instruments.json': self.libFile}), [])
+		self.assertEqual(os.stat(self.libFile).st_mtime, 1e9)
+
+		self.library['instrDict']['scope']['address'] = '2'
+		self.write(self.library, indent=4)
+		self.assertEqual(self.store.restore('cal', {'Instruments.json': self.libFile}), [self.libFile])
+		with open(self.libFile) as FID:
+			self.assertEqual(json.load(FID)['instrDict']['scope']['address'], '1')
+
+	def test_save_refuses_to_overwrite(self):
+		self.store.save('cal', [self.libFile])
+		self.library['version'] = 4
+		self.write(self.library)
+		self.assertRaises(ValueError, self.store.save, 'cal', [self.libFile])
+		self.assertEqual(self.store.assemble(self.store.load_manifest('cal')['files']['Instruments.json'])['version'], 3)
+		self.store.save('cal', [self.libFile], overwrite=True)
+		self.assertEqual(self.store.assemble(self.store.load_manifest('cal')['files']['Instruments.json'])['version'], 4)
+
+	def test_kernels_travel_with_snapshots(self):
+		kernels = KernelStore(os.path.join(self.tmpDir, 'kernels'))
+		reference = kernels.put(np.ones(16, dtype=np.complex128))
+		self.library['instrDict']['scope']['demodKernel'] = reference
+		self.write(self.library)
+		self.store.save('cal', [self.libFile], kernelStore=kernels)
+		# restore on a machine without the kernel
+		shutil.rmtree(kernels.root)
+		self.write({'instrDict': {}, 'version': 3})
+		kernels = KernelStore(kernels.root)
+		self.assertEqual(self.store.restore('cal', {'Instruments.json': self.libFile}, kernels), [self.libFile])
+		np.testing.assert_array_equal(kernels.get(reference), np.ones(16))
+		# also when the library file is already current
+		shutil.rmtree(kernels.root)
+		self.assertEqual(self.store.restore('cal', {'Instruments.json': self.libFile}, kernels), [])
+		np.testing.assert_array_equal(KernelStore(kernels.root).get(reference), np.ones(16))
+
+	def test_import_directory_with_kernels(self):
+		savedDir = os.path.join(self.tmpDir, 'saved')
+		reference = KernelStore(os.path.join(savedDir, 'kernels')).put(np.arange(4.0))
+		self.library['instrDict']['scope']['rawKernel'] = reference
+		with open(os.path.join(savedDir, 'Instruments.json'), 'w') as FID:
+			json.dump(self.library, FID)
+		self.store.import_directory('saved', savedDir)
+		np.testing.assert_array_equal(self.store.kernel_store().get(reference), np.arange(4.0))
+
+	def test_diff(self):
+		self.store.save('a', [self.libFile])
+		self.library['instrDict']['scope']['address'] = '2'
+		del self.library['instrDict']['APS1']
+		self.write(self.library)
+		self.store.save('b', [self.libFile])
+		self.assertEqual(self.store.list_snapshots(), ['a', 'b'])
+		self.assertEqual(self.store.diff('a', 'b'),
+			{'Instruments.json': {'items': {'instrDict': {'changed': ['scope'], 'removed': ['APS1']}}}})
+		self.assertEqual(self.store.diff('a', 'a'), {})
+
+if __name__ == '__main__':
+	unittest.main()
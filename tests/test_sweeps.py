@@ -0,0 +1,105 @@
+import unittest
+import numpy as np
+
+from Sweeps import *
+
+
+class TestSweepPoints(unittest.TestCase):
+
+	def test_points_sweep(self):
+		sweep = Frequency(label='F', start=1.0, stop=2.0, numPoints=11)
+		np.testing.assert_allclose(sweep.get_points(), np.linspace(1.0, 2.0, 11))
+
+	def test_power_units(self):
+		sweep = Power(label='PW', units='dBm', start=-10.0, stop=0.0, numPoints=2)
+		np.testing.assert_allclose(sweep.get_points(), [-10.0, 0.0])
+		np.testing.assert_allclose(sweep.get_points(units='Watts'), [1e-4, 1e-3])
+		sweep = Power(label='PW', units='Watts', start=1e-3, stop=1e-2, numPoints=2)
+		np.testing.assert_allclose(sweep.get_points(units='dBm'), [0.0, 10.0])
+
+	def test_heterodyne_pairs(self):
+		sweep = HeterodyneFrequency(label='HF', start=5.0, stop=6.0, numPoints=3, diffFreq=0.01)
+		np.testing.assert_allclose(sweep.get_points(), [[5.0, 5.01], [5.5, 5.51], [6.0, 6.01]])
+
+	def test_segment_num(self):
+		sweep = SegmentNum(label='SN', start=0.0, stop=4.0, numPoints=5)
+		np.testing.assert_allclose(sweep.get_points(), [0, 1, 2, 3, 4])
+		sweep.points = [0.0, 10.0, 20.0]
+		sweep.usePointsList = True
+		np.testing.assert_allclose(sweep.get_points(), [0, 10, 20])
+
+	def test_segment_num_with_cals(self):
+		sweep = SegmentNumWithCals(label='SNWC', start=0.0, stop=4.0, numPoints=5, numCals=2)
+		np.testing.assert_allclose(sweep.get_points(), [0, 1, 2, 3, 4, 5, 6])
+		sweep.points = [0.0, 10.0, 20.0]
+		sweep.usePointsList = True
+		np.testing.assert_allclose(sweep.get_points(), [0, 10, 20, 30, 40])
+
+	def test_points_storage(self):
+		sweep = SegmentNum(label='SN')
+		sweep.points = [0.0, 0.5, 1.0, 1.5]
+		self.assertIsInstance(sweep.points, np.ndarray)
+		self.assertEqual(encode_points(sweep.points), {'start': 0.0, 'step': 0.5, 'count': 4})
+
+		irregular = np.array([0.0, 1.0, 4.0, 9.0])
+		encoded = encode_points(irregular)
+		self.assertIn('data', encoded)
+		np.testing.assert_array_equal(decode_points(encoded), irregular)
+
+		sweep.points = encode_points(np.linspace(0, 1, 101))
+		np.testing.assert_allclose(sweep.points, np.linspace(0, 1, 101))
+
+	def test_points_storage_is_lossless(self):
+		np.testing.assert_array_equal(decode_points(encode_points(np.array([0.1, 0.2, 0.3, 0.4]))), [0.1, 0.2, 0.3, 0.4])
+		rng = np.random.RandomState(0)
+		for ct in range(500):
+			points = np.linspace(rng.uniform(-10, 10), rng.uniform(-10, 10), rng.randint(3, 200))
+			encoded = encode_points(points)
+			np.testing.assert_array_equal(decode_points(encoded), points)
+			# a load/save cycle writes the same thing again
+			self.assertEqual(encode_points(decode_points(encoded)), encoded)
+
+	def test_repeat(self):
+		np.testing.assert_array_equal(Repeat(label='R', numRepeats=3).get_points(), [1, 2, 3])
+
+	def test_iter_points(self):
+		sweepDict = {'F': Frequency(label='F', start=1.0, stop=3.0, numPoints=3),
+					 'R': Repeat(label='R', numRepeats=2)}
+		sweepLib = SweepLibrary(sweepDict=sweepDict, sweepOrder=['F', 'R'])
+		points = list(sweepLib.iter_points())
+		self.assertEqual(points, [(1.0, 1), (2.0, 1), (3.0, 1), (1.0, 2), (2.0, 2), (3.0, 2)])
+
+		chunks = list(sweepLib.iter_points(chunkSize=4))
+		self.assertEqual(len(chunks), 2)
+		np.testing.assert_allclose(np.hstack([c[0] for c in chunks]), [p[0] for p in points])
+		np.testing.assert_array_equal(np.hstack([c[1] for c in chunks]), [p[1] for p in points])
+
+	def test_plugin_default_points(self):
+		class Voltage(Sweep):
+			start = Float(0.0)
+			stop = Float(1.0)
+			numPoints = Int(3)
+		class Steps(Sweep):
+			start = Int(2)
+			stop = Int(8)
+			step = Int(3)
+		class Shots(Sweep):
+			numRepeats = Int(2)
+		class Table(Sweep):
+			points = List(default=[3.0, 1.0])
+		class Opaque(Sweep):
+			value = Float()
+		np.testing.assert_allclose(Voltage().get_points(), [0.0, 0.5, 1.0])
+		np.testing.assert_array_equal(Steps().get_points(), [2, 5, 8])
+		np.testing.assert_array_equal(Shots().get_points(), [1, 2])
+		np.testing.assert_array_equal(Table().get_points(), [3.0, 1.0])
+		self.assertRaises(TypeError, Opaque().get_points)
+		self.assertRaises(ValueError, Table(points=[]).get_points)
+		self.assertTrue(all(cls.defines_points() for cls in [Voltage, Steps, Shots, Table, Power, AWGSequence]))
+		self.assertFalse(Opaque.defines_points())
+
+		sweepLib = SweepLibrary(sweepDict={'V': Voltage(label='V'), 'S': Shots(label='S')}, sweepOrder=['V', 'S'])
+		self.assertEqual(len(list(sweepLib.iter_points())), 6)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,136 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import LibraryWriter
+import QGL.Channels as Channels
+from instruments.Digitizers import AlazarATS9870
+from instruments.InstrumentManager import InstrumentLibrary
+from instruments.drivers.APS2 import APS2
+from Sweeps import Frequency
+import ExpSettingsVal
+from ExpSettingsVal import Validator, ValidationSession
+
+
+class TestValidationSession(unittest.TestCase):
+
+	def setUp(self):
+		self.instruments = {label: APS2(label=label) for label in ['APS1', 'APS2']}
+		self.channels = {}
+		for awg in ['APS1', 'APS2']:
+			for chan, cls in [('12', Channels.PhysicalQuadratureChannel), ('12m1', Channels.PhysicalMarkerChannel)]:
+				label = '{0}-{1}'.format(awg, chan)
+				self.channels[label] = cls(label=label, instrument=awg)
+		self.channels['q1'] = Channels.Qubit(label='q1', physChan=self.channels['APS1-12'])
+		self.channels['M-q1'] = Channels.Measurement(label='M-q1', physChan=self.channels['APS2-12'])
+		self.channels['digitizerTrig'] = Channels.LogicalMarkerChannel(label='digitizerTrig', physChan=self.channels['APS2-12m1'])
+		self.channels['slaveTrig'] = Channels.LogicalMarkerChannel(label='slaveTrig', physChan=self.channels['APS1-12m1'])
+		self.sweeps = {'Frequency': Frequency(label='Frequency', start=1.0, stop=2.0, numPoints=11)}
+		self.session = ValidationSession(self.channels, self.instruments, self.sweeps)
+
+	def assertMatchesValidator(self):
+		expected = Validator(self.channels, self.instruments, self.sweeps).validate_lib()
+		self.assertEqual(self.session.validate(), expected)
+		return expected
+
+	def test_clean_library(self):
+		self.assertEqual(self.assertMatchesValidator(), [])
+		validator = Validator(self.channels, self.instruments, self.sweeps)
+		validator.validate_lib()
+		self.assertEqual(sorted(validator.timings), ['channel_index', 'instrument_names', 'logical_channels',
+													 'physical_channels', 'sweeps'])
+
+	def test_channel_edits(self):
+		self.assertMatchesValidator()
+		self.channels['q1'].physChan = self.channels['APS1-12m1']
+		self.assertNotEqual(self.assertMatchesValidator(), [])
+		self.channels['APS2-12'].instrument = 'missing'
+		self.assertMatchesValidator()
+		del self.channels['APS1-12m1']
+		self.session.item_changed('channel', 'remove', 'APS1-12m1')
+		self.assertMatchesValidator()
+
+	def test_instrument_rename(self):
+		self.assertMatchesValidator()
+		# rename an AWG and its physical channels as ChannelLibrary.on_awg_change does
+		self.instruments['APS3'] = self.instruments.pop('APS1')
+		self.instruments['APS3'].label = 'APS3'
+		self.session.item_changed('instrument', 'rename', 'APS1', 'APS3')
+		self.assertNotEqual(self.assertMatchesValidator(), [])
+		for chan in ['12', '12m1']:
+			channel = self.channels.pop('APS1-' + chan)
+			channel.label = 'APS3-' + chan
+			channel.instrument = 'APS3'
+			self.channels[channel.label] = channel
+		self.assertEqual(self.assertMatchesValidator(), [])
+
+	def test_sweep_edits(self):
+		self.assertMatchesValidator()
+		self.sweeps['Frequency'].stop = float('nan')
+		self.assertNotEqual(self.assertMatchesValidator(), [])
+		self.sweeps['Frequency'].stop = 2.0
+		self.assertEqual(self.assertMatchesValidator(), [])
+
+	def test_changes_without_events(self):
+		self.assertMatchesValidator()
+		# e.g. the channel library reloaded by its file watcher
+		self.channels['q2'] = Channels.Qubit(label='q2', physChan=Channels.PhysicalQuadratureChannel(label='APS9-12'))
+		self.assertTrue([e for e in self.assertMatchesValidator() if 'APS9-12' in e])
+		self.channels['q2'] = Channels.Qubit(label='q2', physChan=self.channels['APS1-12'])
+		self.assertEqual(self.assertMatchesValidator(), [])
+		del self.channels['APS2-12']
+		self.assertNotEqual(self.assertMatchesValidator(), [])
+		self.channels['APS2-12'] = Channels.PhysicalQuadratureChannel(label='APS2-12', instrument='APS2')
+		self.channels['M-q1'].physChan = self.channels['APS2-12']
+		self.assertEqual(self.assertMatchesValidator(), [])
+		self.instruments['1bad'] = APS2(label='1bad')
+		self.sweeps['Power'] = Frequency(label='Power', start=1.0, stop=float('nan'), numPoints=11)
+		self.assertEqual(len(self.assertMatchesValidator()), 2)
+		del self.instruments['1bad'], self.sweeps['Power']
+		self.assertEqual(self.assertMatchesValidator(), [])
+
+	def test_large_library_is_linear(self):
+		for ct in range(3000):
+			label = 'APS1-x{0}'.format(ct)
+			self.channels[label] = Channels.PhysicalQuadratureChannel(label=label, instrument='APS1')
+		self.assertMatchesValidator()
+		self.assertEqual(len(self.session.index.physical), 3004)
+
+
+class TestValidateSnapshots(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpDir = tempfile.mkdtemp()
+		fileNames = ExpSettingsVal.snapshot_file_names()
+		for ct, instrument in enumerate(['scope', 'missing']):
+			path = os.path.join(self.tmpDir, 'snapshot{0}'.format(ct))
+			os.makedirs(path)
+			channel = {'label': 'scope-1', 'instrument': instrument,
+					   'x__class__': 'PhysicalQuadratureChannel', 'x__module__': 'QGL.Channels'}
+			with open(os.path.join(path, fileNames['channels']), 'w') as FID:
+				json.dump({'channelDict': {'scope-1': channel}}, FID)
+			lib = InstrumentLibrary()
+			lib.instrDict['scope'] = AlazarATS9870(label='scope')
+			LibraryWriter.write_library(lib, os.path.join(path, fileNames['instruments']), {})
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpDir)
+
+	def test_batch(self):
+		threads = threading.active_count()
+		result = ExpSettingsVal.validate_snapshots(self.tmpDir, processes=1)
+		self.assertEqual(result['summary']['count'], 2)
+		self.assertEqual([os.path.basename(r['snapshot']) for r in result['snapshots']], ['snapshot0', 'snapshot1'])
+		for report in result['snapshots']:
+			self.assertNotIn('exception', report)
+		good, bad = [r['errors'] for r in result['snapshots']]
+		self.assertFalse([e for e in good if 'scope-1' in e])
+		self.assertTrue([e for e in bad if 'instrument missing not found' in e])
+		# every library's file watcher thread was stopped again
+		self.assertEqual(threading.active_count(), threads)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,115 @@
+import json
+import unittest
+
+import QGL.Channels as Channels
+from DictManager import DictManager
+from instruments.drivers.APS2 import APS2
+from WiringGraph import WiringGraph
+
+
+class TestWiringGraph(unittest.TestCase):
+
+	def setUp(self):
+		self.instruments = {label: APS2(label=label) for label in ['APS1', 'APS2']}
+		self.channels = {}
+		for awg in ['APS1', 'APS2']:
+			for chan, cls in [('12', Channels.PhysicalQuadratureChannel), ('12m1', Channels.PhysicalMarkerChannel)]:
+				label = '{0}-{1}'.format(awg, chan)
+				self.channels[label] = cls(label=label, instrument=awg)
+		self.channels['q1'] = Channels.Qubit(label='q1', physChan=self.channels['APS1-12'])
+		self.channels['M-q1'] = Channels.Measurement(label='M-q1', physChan=self.channels['APS2-12'])
+		self.channels['digitizerTrig'] = Channels.LogicalMarkerChannel(label='digitizerTrig', physChan=self.channels['APS2-12m1'])
+		self.channels['slaveTrig'] = Channels.LogicalMarkerChannel(label='slaveTrig', physChan=self.channels['APS1-12m1'])
+		self.graph = WiringGraph(self.channels, self.instruments)
+		self.channelManager = DictManager(itemDict=self.channels)
+		self.instrumentManager = DictManager(itemDict=self.instruments, onChangeDelegate=self.on_awg_change)
+		self.graph.attach(self.channelManager, 'channel')
+		self.graph.attach(self.instrumentManager, 'instrument')
+
+	def on_awg_change(self, oldName, newName):
+		# rename the physical channels with their AWG as ChannelLibrary.on_awg_change does
+		for label in sorted(self.graph.physical_channels(newName)):
+			newLabel = '{0}-{1}'.format(newName, label.rsplit('-', 1)[1])
+			self.channelManager.name_changed(label, newLabel)
+			self.channels[newLabel].instrument = newName
+
+	def assertMatchesRebuild(self):
+		expected = WiringGraph(self.channels, self.instruments)
+		nonEmpty = lambda adjacency: {k: v for k, v in adjacency.items() if v}
+		self.assertEqual(self.graph.kinds, expected.kinds)
+		self.assertEqual(self.graph.forward, expected.forward)
+		self.assertEqual(nonEmpty(self.graph.reverse), nonEmpty(expected.reverse))
+		self.assertEqual(nonEmpty(self.graph.driving), nonEmpty(expected.driving))
+		for label in set(self.channels) | set(self.instruments):
+			self.assertEqual(self.graph.physical_channels(label), expected.physical_channels(label))
+			self.assertEqual(self.graph.logical_channels(label), expected.logical_channels(label))
+			self.assertEqual(self.graph.logical_channels_driving(label), expected.logical_channels_driving(label))
+			self.assertEqual(self.graph.instrument_of(label), expected.instrument_of(label))
+		self.assertEqual(self.graph.to_dot(), expected.to_dot())
+		self.assertEqual(self.graph.to_json(), expected.to_json())
+		return expected
+
+	def test_build(self):
+		self.assertMatchesRebuild()
+		self.assertEqual(self.graph.physical_channels('APS1'), {'APS1-12', 'APS1-12m1'})
+		self.assertEqual(self.graph.logical_channels('APS2-12'), {'M-q1'})
+		self.assertEqual(self.graph.logical_channels_driving('APS2'), {'M-q1', 'digitizerTrig'})
+		self.assertEqual(self.graph.instrument_of('q1'), 'APS1')
+		self.assertEqual(self.graph.instrument_of('APS2-12m1'), 'APS2')
+		self.assertIn('"q1" -> "APS1-12";', self.graph.to_dot().splitlines())
+		self.assertIn('"APS1" [color=green,style=filled];', self.graph.to_dot().splitlines())
+		exported = json.loads(self.graph.to_json())
+		self.assertIn({'label': 'APS1-12m1', 'kind': 'physical'}, exported['nodes'])
+		self.assertIn(['APS1-12m1', 'APS1'], exported['edges'])
+
+	def test_member_edits(self):
+		self.channels['q1'].physChan = self.channels['APS2-12']
+		self.assertMatchesRebuild()
+		self.assertEqual(self.graph.logical_channels_driving('APS1'), {'slaveTrig'})
+		self.channels['APS2-12'].instrument = 'APS1'
+		self.assertMatchesRebuild()
+		self.assertEqual(self.graph.logical_channels_driving('APS1'), {'slaveTrig', 'q1', 'M-q1'})
+		self.channels['q1'].physChan = None
+		self.channels['APS1-12m1'].instrument = ''
+		self.assertMatchesRebuild()
+		self.assertIsNone(self.graph.instrument_of('slaveTrig'))
+
+	def test_channel_rename(self):
+		self.channelManager.name_changed('APS1-12', 'APS1-34')
+		self.channelManager.name_changed('q1', 'q2')
+		self.assertMatchesRebuild()
+		self.assertEqual(self.graph.logical_channels('APS1-34'), {'q2'})
+		self.assertEqual(self.graph.instrument_of('q2'), 'APS1')
+
+	def test_awg_rename(self):
+		self.instrumentManager.name_changed('APS1', 'APS3')
+		self.assertEqual(sorted(self.channels), ['APS2-12', 'APS2-12m1', 'APS3-12', 'APS3-12m1',
+												 'M-q1', 'digitizerTrig', 'q1', 'slaveTrig'])
+		self.assertMatchesRebuild()
+		self.assertEqual(self.graph.logical_channels_driving('APS3'), {'q1', 'slaveTrig'})
+		self.assertEqual(self.graph.logical_channels_driving('APS1'), set())
+
+	def test_remove(self):
+		self.channelManager.remove_item('APS2-12')
+		self.assertMatchesRebuild()
+		self.assertEqual(self.graph.logical_channels_driving('APS2'), {'digitizerTrig'})
+		self.instrumentManager.remove_item('APS1')
+		self.channelManager.remove_item('slaveTrig')
+		self.assertMatchesRebuild()
+		self.assertNotIn('APS1', self.graph.kinds)
+
+	def test_add_and_refresh(self):
+		self.channels['APS3-12'] = Channels.PhysicalQuadratureChannel(label='APS3-12', instrument='APS3')
+		self.channels['q3'] = Channels.Qubit(label='q3', physChan=self.channels['APS3-12'])
+		self.channelManager.itemChanged = ('add', 'APS3-12', 'q3')
+		self.instruments['APS3'] = APS2(label='APS3')
+		self.instrumentManager.itemChanged = ('add', 'APS3')
+		self.assertMatchesRebuild()
+		self.assertEqual(self.graph.logical_channels_driving('APS3'), {'q3'})
+		self.channels.clear()
+		self.channelManager.itemChanged = ('refresh',)
+		self.assertMatchesRebuild()
+		self.assertEqual(self.graph.edges(), [])
+
+if __name__ == '__main__':
+	unittest.main()